@@ -1,6 +1,8 @@
 from django.contrib import admin
 from .models import *
 
+admin.site.register(Category)
+
 admin.site.register(Ad)
 
 admin.site.register(ExchangeProposal)
\ No newline at end of file
@@ -0,0 +1,105 @@
+"""Асинхронные (ASGI) версии читающих эндпоинтов.
+
+Ответы совпадают с синхронными DRF-представлениями, но запросы к БД идут
+через асинхронный ORM, так что один воркер uvicorn обслуживает много
+медленных клиентов одновременно. Аутентификация — сессия Django
+(request.auser()); запись остаётся на синхронных эндпоинтах.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from django_filters.utils import translate_validation
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+
+from .feed import ProposalFeed
+from .filters import AdFilter
+from .geo import filter_nearby
+from .models import Ad, ExchangeProposal
+from .pagination import KeysetPagination
+from .renderers import FastJSONRenderer
+from .search import search_ads
+from .serializers import AdSerializer, ExchangeProposalSerializer
+from .utils.readers import compile_reader
+
+
+def _json(data, status=200):
+    return HttpResponse(FastJSONRenderer().render(data), content_type='application/json', status=status)
+
+
+def async_read_view(func):
+    """Только GET/HEAD; исключения DRF превращаются в такие же JSON-ответы"""
+    @wraps(func)
+    async def view(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return _json({'detail': f'Метод "{request.method}" не разрешён.'}, status=405)
+        try:
+            return await func(Request(request), *args, **kwargs)
+        except Http404 as exc:
+            return _json({'detail': str(exc)}, status=404)
+        except APIException as exc:
+            detail = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            return _json(detail, status=exc.status_code)
+    return view
+
+
+def _filter_ads(request, queryset):
+    """Те же фильтры, что у AdListCreateView: AdFilter, поиск и гео.
+
+    Синхронная: поле категории читает дерево, а has_postgis() при первом
+    вызове ходит в БД, поэтому вызывается через sync_to_async.
+    """
+    filterset = AdFilter(request.query_params, queryset, request=request)
+    if not filterset.is_valid():
+        raise translate_validation(filterset.errors)
+    queryset = filterset.qs
+    search = request.query_params.get('search', '').strip()
+    if search:
+        queryset = search_ads(queryset, search)
+    return filter_nearby(queryset, request.query_params)
+
+
+async def _bind(reader):
+    # снимок дерева категорий берётся до запросов и один на ответ: устаревшее дерево
+    # грузится из БД синхронно, а сменить поколение может любой процесс в любой момент
+    return await sync_to_async(reader.bind)()
+
+
+async def _paginated(request, queryset, serializer_class):
+    paginator = KeysetPagination()
+    reader = compile_reader(serializer_class)
+    build = await _bind(reader)
+    page = await paginator.apaginate_queryset(reader.queryset(queryset), request)
+    return _json(paginator.get_paginated_response([build(row) for row in page]).data)
+
+
+async def _detail(queryset, serializer_class, pk):
+    reader = compile_reader(serializer_class)
+    build = await _bind(reader)
+    row = await reader.queryset(queryset.filter(pk=pk)).afirst()
+    if row is None:
+        raise Http404(f'No {queryset.model._meta.object_name} matches the given query.')
+    return _json(build(row))
+
+
+@async_read_view
+async def ad_list(request):
+    queryset = await sync_to_async(_filter_ads)(request, Ad.objects.filter(is_active=True))
+    return await _paginated(request, queryset, AdSerializer)
+
+
+@async_read_view
+async def ad_detail(request, pk):
+    return await _detail(Ad.objects.all(), AdSerializer, pk)
+
+
+@async_read_view
+async def proposal_list(request):
+    request.user = await request._request.auser()
+    return await _paginated(request, ProposalFeed.from_request(request), ExchangeProposalSerializer)
+
+
+@async_read_view
+async def proposal_detail(request, pk):
+    return await _detail(ExchangeProposal.objects.all(), ExchangeProposalSerializer, pk)
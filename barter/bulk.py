@@ -0,0 +1,170 @@
+"""Пакетный импорт и экспорт объявлений в NDJSON и CSV.
+
+Категории проверяются по дереву в памяти (barter.categories); строки
+пишутся пачками bulk_create/bulk_update, каждая пачка — в своей транзакции.
+Ошибочные строки пропускаются и возвращаются с номером; ошибка БД откатывает
+только свою пачку, её строки тоже попадают в errors.
+"""
+import codecs
+import csv
+import json
+import logging
+from itertools import islice
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from .cache import invalidate_ads
+from .categories import find_category, get_tree
+from .models import Ad
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+NDJSON = 'application/x-ndjson'
+CSV = 'text/csv'
+
+IMPORT_FIELDS = ['id', 'title', 'description', 'image_url', 'category_id', 'condition', 'is_active']
+EXPORT_FIELDS = IMPORT_FIELDS + ['created_at']
+
+
+class AdImportSerializer(serializers.ModelSerializer):
+    """Строка импорта; без id — новое объявление, с id — изменение своего"""
+    id = serializers.IntegerField(required=False, allow_null=True)
+    category_id = serializers.IntegerField(required=False, allow_null=True)
+
+    class Meta:
+        model = Ad
+        fields = IMPORT_FIELDS
+        extra_kwargs = {
+            'condition': {'choices': Ad.CONDITION_CHOICES},
+        }
+
+
+def _loads(line):
+    return orjson.loads(line) if orjson is not None else json.loads(line)
+
+
+def parse_ndjson(stream):
+    """(номер строки, словарь или None) для каждой непустой строки"""
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = _loads(line)
+        except ValueError:
+            row = None
+        yield number, row if isinstance(row, dict) else None
+
+
+def parse_csv(stream):
+    # номер 1 — заголовок; пустые ячейки означают «не задано»
+    reader = csv.DictReader(codecs.iterdecode(stream, 'utf-8-sig'))
+    for number, row in enumerate(reader, 2):
+        yield number, {key: value for key, value in row.items() if key and value not in ('', None)}
+
+
+PARSERS = {NDJSON: parse_ndjson, CSV: parse_csv}
+
+
+class AdImporter:
+    """Импорт объявлений пользователя из потока строк"""
+    update_fields = ['title', 'description', 'image_url', 'category_id', 'condition', 'is_active', 'updated_at']
+
+    def __init__(self, user, batch_size=None):
+        self.user = user
+        self.batch_size = batch_size or settings.BARTER_BULK_BATCH_SIZE
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+        # один экземпляр на импорт: поля сериализатора не копируются на каждую строку
+        self._new_serializer = AdImportSerializer()
+        self._change_serializer = AdImportSerializer(partial=True)
+
+    def run(self, rows):
+        rows = iter(rows)
+        while batch := list(islice(rows, self.batch_size)):
+            self._import_batch(batch)
+        return self.result()
+
+    def result(self):
+        errors = sorted(self.errors, key=lambda error: error['line'])
+        return {'created': self.created, 'updated': self.updated, 'errors': errors}
+
+    def _validate(self, batch):
+        valid = []
+        categories = get_tree()
+        for number, row in batch:
+            if row is None:
+                self.errors.append({'line': number, 'errors': {'non_field_errors': ['Некорректная строка']}})
+                continue
+            serializer = self._new_serializer if row.get('id') is None else self._change_serializer
+            try:
+                data = serializer.run_validation(row)
+            except serializers.ValidationError as exc:
+                self.errors.append({'line': number, 'errors': serializers.as_serializer_error(exc)})
+                continue
+            category_id = data.get('category_id')
+            if category_id is not None and category_id not in categories and find_category(category_id) is None:
+                self.errors.append({'line': number, 'errors': {'category_id': ['Категория не найдена']}})
+                continue
+            valid.append((number, data))
+        return valid
+
+    def _import_batch(self, batch):
+        valid = self._validate(batch)
+        new = [data for _, data in valid if data.get('id') is None]
+        changes = [(number, data) for number, data in valid if data.get('id') is not None]
+
+        reported = len(self.errors)
+        try:
+            with transaction.atomic():
+                created = Ad.objects.bulk_create([Ad(author=self.user, **data) for data in new]) if new else []
+                updated = self._update(changes)
+        except DatabaseError:
+            logger.exception('Пачка импорта пользователя %s не записана', self.user.pk)
+            # строки, отклонённые в _update, уже в errors со своей причиной
+            skipped = {error['line'] for error in self.errors[reported:]}
+            self.errors.extend(
+                {'line': number, 'errors': {'non_field_errors': ['Строка не записана: ошибка базы данных']}}
+                for number, _ in valid if number not in skipped
+            )
+            return
+        self.created += len(created)
+        self.updated += len(updated)
+        # bulk_* не шлёт сигналов, кэш сбрасываем сами
+        if created or updated:
+            invalidate_ads(updated)
+
+    def _update(self, changes):
+        if not changes:
+            return []
+        own = Ad.objects.filter(author=self.user).in_bulk([data['id'] for _, data in changes])
+        now = timezone.now()
+        changed = {}
+        for number, data in changes:
+            ad = own.get(data['id'])
+            if ad is None:
+                self.errors.append({'line': number, 'errors': {'id': ['Объявление не найдено']}})
+                continue
+            for field, value in data.items():
+                setattr(ad, field, value)
+            # bulk_update не выставляет auto_now
+            ad.updated_at = now
+            changed[ad.pk] = ad
+        Ad.objects.bulk_update(changed.values(), self.update_fields)
+        return list(changed)
+
+
+def export_rows(user, chunk_size=None):
+    """Объявления пользователя по возрастанию id, по одной строке"""
+    to_representation = serializers.DateTimeField().to_representation
+    queryset = Ad.objects.filter(author=user).order_by('id').values_list(*EXPORT_FIELDS)
+    for row in queryset.iterator(chunk_size=chunk_size or settings.BARTER_STREAM_CHUNK_SIZE):
+        yield dict(zip(EXPORT_FIELDS, row[:-1] + (to_representation(row[-1]),)))
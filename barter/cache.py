@@ -0,0 +1,154 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+from .replicas import replica_reads_enabled
+
+# Параметры, от которых зависит ответ списка; остальные в ключ не попадают
+LIST_PARAMS = (
+    'category', 'condition', 'search', 'near', 'radius', 'sort', 'cursor', 'limit', 'offset', 'count', 'format',
+)
+
+ADS_GENERATION = 'ads'
+CATEGORIES_GENERATION = 'categories'
+# имена авторов вложены в ответы объявлений и предложений
+USERS_GENERATION = 'users'
+
+
+def _generation_key(name):
+    return f'barter:gen:{name}'
+
+
+def ad_generation(ad_id):
+    return f'ad:{ad_id}'
+
+
+def _initial_generation():
+    # после сброса кэша номера не повторяются: на них завязаны кэши в памяти процессов
+    return time.time_ns() // 1000
+
+
+def get_generations(*names):
+    """Текущие номера поколений одним обращением к кэшу"""
+    keys = [_generation_key(name) for name in names]
+    found = cache.get_many(keys)
+    missing = {key: _initial_generation() for key in keys if key not in found}
+    for key, generation in missing.items():
+        cache.add(key, generation, timeout=None)
+    found.update(missing)
+    return [found[key] for key in keys]
+
+
+def _bump(names):
+    for name in names:
+        key = _generation_key(name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial_generation(), timeout=None)
+            cache.incr(key)
+
+
+def bump_generations(*names):
+    """Инвалидирует всё, что закэшировано под этими поколениями.
+
+    Сдвигаем сразу и ещё раз после коммита: иначе параллельный запрос может
+    успеть положить в кэш данные, прочитанные до коммита.
+    """
+    _bump(names)
+    transaction.on_commit(lambda: _bump(names))
+
+
+def invalidate_ads(ad_ids=()):
+    """Для изменений мимо save()/delete(), например queryset.update()"""
+    bump_generations(ADS_GENERATION, *(ad_generation(ad_id) for ad_id in ad_ids))
+
+
+def list_cache_key(request):
+    params = sorted(
+        (name, value.strip())
+        for name in LIST_PARAMS
+        for value in request.query_params.getlist(name)
+        if value.strip()
+    )
+    ads, categories, users = get_generations(ADS_GENERATION, CATEGORIES_GENERATION, USERS_GENERATION)
+    digest = hashlib.md5(repr(params).encode()).hexdigest()
+    return f'barter:ads:list:{ads}:{categories}:{users}:{digest}'
+
+
+def detail_cache_key(request, pk):
+    ad, categories, users = get_generations(ad_generation(pk), CATEGORIES_GENERATION, USERS_GENERATION)
+    return f'barter:ads:detail:{pk}:{ad}:{categories}:{users}'
+
+
+def _not_modified(request, entry):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        return entry['etag'] in (tag.strip() for tag in if_none_match.split(',')) or if_none_match.strip() == '*'
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since') or '')
+    return if_modified_since is not None and int(entry['last_modified']) <= if_modified_since
+
+
+def _set_validators(response, entry):
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(entry['last_modified'])
+    response['Cache-Control'] = 'public, max-age=0, must-revalidate'
+    return response
+
+
+class AnonymousCacheMixin:
+    """Кэш готовых JSON-ответов для анонимных GET с ETag/Last-Modified.
+
+    Ключ включает номера поколений, поэтому при изменении объявления,
+    категории или пользователя старые записи просто перестают читаться.
+    """
+    cache_timeout = getattr(settings, 'BARTER_CACHE_TIMEOUT', 300)
+
+    def get_cache_key(self, request):
+        if 'pk' in self.kwargs:
+            return detail_cache_key(request, self.kwargs['pk'])
+        return list_cache_key(request)
+
+    def get_cache_timeout(self):
+        # ответ с реплики мог быть собран до того, как она догнала последнее
+        # изменение, а ключ уже с новым поколением: держим его не дольше окна отставания
+        if replica_reads_enabled():
+            return min(self.cache_timeout, settings.BARTER_REPLICA_STICKY_SECONDS)
+        return self.cache_timeout
+
+    def is_cacheable(self, request):
+        # потоковые выгрузки не кэшируются: их и не собрать целиком
+        return (not request.user.is_authenticated and request.accepted_renderer.format == 'json'
+                and 'stream' not in request.query_params)
+
+    def get(self, request, *args, **kwargs):
+        if not self.is_cacheable(request):
+            return super().get(request, *args, **kwargs)
+
+        key = self.get_cache_key(request)
+        entry = cache.get(key)
+        if entry is not None:
+            if _not_modified(request, entry):
+                return _set_validators(HttpResponseNotModified(), entry)
+            return _set_validators(HttpResponse(entry['content'], content_type=entry['content_type']), entry)
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            response.add_post_render_callback(lambda rendered: self._store(key, rendered))
+        return response
+
+    def _store(self, key, response):
+        # Валидаторы, выставленные представлением (версия строки), имеют приоритет
+        entry = {
+            'content': response.content,
+            'content_type': response['Content-Type'],
+            'etag': response.get('ETag') or quote_etag(hashlib.md5(response.content).hexdigest()),
+            'last_modified': parse_http_date_safe(response.get('Last-Modified') or '') or time.time(),
+        }
+        cache.set(key, entry, self.get_cache_timeout())
+        return _set_validators(response, entry)
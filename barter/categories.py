@@ -0,0 +1,119 @@
+"""Дерево категорий в памяти процесса.
+
+Дерево читается одним запросом и живёт до смены поколения категорий в
+кэше (signals.invalidate_category_cache), но не дольше
+BARTER_CATEGORIES_MAX_AGE. С общим кэшем (Redis) изменение категории в
+одном воркере перестраивает дерево во всех сразу, с кэшем в памяти
+процесса — по возрасту; неизвестный дереву id перепроверяется в БД.
+Поддеревья, проверка category_id в сериализаторах и формах и вложенный
+вывод категории в объявлениях берутся отсюда и не ходят в БД.
+
+Узлы отсортированы по материализованному пути, так что поддерево —
+непрерывный диапазон, который находится bisect'ом.
+"""
+import time
+from bisect import bisect_left
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from .cache import CATEGORIES_GENERATION, get_generations
+from .models import Category
+
+CategoryNode = namedtuple('CategoryNode', ['id', 'title', 'parent_id', 'path', 'depth'])
+
+
+class CategoryTree:
+    def __init__(self, nodes):
+        self.nodes = sorted(nodes, key=lambda node: node.path)
+        self.paths = [node.path for node in self.nodes]
+        self.by_id = {node.id: node for node in self.nodes}
+        self.children = {}
+        for node in sorted(self.nodes, key=lambda node: (node.title, node.id)):
+            self.children.setdefault(node.parent_id, []).append(node)
+
+    @classmethod
+    def load(cls):
+        # с основной БД: дерево отставшей реплики прожило бы до следующей смены поколения
+        rows = Category.objects.using(DEFAULT_DB_ALIAS).values_list(*CategoryNode._fields)
+        return cls(CategoryNode(*row) for row in rows)
+
+    def __contains__(self, pk):
+        return pk in self.by_id
+
+    def walk(self, parent_id=None):
+        """Узлы в порядке обхода дерева, соседи по названию"""
+        for node in self.children.get(parent_id, ()):
+            yield node
+            yield from self.walk(node.id)
+
+    def choices(self):
+        """[(id, название с отступом по глубине)] для <select>"""
+        return [(node.id, f'{"— " * node.depth}{node.title}') for node in self.walk()]
+
+    def representation(self, pk):
+        """Категория в ответе API, как CategorySerializer"""
+        node = self.by_id.get(pk)
+        return None if node is None else {'id': node.id, 'title': node.title}
+
+    def instance(self, pk):
+        """Экземпляр Category без запроса к БД или None"""
+        node = self.by_id.get(pk)
+        return None if node is None else Category.from_db(DEFAULT_DB_ALIAS, CategoryNode._fields, node)
+
+    def _span(self, pk):
+        path = self.by_id[pk].path
+        # пути потомков длиннее и начинаются с path, '\uffff' больше любого символа пути
+        return bisect_left(self.paths, path), bisect_left(self.paths, path + '\uffff')
+
+    def subtree_ids(self, pk):
+        """id категории и всех её потомков; KeyError, если категории нет"""
+        start, stop = self._span(pk)
+        return [node.id for node in self.nodes[start:stop]]
+
+    def ancestors(self, pk):
+        """Цепочка от корня до категории включительно"""
+        path = self.by_id[pk].path
+        return [self.by_id[int(part)] for part in path.split(Category.PATH_SEPARATOR) if part]
+
+    def nested(self, counts=None):
+        """Дерево для ответа API; counts — {id: активных объявлений прямо в категории}"""
+        counts = counts or {}
+
+        def build(node):
+            children = [build(child) for child in self.children.get(node.id, ())]
+            total = counts.get(node.id, 0) + sum(child['active_ads_count'] for child in children)
+            return {
+                'id': node.id, 'title': node.title, 'depth': node.depth,
+                'active_ads_count': total, 'children': children,
+            }
+
+        return [build(node) for node in self.children.get(None, ())]
+
+
+_tree = None
+_tree_key = None
+
+
+def get_tree(refresh=False):
+    """Дерево процесса; перестраивается при смене поколения категорий или по возрасту"""
+    global _tree, _tree_key
+    generation, = get_generations(CATEGORIES_GENERATION)
+    # поколение из locmem не видно другим процессам, поэтому есть и предельный возраст
+    key = (generation, int(time.monotonic() // settings.BARTER_CATEGORIES_MAX_AGE))
+    if refresh or _tree is None or key != _tree_key:
+        _tree, _tree_key = CategoryTree.load(), key
+    return _tree
+
+
+def find_category(pk):
+    """Экземпляр Category из дерева или None.
+
+    Промах перепроверяется в БД: категорию могли создать в другом процессе,
+    а до этого процесса смена поколения ещё не дошла.
+    """
+    category = get_tree().instance(pk)
+    if category is None and Category.objects.using(DEFAULT_DB_ALIAS).filter(pk=pk).exists():
+        category = get_tree(refresh=True).instance(pk)
+    return category
@@ -0,0 +1,111 @@
+import hashlib
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.http import HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+from .cache import CATEGORIES_GENERATION, get_generations
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'Объект изменён с момента последнего чтения'
+    default_code = 'precondition_failed'
+
+
+def _etag_matches(header, etag, weak=False):
+    tags = [tag.strip() for tag in header.split(',')]
+    # If-None-Match сравнивает слабо, If-Match — строго (RFC 9110, 8.8.3.2)
+    return '*' in tags or etag in tags or (weak and f'W/{etag}' in tags)
+
+
+class ConditionalDetailMixin:
+    """ETag/Last-Modified для детального представления по версиям строк.
+
+    Валидатор читается одним запросом по version_fields, поэтому 304 не
+    требует ни загрузки объекта, ни сериализации вложенных объявлений.
+    If-Match на PUT/DELETE проверяется под блокировкой строки.
+
+    Имя автора и название категории меняются без updated_at объявления,
+    поэтому в ETag входят ещё identity_fields и поколения из generations.
+    Last-Modified строится только по версиям строк.
+    """
+    version_fields = ('updated_at',)
+    # значения из ответа, у строк которых нет своей версии
+    identity_fields = ()
+    generations = (CATEGORIES_GENERATION,)
+
+    def get_validator(self, lock=False):
+        lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        queryset = self.get_queryset().filter(**{self.lookup_field: lookup})
+        if lock:
+            queryset = queryset.select_for_update(of=('self',))
+        values = queryset.values_list(*self.version_fields, *self.identity_fields).first()
+        return self._make_validator(values) if values is not None else None
+
+    def get_instance_validator(self, instance):
+        """Тот же валидатор по уже загруженному объекту"""
+        values = []
+        for field in (*self.version_fields, *self.identity_fields):
+            value = instance
+            for attr in field.split('__'):
+                value = getattr(value, attr)
+            values.append(value)
+        return self._make_validator(values)
+
+    def _make_validator(self, values):
+        versions, identity = values[:len(self.version_fields)], values[len(self.version_fields):]
+        generations = get_generations(*self.generations) if self.generations else []
+        raw = '|'.join([*(version.isoformat() for version in versions), *map(str, identity), *map(str, generations)])
+        return quote_etag(hashlib.md5(raw.encode()).hexdigest()), max(versions)
+
+    def _set_validator(self, response, validator):
+        if validator is not None and response.status_code < 300:
+            response['ETag'], last_modified = validator[0], validator[1]
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        if_none_match = request.headers.get('If-None-Match')
+        if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since') or '')
+        # Без условных заголовков валидатор берётся из загруженного объекта, без лишнего запроса
+        if if_none_match is not None or if_modified_since is not None:
+            validator = self.get_validator()
+            if validator is not None:
+                if if_none_match is not None:
+                    not_modified = _etag_matches(if_none_match, validator[0], weak=True)
+                else:
+                    not_modified = int(validator[1].timestamp()) <= if_modified_since
+                if not_modified:
+                    return self._set_validator(HttpResponseNotModified(), validator)
+
+        instance = self.get_object()
+        serializer = self.get_serializer(instance)
+        return self._set_validator(Response(serializer.data), self.get_instance_validator(instance))
+
+    @contextmanager
+    def if_match(self, request):
+        """Проверяет If-Match и держит блокировку строки до конца записи"""
+        if_match = request.headers.get('If-Match')
+        if if_match is None:
+            yield
+            return
+
+        with transaction.atomic():
+            validator = self.get_validator(lock=True)
+            if validator is None or not _etag_matches(if_match, validator[0]):
+                raise PreconditionFailed()
+            yield
+
+    def update(self, request, *args, **kwargs):
+        with self.if_match(request):
+            response = super().update(request, *args, **kwargs)
+        return self._set_validator(response, self.get_validator())
+
+    def destroy(self, request, *args, **kwargs):
+        with self.if_match(request):
+            return super().destroy(request, *args, **kwargs)
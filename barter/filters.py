@@ -0,0 +1,23 @@
+from django_filters import rest_framework as filters
+
+from .categories import get_tree
+from .forms import CategoryChoiceField
+from .models import Ad
+
+
+class CategorySubtreeFilter(filters.Filter):
+    """Категория вместе со всеми вложенными"""
+    field_class = CategoryChoiceField
+
+    def filter(self, qs, value):
+        if value is None:
+            return qs
+        return qs.filter(**{f'{self.field_name}_id__in': get_tree().subtree_ids(value.pk)})
+
+
+class AdFilter(filters.FilterSet):
+    category = CategorySubtreeFilter(field_name='category')
+
+    class Meta:
+        model = Ad
+        fields = ['category', 'condition']
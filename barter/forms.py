@@ -1,10 +1,40 @@
 from django import forms
+from .categories import find_category, get_tree
 from .models import *
 
 
+class CategoryChoiceField(forms.ChoiceField):
+    """Выбор категории из дерева в памяти (barter.categories); значение — объект Category"""
+    default_error_messages = {
+        'invalid_choice': forms.ModelChoiceField.default_error_messages['invalid_choice'],
+    }
+
+    def __init__(self, **kwargs):
+        # варианты пересчитываются при каждом выводе формы, но из памяти
+        super().__init__(choices=self._tree_choices, **kwargs)
+
+    @staticmethod
+    def _tree_choices():
+        return [('', '---------')] + get_tree().choices()
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            category = find_category(int(str(value).strip()))
+        except ValueError:
+            category = None
+        if category is None:
+            raise forms.ValidationError(self.error_messages['invalid_choice'], code='invalid_choice')
+        return category
+
+    def validate(self, value):
+        # вариант уже проверен в to_python
+        forms.Field.validate(self, value)
+
+
 class AdForm(forms.ModelForm):
-    category_id = forms.ModelChoiceField(
-        queryset=Category.objects.all(),
+    category_id = CategoryChoiceField(
         label='Категория',
         widget=forms.Select(attrs={'class': 'form-control'}),
     )
@@ -0,0 +1,177 @@
+"""Поиск объявлений рядом с точкой.
+
+Сначала ограничивающий прямоугольник по latitude/longitude: его отбирает
+B-tree индекс ad_active_location_idx. Внутри прямоугольника расстояние
+считается точно: по геодезической на сфероиде через PostGIS, если
+расширение установлено в БД, иначе по формуле гаверсинусов на сфере.
+"""
+from functools import lru_cache
+from math import asin, cos, degrees, pi, radians, sin
+
+from django.db import connections
+from django.db.models import BooleanField, F, FloatField, Func, Q, Value
+from django.db.models.functions import ASin, Cos, Least, Power, Radians, Sin, Sqrt
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+# Средний радиус Земли (IUGG), км
+EARTH_RADIUS_KM = 6371.0088
+# Градус меридиана на сфероиде WGS84 бывает на 0,56% короче, чем на сфере (110,57 км у экватора против 111,19):
+# прямоугольник берётся с запасом, чтобы не отрезать точки, которые ST_DWithin считает внутри радиуса
+BOX_MARGIN = 1.01
+MAX_RADIUS_KM = 20000
+
+
+@lru_cache(maxsize=None)
+def has_postgis(alias='default'):
+    """Установлено ли расширение PostGIS в БД"""
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'postgis'")
+        return cursor.fetchone() is not None
+
+
+def bounding_box(lat, lon, radius_km):
+    """Q по прямоугольнику, в который вписан круг радиуса radius_km.
+
+    Долготы считаются по точной формуле для окружности на сфере; у полюса
+    берётся вся полоса широт, через антимеридиан — два диапазона долгот.
+    Радиус увеличен на BOX_MARGIN, так что круг на сфероиде тоже внутри.
+    """
+    angular = radius_km * BOX_MARGIN / EARTH_RADIUS_KM
+    lat_r, lon_r = radians(lat), radians(lon)
+    min_lat, max_lat = lat_r - angular, lat_r + angular
+    if min_lat <= -pi / 2 or max_lat >= pi / 2:
+        return Q(latitude__range=(degrees(max(min_lat, -pi / 2)), degrees(min(max_lat, pi / 2))))
+
+    delta = asin(sin(angular) / cos(lat_r))
+    min_lon, max_lon = lon_r - delta, lon_r + delta
+    if min_lon < -pi:
+        ranges = [(min_lon + 2 * pi, pi), (-pi, max_lon)]
+    elif max_lon > pi:
+        ranges = [(min_lon, pi), (-pi, max_lon - 2 * pi)]
+    else:
+        ranges = [(min_lon, max_lon)]
+
+    longitude = Q()
+    for low, high in ranges:
+        longitude |= Q(longitude__range=(degrees(low), degrees(high)))
+    return Q(latitude__range=(degrees(min_lat), degrees(max_lat))) & longitude
+
+
+def haversine_km(lat, lon):
+    """Расстояние по большому кругу от (lat, lon) до объявления, км"""
+    lat_r, lon_r = radians(lat), radians(lon)
+    half_dlat = (Radians(F('latitude')) - Value(lat_r)) / 2
+    half_dlon = (Radians(F('longitude')) - Value(lon_r)) / 2
+    a = Power(Sin(half_dlat), 2) + Value(cos(lat_r)) * Cos(Radians(F('latitude'))) * Power(Sin(half_dlon), 2)
+    # округление может дать чуть больше 1 под корнем asin
+    return Value(2 * EARTH_RADIUS_KM) * ASin(Least(Sqrt(a), Value(1.0)), output_field=FloatField())
+
+
+def _geography(lat_expression, lon_expression):
+    point = Func(lon_expression, lat_expression, function='ST_MakePoint')
+    return Func(Func(point, Value(4326), function='ST_SetSRID'), template='%(expressions)s::geography')
+
+
+def _ad_geography():
+    # то же выражение, что в индексе ad_active_geography_idx (миграция 0011)
+    return _geography(F('latitude'), F('longitude'))
+
+
+def nearby(queryset, lat, lon, radius_km=None, order=False):
+    """Объявления с координатами, аннотированные distance (км).
+
+    radius_km оставляет только объявления в круге, order сортирует по
+    расстоянию (при равенстве — по id).
+    """
+    queryset = queryset.filter(latitude__isnull=False, longitude__isnull=False)
+    postgis = has_postgis(queryset.db)
+    if postgis:
+        point = _geography(Value(lat), Value(lon))
+        distance = Func(_ad_geography(), point, function='ST_Distance', output_field=FloatField()) / 1000
+    else:
+        distance = haversine_km(lat, lon)
+    queryset = queryset.annotate(distance=distance)
+
+    if radius_km is not None:
+        queryset = queryset.filter(bounding_box(lat, lon, radius_km))
+        if postgis:
+            queryset = queryset.filter(Func(
+                _ad_geography(), point, Value(radius_km * 1000), function='ST_DWithin', output_field=BooleanField()
+            ))
+        else:
+            queryset = queryset.filter(distance__lte=radius_km)
+    if order:
+        queryset = queryset.order_by('distance', 'id')
+    return queryset
+
+
+def parse_point(value):
+    """'lat,lon' -> (lat, lon) или ValueError"""
+    lat, lon = (float(part) for part in value.split(','))
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError(value)
+    return lat, lon
+
+
+def filter_nearby(queryset, params):
+    """?near=lat,lon&radius=км&sort=distance; ошибки — ValidationError DRF"""
+    near = params.get('near', '').strip()
+    radius = params.get('radius', '').strip()
+    sort = params.get('sort', '').strip()
+    if not near:
+        if radius or sort == 'distance':
+            raise ValidationError({'near': ['Укажите точку: near=широта,долгота']})
+        return queryset
+
+    errors = {}
+    try:
+        lat, lon = parse_point(near)
+    except ValueError:
+        errors['near'] = ['Ожидается near=широта,долгота в градусах']
+    try:
+        radius_km = float(radius) if radius else None
+        if radius_km is not None and not 0 < radius_km <= MAX_RADIUS_KM:
+            raise ValueError(radius)
+    except ValueError:
+        errors['radius'] = [f'Радиус в километрах, от 0 до {MAX_RADIUS_KM}']
+    if sort and sort != 'distance':
+        errors['sort'] = ['Поддерживается только sort=distance']
+    if errors:
+        raise ValidationError(errors)
+    return nearby(queryset, lat, lon, radius_km, order=sort == 'distance')
+
+
+class AdGeoFilter(BaseFilterBackend):
+    """Параметры ?near=, ?radius= и ?sort=distance"""
+
+    def filter_queryset(self, request, queryset, view):
+        return filter_nearby(queryset, request.query_params)
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': 'near',
+                'required': False,
+                'in': 'query',
+                'description': 'Точка «широта,долгота»; без radius и sort только отбрасывает объявления без координат',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': 'radius',
+                'required': False,
+                'in': 'query',
+                'description': 'Только объявления не дальше стольких километров от near',
+                'schema': {'type': 'number'},
+            },
+            {
+                'name': 'sort',
+                'required': False,
+                'in': 'query',
+                'description': 'distance — сначала ближайшие к near (в режиме ?cursor= порядок по дате)',
+                'schema': {'type': 'string', 'enum': ['distance']},
+            },
+        ]
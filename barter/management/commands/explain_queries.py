@@ -0,0 +1,71 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+
+from barter.feed import ProposalFeed
+from barter.models import Ad, ExchangeProposal
+from barter.serializers import AdSerializer, ExchangeProposalSerializer
+from barter.utils.queryset import optimize_queryset
+from barter.utils.readers import compile_reader
+
+
+# справочники маленькие, полный проход по ним дешевле индекса
+SEQ_SCAN = re.compile(r'Seq Scan on (barter_ad|barter_exchangeproposal)\b')
+
+
+class Command(BaseCommand):
+    help = 'Выполняет EXPLAIN ANALYZE для основных запросов API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help='Сначала засеять столько объявлений')
+        parser.add_argument('--limit', type=int, default=10, help='Размер страницы')
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            call_command(
+                'seed_barter', ads=options['seed'], proposals=options['seed'], users=max(options['seed'] // 100, 2),
+                stdout=self.stdout,
+            )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        seq_scans = []
+        for title, queryset in self.canonical_queries(options['limit']):
+            plan = queryset.explain(analyze=True)
+            self.stdout.write(self.style.MIGRATE_HEADING(title))
+            self.stdout.write(plan + '\n')
+            if SEQ_SCAN.search(plan):
+                seq_scans.append(title)
+
+        if seq_scans:
+            self.stdout.write(self.style.WARNING('Seq Scan: ' + ', '.join(seq_scans)))
+        else:
+            self.stdout.write(self.style.SUCCESS('Все запросы используют индексы'))
+
+    def canonical_queries(self, limit):
+        ad = Ad.objects.filter(is_active=True).values('category_id', 'condition').annotate(
+            n=Count('id')
+        ).order_by('-n').first() or {'category_id': None, 'condition': 'used'}
+        # лента того, кому больше всех предлагают: на ней видно худший случай
+        busiest = ExchangeProposal.objects.values('receiver_author_id').annotate(
+            n=Count('id')
+        ).order_by('-n').values_list('receiver_author_id', flat=True).first()
+        user = get_user_model()(pk=busiest)
+
+        ads = optimize_queryset(Ad.objects.filter(is_active=True), AdSerializer)
+        # ленты — так же, как их читает /proposals/: ProposalFeed по копиям авторов и ValuesReader
+        reader = compile_reader(ExchangeProposalSerializer)
+        feed = ProposalFeed(user, status='pending')
+
+        yield 'Список объявлений', ads.order_by('id')[:limit]
+        yield 'Объявления по категории и состоянию', ads.filter(
+            category_id=ad['category_id'], condition=ad['condition']
+        ).order_by('-created_at')[:limit]
+        yield 'Объявления по состоянию', ads.filter(condition=ad['condition']).order_by('-created_at')[:limit]
+        yield 'Исходящие предложения', reader.queryset(feed.outbox())[:limit]
+        yield 'Входящие предложения', reader.queryset(feed.inbox())[:limit]
+        yield 'Все предложения', reader.queryset(feed.all())[:limit]
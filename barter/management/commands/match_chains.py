@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from barter.matching import run_matcher
+
+
+class Command(BaseCommand):
+    help = 'Ищет цепочки обмена в графе ожидающих предложений'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Пересчитать все цепочки заново')
+        parser.add_argument('--max-length', type=int, default=None, help='Самая длинная цепочка')
+
+    def handle(self, *args, **options):
+        run = run_matcher(full=options['full'], max_length=options['max_length'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Полный" if run.full else "Инкрементальный"} прогон за {run.duration:.2f} s: '
+            f'найдено {run.created}, удалено {run.dropped}'
+        ))
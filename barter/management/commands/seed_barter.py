@@ -0,0 +1,228 @@
+import io
+from datetime import datetime, timezone
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, Concat
+
+from barter.cache import CATEGORIES_GENERATION, bump_generations, invalidate_ads
+from barter.models import Ad, Category, ExchangeProposal
+
+User = get_user_model()
+
+# Словарь для названий и описаний, чтобы поиск работал на правдоподобных текстах
+WORDS = (
+    'велосипед', 'смартфон', 'ноутбук', 'куртка', 'книга', 'гитара', 'диван', 'стол', 'лампа', 'кроссовки',
+    'холодильник', 'телевизор', 'самокат', 'палатка', 'коляска', 'наушники', 'камера', 'часы', 'рюкзак',
+    'bike', 'phone', 'laptop', 'jacket', 'book', 'guitar', 'sofa', 'table', 'lamp', 'sneakers',
+)
+ADJECTIVES = ('новый', 'старый', 'детский', 'горный', 'рабочий', 'красный', 'большой', 'small', 'vintage', 'black')
+BRANDS = ('sony', 'bosch', 'atom', 'stels', 'ikea', 'canon', 'xiaomi', 'nike', 'lego', 'yamaha')
+# Объявления кучкуются вокруг городов, как в жизни: (широта, долгота, разброс в градусах)
+CITIES = (
+    (55.7558, 37.6173, 0.4), (59.9343, 30.3351, 0.3), (56.8389, 60.6057, 0.2), (55.0084, 82.9357, 0.2),
+    (55.7963, 49.1088, 0.15), (43.1155, 131.8855, 0.1), (54.7104, 20.4522, 0.1), (64.5399, 40.5152, 0.1),
+)
+# Большинство предложений ещё ждут ответа, отклоняют чаще, чем принимают
+STATUS_WEIGHTS = {'pending': 0.6, 'accepted': 0.15, 'rejected': 0.25}
+
+AD_FIELDS = (
+    'author_id', 'title', 'description', 'image_url', 'category_id', 'condition', 'is_active',
+    'latitude', 'longitude', 'created_at', 'updated_at',
+)
+PROPOSAL_FIELDS = (
+    'sender_id', 'receiver_id', 'sender_author_id', 'receiver_author_id', 'comment', 'status',
+    'created_at', 'updated_at',
+)
+
+
+def power_law(rng, n, exponent):
+    """Вероятности по закону Ципфа: k-й по популярности элемент весит 1 / k**exponent.
+
+    Ранги раздаются случайно, чтобы популярность не совпадала с порядком id.
+    """
+    weights = 1 / np.arange(1, n + 1) ** exponent
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+
+def _copy_value(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, str):
+        return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+    return str(value)
+
+
+def copy_rows(model, fields, rows):
+    """Вставляет строки (кортежи значений полей fields) одним COPY FROM STDIN.
+
+    Сигналы, save() и auto_now не работают, триггеры БД — работают.
+    """
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(model._meta.get_field(name).column) for name in fields)
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(map(_copy_value, row)))
+        buffer.write('\n')
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(f'COPY {quote(model._meta.db_table)} ({columns}) FROM STDIN', buffer)
+
+
+class Command(BaseCommand):
+    help = 'Заполняет БД синтетическими пользователями, объявлениями и предложениями'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--ads', type=int, default=10000)
+        parser.add_argument('--proposals', type=int, default=10000)
+        parser.add_argument('--batch-size', type=int, default=50000)
+        parser.add_argument('--random-seed', type=int, default=0)
+        parser.add_argument(
+            '--skew', type=float, default=1.1,
+            help='Показатель степенного закона: как сильно объявления и предложения '
+                 'сосредоточены у немногих авторов, категорий и объявлений (0 — равномерно)',
+        )
+        parser.add_argument('--days', type=int, default=365, help='За сколько дней разбросаны даты создания')
+        parser.add_argument('--clear', action='store_true', help='Удалить существующие данные перед заполнением')
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['random_seed'])
+        self.rng, self.skew, self.batch_size = rng, options['skew'], options['batch_size']
+        self.now = datetime.now(timezone.utc).timestamp()
+        self.span = options['days'] * 86400
+
+        if options['clear']:
+            ExchangeProposal.objects.all().delete()
+            Ad.objects.all().delete()
+            # parent — PROTECT: сначала листья, потом их родители
+            for depth in Category.objects.order_by('-depth').values_list('depth', flat=True).distinct():
+                Category.objects.filter(depth=depth).delete()
+            User.objects.filter(username__startswith='seed_').delete()
+
+        password = make_password(None)
+        start = User.objects.count()
+        User.objects.bulk_create(
+            (User(username=f'seed_{start + i}', password=password) for i in range(options['users'])),
+            batch_size=self.batch_size,
+        )
+        user_ids = np.array(User.objects.filter(username__startswith='seed_').values_list('id', flat=True))
+
+        category_ids = self._create_categories(options['categories'])
+        if options['ads']:
+            self._create_ads(options['ads'], user_ids, category_ids)
+        self.stdout.write(f'Объявлений: {options["ads"]}')
+        if options['proposals']:
+            self._create_proposals(options['proposals'])
+        self.stdout.write(f'Предложений: {options["proposals"]}')
+
+        # мимо сигналов: кэши ответов и дерево категорий сбрасываем сами
+        invalidate_ads()
+        bump_generations(CATEGORIES_GENERATION)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE barter_category, barter_ad, barter_exchangeproposal')
+
+    def _create_categories(self, total):
+        """Корни и по одному уровню подкатегорий под ними; ~ пятая часть — корни"""
+        if total:
+            roots = Category.objects.bulk_create(Category(title=f'Категория {i}') for i in range(max(total // 5, 1)))
+            # bulk_create не вызывает save(): путь корня выставляем сами
+            Category.objects.filter(pk__in=[root.pk for root in roots]).update(
+                path=Concat(Cast('id', CharField()), Value(Category.PATH_SEPARATOR))
+            )
+            parents = self.rng.choice([root.pk for root in roots], size=total - len(roots))
+            children = Category.objects.bulk_create(
+                Category(title=f'Категория {len(roots) + i}', parent_id=parent)
+                for i, parent in enumerate(parents.tolist())
+            )
+            for child in children:
+                child.path = f'{child.parent_id}{Category.PATH_SEPARATOR}{child.pk}{Category.PATH_SEPARATOR}'
+                child.depth = 1
+            Category.objects.bulk_update(children, ['path', 'depth'])
+        return np.array(Category.objects.values_list('id', flat=True))
+
+    def _dates(self, size):
+        # сервис растёт: свежих объявлений больше, чем старых
+        return self.now - self.span * (1 - np.sqrt(self.rng.random(size)))
+
+    def _batches(self, total):
+        for offset in range(0, total, self.batch_size):
+            yield offset, min(self.batch_size, total - offset)
+
+    def _create_ads(self, total, user_ids, category_ids):
+        rng = self.rng
+        author_p = power_law(rng, len(user_ids), self.skew)
+        category_p = power_law(rng, len(category_ids), self.skew) if len(category_ids) else None
+        conditions = [value for value, _ in Ad.CONDITION_CHOICES]
+        text = np.array(WORDS + ADJECTIVES)
+        cities = np.array(CITIES)
+
+        for offset, size in self._batches(total):
+            authors = user_ids[rng.choice(len(user_ids), size=size, p=author_p)].tolist()
+            if category_p is None:
+                categories = [None] * size
+            else:
+                categories = category_ids[rng.choice(len(category_ids), size=size, p=category_p)].tolist()
+            titles = [
+                f'{ADJECTIVES[a]} {WORDS[w]} {BRANDS[b]}{n}'
+                for a, w, b, n in zip(
+                    rng.integers(len(ADJECTIVES), size=size).tolist(), rng.integers(len(WORDS), size=size).tolist(),
+                    rng.integers(len(BRANDS), size=size).tolist(), rng.integers(10000, size=size).tolist(),
+                )
+            ]
+            descriptions = [' '.join(words) for words in rng.choice(text, size=(size, 6)).tolist()]
+            city = cities[rng.integers(len(cities), size=size)]
+            latitudes = np.clip(rng.normal(city[:, 0], city[:, 2]), -90, 90).tolist()
+            longitudes = np.clip(rng.normal(city[:, 1], city[:, 2] * 2), -180, 180).tolist()
+            dates = [datetime.fromtimestamp(ts, timezone.utc) for ts in self._dates(size).tolist()]
+            rows = zip(
+                authors, titles, descriptions, [''] * size, categories,
+                rng.choice(conditions, size=size).tolist(), (rng.random(size) < 0.9).tolist(),
+                latitudes, longitudes, dates, dates,
+            )
+            with transaction.atomic():
+                copy_rows(Ad, AD_FIELDS, rows)
+
+    def _create_proposals(self, total):
+        rng = self.rng
+        ads = Ad.objects.values_list('id', 'author_id', 'created_at')
+        ad_ids, author_ids, created = (np.array(column) for column in zip(*ads.iterator(chunk_size=self.batch_size)))
+        created = np.array([value.timestamp() for value in created.tolist()])
+        if len(np.unique(author_ids)) < 2:
+            self.stderr.write('Для предложений нужны объявления хотя бы двух авторов')
+            return
+        # на популярные объявления приходит больше предложений, активные меняльщики шлют чаще
+        receiver_p = power_law(rng, len(ad_ids), self.skew)
+        sender_p = power_law(rng, len(ad_ids), self.skew)
+        statuses = list(STATUS_WEIGHTS)
+        status_p = list(STATUS_WEIGHTS.values())
+
+        for offset, size in self._batches(total):
+            receivers = rng.choice(len(ad_ids), size=size, p=receiver_p)
+            senders = rng.choice(len(ad_ids), size=size, p=sender_p)
+            same = author_ids[senders] == author_ids[receivers]
+            while same.any():
+                senders[same] = rng.choice(len(ad_ids), size=int(same.sum()), p=sender_p)
+                same = author_ids[senders] == author_ids[receivers]
+            # предложение не старше обоих объявлений
+            earliest = np.maximum(created[senders], created[receivers])
+            dates = earliest + (self.now - earliest) * rng.random(size)
+            dates = [datetime.fromtimestamp(ts, timezone.utc) for ts in dates.tolist()]
+            rows = zip(
+                ad_ids[senders].tolist(), ad_ids[receivers].tolist(),
+                author_ids[senders].tolist(), author_ids[receivers].tolist(),
+                [f'Предложение {offset + i}' for i in range(size)],
+                rng.choice(statuses, size=size, p=status_p).tolist(), dates, dates,
+            )
+            with transaction.atomic():
+                copy_rows(ExchangeProposal, PROPOSAL_FIELDS, rows)
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from barter.recommendations import update_affinity
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает сродство категорий для рекомендаций'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Пересчитать по всем предложениям')
+        parser.add_argument('--batch-size', type=int, help='Предложений в одной транзакции')
+
+    def handle(self, *args, **options):
+        run = update_affinity(full=options['full'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Полный" if run.full else "Инкрементальный"} пересчёт за {run.duration:.2f} s: '
+            f'учтено предложений {run.proposals}'
+        ))
@@ -0,0 +1,266 @@
+"""Поиск цепочек обмена: циклов в графе ожидающих предложений.
+
+Вершины — активные объявления, ребро sender -> receiver — предложение
+«отдам sender за receiver». Цикл a1 -> a2 -> ... -> ak -> a1 — это обмен
+по кругу, где каждый владелец отдаёт своё объявление и получает следующее.
+
+Граф хранится в CSR-массивах NumPy. Цикл длины k склеивается из двух
+половин: прямого пути u -> ... -> w длины ceil(k/2) и обратного пути той
+же пары длины floor(k/2). Обе половины строятся векторно только через
+вершины больше u, так что каждый цикл находится ровно один раз, начиная
+с наименьшей вершины. Непересекающиеся циклы выбираются жадно, сначала
+короткие.
+"""
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+
+from .models import Ad, ChainMatcherRun, ExchangeChain, ExchangeProposal
+
+
+class ProposalGraph:
+    """Граф предложений в CSR: плотные индексы вершин и позиции рёбер"""
+
+    def __init__(self, ad_ids, sources, targets, proposal_ids):
+        self.ad_ids = ad_ids
+        self.size = len(ad_ids)
+        self.sources = sources
+        self.targets = targets
+        self.proposal_ids = proposal_ids
+        self.indptr = self._indptr(sources)
+
+        # транспонированный граф для обратных половин циклов
+        order = np.argsort(targets, kind='stable')
+        self.reverse_edges = order
+        self.reverse_sources = targets[order]
+        self.reverse_targets = sources[order]
+        self.reverse_indptr = self._indptr(self.reverse_sources)
+
+    def _indptr(self, sources):
+        indptr = np.zeros(self.size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=self.size), out=indptr[1:])
+        return indptr
+
+    @classmethod
+    def from_edges(cls, proposal_ids, senders, receivers):
+        proposal_ids = np.asarray(proposal_ids, dtype=np.int64)
+        senders = np.asarray(senders, dtype=np.int64)
+        receivers = np.asarray(receivers, dtype=np.int64)
+
+        ad_ids, inverse = np.unique(np.concatenate([senders, receivers]), return_inverse=True)
+        sources, targets = np.split(inverse.astype(np.int32), 2)
+
+        # рёбра по порядку CSR; из повторных предложений остаётся самое раннее
+        order = np.lexsort((proposal_ids, targets, sources))
+        sources, targets, proposal_ids = sources[order], targets[order], proposal_ids[order]
+        first = np.ones(len(sources), dtype=bool)
+        first[1:] = (sources[1:] != sources[:-1]) | (targets[1:] != targets[:-1])
+        first &= sources != targets
+        return cls(ad_ids, sources[first], targets[first], proposal_ids[first])
+
+    @classmethod
+    def load(cls):
+        """Ожидающие предложения между активными объявлениями"""
+        rows = ExchangeProposal.objects.filter(
+            status='pending', sender__is_active=True, receiver__is_active=True
+        ).values_list('id', 'sender_id', 'receiver_id')
+        edges = np.array(list(rows.iterator(chunk_size=settings.BARTER_STREAM_CHUNK_SIZE)), dtype=np.int64)
+        edges = edges.reshape(-1, 3)
+        return cls.from_edges(edges[:, 0], edges[:, 1], edges[:, 2])
+
+    def node_mask(self, ad_ids):
+        """Маска вершин по id объявлений; отсутствующие в графе пропускаются"""
+        ad_ids = np.asarray(ad_ids, dtype=np.int64)
+        positions = np.searchsorted(self.ad_ids, ad_ids)
+        present = positions < self.size
+        present[present] = self.ad_ids[positions[present]] == ad_ids[present]
+        mask = np.zeros(self.size, dtype=bool)
+        mask[positions[present]] = True
+        return mask
+
+    def ball(self, seeds, depth, reverse=False):
+        """Вершины не дальше depth шагов от seeds по рёбрам (или против них)"""
+        sources, targets = (self.targets, self.sources) if reverse else (self.sources, self.targets)
+        reached, frontier = seeds.copy(), seeds
+        for _ in range(depth):
+            step = np.zeros(self.size, dtype=bool)
+            step[targets[frontier[sources]]] = True
+            frontier = step & ~reached
+            if not frontier.any():
+                break
+            reached |= frontier
+        return reached
+
+    def trim(self, mask, rounds=8):
+        """Убирает вершины без входящих или исходящих рёбер: в циклы они не входят"""
+        for _ in range(rounds):
+            alive = mask[self.sources] & mask[self.targets]
+            trimmed = (
+                mask
+                & (np.bincount(self.sources[alive], minlength=self.size) > 0)
+                & (np.bincount(self.targets[alive], minlength=self.size) > 0)
+            )
+            if trimmed.sum() == mask.sum():
+                break
+            mask = trimmed
+        return mask
+
+    def _half_paths(self, length, mask, reverse):
+        """Простые пути из length рёбер, все вершины которых больше первой.
+
+        Возвращает (вершины, позиции рёбер в прямом CSR), по строке на путь.
+        """
+        if reverse:
+            indptr, sources, targets = self.reverse_indptr, self.reverse_sources, self.reverse_targets
+            edge_positions = self.reverse_edges
+        else:
+            indptr, sources, targets = self.indptr, self.sources, self.targets
+            edge_positions = np.arange(len(sources))
+
+        allowed = mask[sources] & mask[targets]
+        first = np.flatnonzero(allowed & (targets > sources))
+        nodes = np.column_stack([sources[first], targets[first]])
+        edges = edge_positions[first][:, None]
+
+        for _ in range(length - 1):
+            last = nodes[:, -1]
+            counts = indptr[last + 1] - indptr[last]
+            rows = np.repeat(np.arange(len(nodes)), counts)
+            offsets = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+            positions = indptr[last][rows] + offsets
+
+            following = targets[positions]
+            keep = (
+                allowed[positions]
+                & (following > nodes[rows, 0])
+                & (nodes[rows] != following[:, None]).all(axis=1)
+            )
+            rows, positions, following = rows[keep], positions[keep], following[keep]
+            nodes = np.column_stack([nodes[rows], following])
+            edges = np.column_stack([edges[rows], edge_positions[positions]])
+        return nodes, edges
+
+    def cycles(self, length, mask):
+        """Все простые циклы заданной длины внутри mask, каждый один раз.
+
+        Возвращает (вершины, позиции рёбер) по порядку обхода цикла.
+        """
+        forward_length, backward_length = (length + 1) // 2, length // 2
+        forward, forward_edges = self._half_paths(forward_length, mask, reverse=False)
+        backward, backward_edges = self._half_paths(backward_length, mask, reverse=True)
+
+        # склеиваем половины с общими концами (u, w)
+        forward_keys = forward[:, 0].astype(np.int64) * self.size + forward[:, -1]
+        backward_keys = backward[:, 0].astype(np.int64) * self.size + backward[:, -1]
+        order = np.argsort(backward_keys, kind='stable')
+        sorted_keys = backward_keys[order]
+        low = np.searchsorted(sorted_keys, forward_keys, 'left')
+        counts = np.searchsorted(sorted_keys, forward_keys, 'right') - low
+
+        forward_rows = np.repeat(np.arange(len(forward)), counts)
+        offsets = np.arange(len(forward_rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+        backward_rows = order[np.repeat(low, counts) + offsets]
+
+        head = forward[forward_rows]
+        # обратная половина u <- ... <- w идёт по циклу от w к u
+        tail = backward[backward_rows][:, -2:0:-1]
+        distinct = ~(tail[:, :, None] == head[:, None, :]).any(axis=(1, 2))
+
+        nodes = np.hstack([head, tail])[distinct]
+        edges = np.hstack([forward_edges[forward_rows], backward_edges[backward_rows][:, ::-1]])[distinct]
+        return nodes, edges
+
+    def match(self, max_length, mask=None, used=None):
+        """Непересекающиеся циклы длины от 2 до max_length.
+
+        mask ограничивает поиск частью графа, used — уже занятые вершины.
+        Возвращает [(id объявлений, id предложений), ...] по порядку обхода.
+        """
+        used = np.zeros(self.size, dtype=bool) if used is None else used.copy()
+        mask = np.ones(self.size, dtype=bool) if mask is None else mask.copy()
+        mask = self.trim(mask & ~used)
+
+        chains = []
+        for length in range(2, max_length + 1):
+            nodes, edges = self.cycles(length, mask)
+            for chosen_nodes, chosen_edges in _disjoint(nodes, edges, used, self.size):
+                chains.extend(zip(self.ad_ids[chosen_nodes].tolist(), self.proposal_ids[chosen_edges].tolist()))
+            mask = self.trim(mask & ~used)
+        return chains
+
+
+def _disjoint(nodes, edges, used, size):
+    """Жадный выбор непересекающихся циклов, отмечает их вершины в used.
+
+    За раунд берутся циклы, которые стоят первыми для всех своих вершин:
+    такие заведомо не пересекаются. Первый живой цикл выигрывает всегда.
+    """
+    while len(nodes):
+        alive = ~used[nodes].any(axis=1)
+        nodes, edges = nodes[alive], edges[alive]
+        if not len(nodes):
+            break
+        index = np.arange(len(nodes))
+        first = np.full(size, len(nodes))
+        np.minimum.at(first, nodes.ravel(), np.repeat(index, nodes.shape[1]))
+        won = (first[nodes] == index[:, None]).all(axis=1)
+        used[nodes[won].ravel()] = True
+        yield nodes[won], edges[won]
+
+
+def run_matcher(full=False, max_length=None):
+    """Пересчитывает цепочки обмена; возвращает ChainMatcherRun.
+
+    Инкрементальный прогон удаляет цепочки с уже неактуальными
+    предложениями и ищет новые циклы только рядом с предложениями,
+    появившимися после прошлого прогона, и с освободившимися объявлениями.
+    """
+    started = time.perf_counter()
+    max_length = max_length or settings.BARTER_CHAIN_MAX_LENGTH
+    # берём до загрузки графа: созданное во время прогона попадёт в следующий
+    last_proposal_id = ExchangeProposal.objects.aggregate(last=Max('id'))['last'] or 0
+    previous = ChainMatcherRun.objects.order_by('-id').first()
+    graph = ProposalGraph.load()
+
+    with transaction.atomic():
+        if full or previous is None:
+            dropped = ExchangeChain.objects.all().delete()[0]
+            found = graph.match(max_length)
+        else:
+            chains = list(ExchangeChain.objects.values_list('id', 'ad_ids', 'proposal_ids'))
+            lengths = np.array([len(proposal_ids) for _, _, proposal_ids in chains], dtype=np.int64)
+            flat = np.array([pk for _, _, proposal_ids in chains for pk in proposal_ids], dtype=np.int64)
+            # цепочка жива, пока все её предложения остаются рёбрами графа
+            missing = np.bincount(
+                np.repeat(np.arange(len(chains)), lengths)[~np.isin(flat, graph.proposal_ids)],
+                minlength=len(chains),
+            )
+            valid = (missing == 0) & (lengths <= max_length)
+            kept = [chain for chain, ok in zip(chains, valid) if ok]
+            stale = [chain for chain, ok in zip(chains, valid) if not ok]
+            dropped = ExchangeChain.objects.filter(pk__in=[chain_id for chain_id, _, _ in stale]).delete()[0]
+
+            used = graph.node_mask([ad_id for _, ad_ids, _ in kept for ad_id in ad_ids])
+            new_edges = graph.proposal_ids > previous.last_proposal_id
+            touched = graph.node_mask([ad_id for _, ad_ids, _ in stale for ad_id in ad_ids])
+            touched[graph.sources[new_edges]] = True
+            touched[graph.targets[new_edges]] = True
+            # цикл через вершину t лежит в пересечении её прямой и обратной окрестностей
+            region = graph.ball(touched, max_length - 1) & graph.ball(touched, max_length - 1, reverse=True)
+            found = graph.match(max_length, mask=region, used=used)
+
+        authors = dict(Ad.objects.filter(pk__in={a for ad_ids, _ in found for a in ad_ids}).values_list('id', 'author_id'))
+        ExchangeChain.objects.bulk_create(
+            ExchangeChain(ad_ids=ad_ids, proposal_ids=proposal_ids, author_ids=sorted({authors[a] for a in ad_ids}))
+            for ad_ids, proposal_ids in found
+        )
+        return ChainMatcherRun.objects.create(
+            last_proposal_id=last_proposal_id,
+            full=full or previous is None,
+            created=len(found),
+            dropped=dropped,
+            duration=time.perf_counter() - started,
+        )
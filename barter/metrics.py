@@ -0,0 +1,335 @@
+"""Замеры времени ответов: Server-Timing, гистограммы для /metrics, медленные запросы.
+
+RequestMetricsMiddleware заводит на запрос RequestStats. Обёртка курсора
+(instrument_connection, ставится на каждое новое соединение) считает запросы
+к БД и их время и пишет в лог barter.slow_queries запросы дольше
+BARTER_SLOW_QUERY_MS вместе с представлением, которое их сделало.
+RequestTimingMixin отмечает работу обработчика DRF: она за вычетом БД —
+сериализация. Отрисовка — от process_template_response до конца ответа.
+Потоковые ответы (?stream=1, выгрузка /ads/bulk/) замеряются целиком: запросы
+при чтении тела тоже считаются, а гистограммы пишутся, когда поток дочитан
+или закрыт; Server-Timing у них — только до начала потока.
+
+Гистограммы копятся в памяти процесса и раз в BARTER_METRICS_FLUSH_SECONDS
+сливаются приращениями (cache.incr) в кэш metrics, общий для воркеров, так
+что /metrics показывает сумму по всем процессам. Отдаются они только
+внутренним адресам или по токену (BARTER_METRICS_*).
+"""
+import hmac
+import ipaddress
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import namedtuple
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseForbidden
+
+slow_query_logger = logging.getLogger('barter.slow_queries')
+
+Histogram = namedtuple('Histogram', ['name', 'documentation', 'buckets', 'scale'])
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# scale — во сколько раз сумма хранится точнее единицы: в кэше только целые
+HISTOGRAMS = {
+    'total': Histogram('barter_request_duration_seconds', 'Время ответа целиком', DURATION_BUCKETS, 10 ** 6),
+    'db': Histogram('barter_db_duration_seconds', 'Время запросов к БД за ответ', DURATION_BUCKETS, 10 ** 6),
+    'queries': Histogram('barter_db_queries', 'Запросов к БД за ответ', (1, 2, 3, 5, 10, 20, 50, 100), 1),
+    'serialize': Histogram(
+        'barter_serialize_duration_seconds', 'Обработчик DRF без запросов к БД', DURATION_BUCKETS, 10 ** 6
+    ),
+    'render': Histogram('barter_render_duration_seconds', 'Отрисовка ответа', DURATION_BUCKETS, 10 ** 6),
+    'size': Histogram(
+        'barter_response_size_bytes', 'Размер тела ответа', tuple(4 ** power for power in range(4, 12)), 1
+    ),
+}
+
+SERIES_KEY = 'barter:metrics:series'
+
+# остальные методы сводятся в один ряд "other": иначе каждый выдуманный клиентом метод — вечный ряд в кэше
+KNOWN_METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'))
+
+_stats = ContextVar('barter_request_stats', default=None)
+
+
+def current_stats():
+    """RequestStats текущего запроса или None вне запроса"""
+    return _stats.get()
+
+
+class RequestStats:
+    def __init__(self, request):
+        self.request = request
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = None
+        self.render_started = None
+        self._handler = None
+
+    @property
+    def view(self):
+        match = getattr(self.request, 'resolver_match', None)
+        return match.view_name if match is not None else '<unmatched>'
+
+    def start_handler(self):
+        self._handler = time.perf_counter(), self.db_time
+
+    def end_handler(self):
+        if self._handler is not None:
+            started, db_time = self._handler
+            self.serialize_time = time.perf_counter() - started - (self.db_time - db_time)
+            self._handler = None
+
+
+def record_query(execute, sql, params, many, context):
+    """Обёртка курсора: время и число запросов, лог медленных"""
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        stats = _stats.get()
+        # вне запросов (команды, миграции) долгие запросы ожидаемы и не пишутся
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += duration
+            if duration * 1000 >= settings.BARTER_SLOW_QUERY_MS:
+                slow_query_logger.warning(
+                    '%.1f ms [%s] %s: %s', duration * 1000, context['connection'].alias, stats.view, sql,
+                )
+
+
+def instrument_connection(connection):
+    # соединение переоткрывается с тем же объектом-обёрткой: не добавляем дважды
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class _Registry:
+    """Гистограммы процесса и их слив в общий кэш"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.series = set()
+        self.flushed = time.monotonic()
+
+    def observe(self, metric, labels, value):
+        histogram = HISTOGRAMS[metric]
+        series = (metric, *labels)
+        bucket = bisect_left(histogram.buckets, value)
+        with self.lock:
+            self.series.add(series)
+            for key, delta in ((_key(series, bucket), 1), (_key(series, 'sum'), round(value * histogram.scale))):
+                self.pending[key] = self.pending.get(key, 0) + delta
+
+    def flush(self, force=False):
+        if not force and time.monotonic() - self.flushed < settings.BARTER_METRICS_FLUSH_SECONDS:
+            return
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            series = set(self.series)
+            self.flushed = time.monotonic()
+
+        cache = caches['metrics']
+        for key, delta in pending.items():
+            if delta:
+                _incr(cache, key, delta)
+        # список рядов переписывается целиком; потерянный в гонке ряд вернёт следующий слив
+        known = cache.get(SERIES_KEY, set())
+        if not series <= known:
+            cache.set(SERIES_KEY, known | series, timeout=None)
+
+
+def _key(series, bucket):
+    return 'barter:metrics:' + ':'.join(map(str, series)) + f':{bucket}'
+
+
+def _incr(cache, key, delta):
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        if not cache.add(key, delta, timeout=None):
+            cache.incr(key, delta)
+
+
+registry = _Registry()
+
+
+def _labels(view, method):
+    return f'view="{view}",method="{method}"'
+
+
+def exposition():
+    """Все гистограммы в текстовом формате Prometheus"""
+    registry.flush(force=True)
+    cache = caches['metrics']
+    series = sorted(cache.get(SERIES_KEY, set()))
+    keys = [
+        _key(one, bucket)
+        for one in series
+        for bucket in (*range(len(HISTOGRAMS[one[0]].buckets) + 1), 'sum')
+    ]
+    values = cache.get_many(keys)
+
+    lines = []
+    for metric, histogram in HISTOGRAMS.items():
+        lines += [f'# HELP {histogram.name} {histogram.documentation}', f'# TYPE {histogram.name} histogram']
+        for _, view, method in (one for one in series if one[0] == metric):
+            labels = _labels(view, method)
+            total = 0
+            for bucket, bound in enumerate((*histogram.buckets, '+Inf')):
+                total += values.get(_key((metric, view, method), bucket), 0)
+                lines.append(f'{histogram.name}_bucket{{{labels},le="{bound}"}} {total}')
+            value_sum = values.get(_key((metric, view, method), 'sum'), 0) / histogram.scale
+            lines.append(f'{histogram.name}_sum{{{labels}}} {value_sum}')
+            lines.append(f'{histogram.name}_count{{{labels}}} {total}')
+    return '\n'.join(lines) + '\n'
+
+
+def _metrics_allowed(request):
+    """Bearer-токен BARTER_METRICS_TOKEN, если задан, иначе адрес из BARTER_METRICS_ALLOWED_NETWORKS"""
+    if settings.BARTER_METRICS_TOKEN:
+        return hmac.compare_digest(
+            request.headers.get('Authorization', ''), f'Bearer {settings.BARTER_METRICS_TOKEN}'
+        )
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network) for network in settings.BARTER_METRICS_ALLOWED_NETWORKS)
+
+
+def metrics_view(request):
+    # nginx закрывает /metrics снаружи, но gunicorn может быть доступен и напрямую
+    if not _metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class RequestTimingMixin:
+    """Отмечает работу обработчика DRF: между проверками доступа и finalize_response"""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        stats = current_stats()
+        if stats is not None:
+            stats.start_handler()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        stats = current_stats()
+        if stats is not None:
+            stats.end_handler()
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+def _ms(seconds):
+    return f'{seconds * 1000:.1f}'
+
+
+class RequestMetricsMiddleware:
+    """RequestStats на время запроса; Server-Timing и гистограммы по его итогам"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats = RequestStats(request)
+        token = _stats.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            _stats.reset(token)
+        return self.process_response(request, response, stats)
+
+    async def __acall__(self, request):
+        stats = RequestStats(request)
+        token = _stats.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _stats.reset(token)
+        return self.process_response(request, response, stats)
+
+    def process_template_response(self, request, response):
+        # вызывается последним перед response.render()
+        stats = current_stats()
+        if stats is not None:
+            stats.render_started = time.perf_counter()
+        return response
+
+    def process_response(self, request, response, stats):
+        if settings.BARTER_SERVER_TIMING:
+            # заголовки уходят до тела: у потокового ответа — замеры до начала потока
+            response['Server-Timing'] = ', '.join(
+                f'{name};dur={_ms(seconds)}' + (f';desc="{stats.queries} queries"' if name == 'db' else '')
+                for name, seconds in self._timings(stats).items() if seconds is not None
+            )
+        if not response.streaming:
+            self._observe(request, stats, len(response.content))
+            return response
+
+        # тело потока читает из БД уже после middleware: замеры — когда поток дочитан или закрыт,
+        # отрисовка — отдача тела
+        stats.render_started = time.perf_counter()
+        measure = self._measure_async if response.is_async else self._measure
+        response.streaming_content = measure(request, response.streaming_content, stats)
+        return response
+
+    def _measure(self, request, content, stats):
+        size = 0
+        try:
+            iterator = iter(content)
+            while True:
+                # запросы, сделанные при чтении куска, идут в статистику этого ответа
+                token = _stats.set(stats)
+                try:
+                    chunk = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    _stats.reset(token)
+                size += len(chunk)
+                yield chunk
+        finally:
+            self._observe(request, stats, size)
+
+    async def _measure_async(self, request, content, stats):
+        size = 0
+        try:
+            async for chunk in content:
+                size += len(chunk)
+                yield chunk
+        finally:
+            self._observe(request, stats, size)
+
+    def _timings(self, stats):
+        now = time.perf_counter()
+        return {
+            'db': stats.db_time,
+            'serialize': stats.serialize_time,
+            'render': None if stats.render_started is None else now - stats.render_started,
+            'total': now - stats.started,
+        }
+
+    def _observe(self, request, stats, size):
+        labels = (stats.view, request.method if request.method in KNOWN_METHODS else 'other')
+        for name, seconds in self._timings(stats).items():
+            if seconds is not None:
+                registry.observe(name, labels, seconds)
+        registry.observe('queries', labels, stats.queries)
+        registry.observe('size', labels, size)
+        registry.flush()
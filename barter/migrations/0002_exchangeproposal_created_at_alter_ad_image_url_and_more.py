@@ -0,0 +1,30 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:25
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('barter', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exchangeproposal',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Создано'),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='ad',
+            name='image_url',
+            field=models.CharField(blank=True, max_length=100, verbose_name='URL изображения'),
+        ),
+        migrations.AlterField(
+            model_name='ad',
+            name='is_active',
+            field=models.BooleanField(default=True, verbose_name='Активно'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # индексы строятся CONCURRENTLY, без блокировки записи
+    atomic = False
+
+    dependencies = [
+        ('barter', '0002_exchangeproposal_created_at_alter_ad_image_url_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='ad',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['id'], name='ad_active_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='ad',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['category', 'condition', '-created_at'], name='ad_active_cat_cond_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='ad',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['condition', '-created_at'], name='ad_active_cond_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='exchangeproposal',
+            index=models.Index(fields=['sender', 'status'], include=('receiver', 'created_at'), name='proposal_outbox_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='exchangeproposal',
+            index=models.Index(fields=['receiver', 'status'], include=('sender', 'created_at'), name='proposal_inbox_idx'),
+        ),
+        migrations.AlterField(
+            model_name='exchangeproposal',
+            name='receiver',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='received_proposals', to='barter.ad', verbose_name='Получатель'),
+        ),
+        migrations.AlterField(
+            model_name='exchangeproposal',
+            name='sender',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='sent_proposals', to='barter.ad', verbose_name='Отправитель'),
+        ),
+    ]
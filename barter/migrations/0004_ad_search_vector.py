@@ -0,0 +1,92 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:29
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+
+SEARCH_TRIGGER_SQL = '''
+CREATE FUNCTION barter_ad_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('russian', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(NEW.description, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(NEW.description, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER barter_ad_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, description ON barter_ad
+    FOR EACH ROW EXECUTE FUNCTION barter_ad_search_vector_update();
+'''
+
+DROP_SEARCH_TRIGGER_SQL = '''
+DROP TRIGGER IF EXISTS barter_ad_search_vector_trigger ON barter_ad;
+DROP FUNCTION IF EXISTS barter_ad_search_vector_update();
+'''
+
+BACKFILL_BATCH_SIZE = 10000
+
+
+def backfill_search_vector(apps, schema_editor):
+    """Заполняет search_vector пачками, чтобы не держать блокировку на всю таблицу"""
+    Ad = apps.get_model('barter', 'Ad')
+    last_id = 0
+    while True:
+        ids = list(
+            Ad.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:BACKFILL_BATCH_SIZE]
+        )
+        if not ids:
+            break
+        # UPDATE title вызывает триггер
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(
+                'UPDATE barter_ad SET title = title WHERE id BETWEEN %s AND %s', [ids[0], ids[-1]]
+            )
+        last_id = ids[-1]
+
+
+def create_trigram_index(apps, schema_editor):
+    """Триграммный индекс для опечаток, если в БД доступен pg_trgm"""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        cursor.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS ad_title_trgm_idx ON barter_ad USING gin (title gin_trgm_ops)'
+        )
+
+
+def drop_trigram_index(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('DROP INDEX CONCURRENTLY IF EXISTS ad_title_trgm_idx')
+
+
+class Migration(migrations.Migration):
+    # индексы строятся CONCURRENTLY, обновление идёт пачками в отдельных транзакциях
+    atomic = False
+
+    dependencies = [
+        ('barter', '0003_access_pattern_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ad',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunSQL(SEARCH_TRIGGER_SQL, DROP_SEARCH_TRIGGER_SQL),
+        migrations.RunPython(backfill_search_vector, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name='ad',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='ad_search_idx'),
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
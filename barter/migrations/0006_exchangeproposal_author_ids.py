@@ -0,0 +1,60 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+BACKFILL_BATCH_SIZE = 5000
+
+BACKFILL_SQL = '''
+UPDATE barter_exchangeproposal p
+SET sender_author_id = s.author_id, receiver_author_id = r.author_id
+FROM barter_ad s, barter_ad r
+WHERE p.sender_id = s.id AND p.receiver_id = r.id
+  AND p.id >= %s AND p.id < %s AND p.sender_author_id IS NULL
+'''
+
+
+def backfill_author_ids(apps, schema_editor):
+    """Заполняет копии авторов диапазонами id, каждый диапазон — своя короткая транзакция"""
+    ExchangeProposal = apps.get_model('barter', 'ExchangeProposal')
+    bounds = ExchangeProposal.objects.aggregate(low=models.Min('id'), high=models.Max('id'))
+    if bounds['low'] is None:
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for start in range(bounds['low'], bounds['high'] + 1, BACKFILL_BATCH_SIZE):
+            cursor.execute(BACKFILL_SQL, [start, start + BACKFILL_BATCH_SIZE])
+
+
+class Migration(migrations.Migration):
+    # без общей транзакции: пачки коммитятся по отдельности, индексы строятся CONCURRENTLY
+    atomic = False
+
+    dependencies = [
+        ('barter', '0005_ad_feed_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exchangeproposal',
+            name='receiver_author',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор получателя'),
+        ),
+        migrations.AddField(
+            model_name='exchangeproposal',
+            name='sender_author',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор отправителя'),
+        ),
+        migrations.RunPython(backfill_author_ids, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name='exchangeproposal',
+            index=models.Index(fields=['sender_author', 'status', '-created_at'], include=('id',), name='proposal_sender_author_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='exchangeproposal',
+            index=models.Index(fields=['receiver_author', 'status', '-created_at'], include=('id',), name='proposal_receiver_author_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:06
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('barter', '0007_row_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChainMatcherRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_proposal_id', models.BigIntegerField(verbose_name='Последнее учтённое предложение')),
+                ('full', models.BooleanField(verbose_name='Полный пересчёт')),
+                ('created', models.PositiveIntegerField(verbose_name='Найдено цепочек')),
+                ('dropped', models.PositiveIntegerField(verbose_name='Удалено цепочек')),
+                ('duration', models.FloatField(verbose_name='Длительность, с')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+            ],
+            options={
+                'verbose_name': 'Прогон поиска цепочек',
+                'verbose_name_plural': 'Прогоны поиска цепочек',
+            },
+        ),
+        migrations.CreateModel(
+            name='ExchangeChain',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ad_ids', django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), size=None, verbose_name='Объявления')),
+                ('proposal_ids', django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), size=None, verbose_name='Предложения')),
+                ('author_ids', django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), size=None, verbose_name='Участники')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+            ],
+            options={
+                'verbose_name': 'Цепочка обмена',
+                'verbose_name_plural': 'Цепочки обмена',
+                'indexes': [django.contrib.postgres.indexes.GinIndex(fields=['author_ids'], name='chain_author_ids_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('barter', '0008_exchange_chains'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AffinityRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('watermark', models.DateTimeField(verbose_name='Учтено до')),
+                ('full', models.BooleanField(verbose_name='Полный пересчёт')),
+                ('proposals', models.PositiveIntegerField(verbose_name='Учтено предложений')),
+                ('duration', models.FloatField(verbose_name='Длительность, с')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+            ],
+            options={
+                'verbose_name': 'Прогон пересчёта сродства',
+                'verbose_name_plural': 'Прогоны пересчёта сродства',
+            },
+        ),
+        migrations.CreateModel(
+            name='CategoryAffinity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weight', models.FloatField(default=0, verbose_name='Вес')),
+                ('source', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='barter.category', verbose_name='Из категории')),
+                ('target', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='barter.category', verbose_name='В категорию')),
+            ],
+            options={
+                'verbose_name': 'Сродство категорий',
+                'verbose_name_plural': 'Сродство категорий',
+                'constraints': [models.UniqueConstraint(fields=('source', 'target'), name='category_affinity_pair_uniq')],
+            },
+        ),
+    ]
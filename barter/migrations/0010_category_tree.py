@@ -0,0 +1,100 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Триггеры уровня оператора с таблицами переходов: bulk_create и update()
+# на тысячи объявлений дают одно изменение счётчика на категорию. Категории
+# обновляются по возрастанию id, чтобы параллельные записи не взаимоблокировались.
+COUNT_TRIGGER_SQL = '''
+CREATE FUNCTION barter_category_active_ads_count() RETURNS trigger AS $$
+DECLARE
+    -- таблица переходов есть только у своей операции, поэтому запрос собирается по TG_OP
+    added text := 'SELECT category_id, 1 AS delta FROM new_rows WHERE is_active AND category_id IS NOT NULL';
+    removed text := 'SELECT category_id, -1 AS delta FROM old_rows WHERE is_active AND category_id IS NOT NULL';
+    changes text;
+    change record;
+BEGIN
+    changes := CASE TG_OP
+        WHEN 'INSERT' THEN added
+        WHEN 'DELETE' THEN removed
+        ELSE added || ' UNION ALL ' || removed
+    END;
+    FOR change IN EXECUTE
+        'SELECT category_id, sum(delta) AS delta FROM (' || changes || ') AS changes '
+        'GROUP BY category_id HAVING sum(delta) <> 0 ORDER BY category_id'
+    LOOP
+        UPDATE barter_category SET active_ads_count = active_ads_count + change.delta
+        WHERE id = change.category_id;
+    END LOOP;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER barter_ad_count_insert_trigger
+    AFTER INSERT ON barter_ad REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION barter_category_active_ads_count();
+
+CREATE TRIGGER barter_ad_count_update_trigger
+    AFTER UPDATE ON barter_ad REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION barter_category_active_ads_count();
+
+CREATE TRIGGER barter_ad_count_delete_trigger
+    AFTER DELETE ON barter_ad REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION barter_category_active_ads_count();
+'''
+
+DROP_COUNT_TRIGGER_SQL = '''
+DROP TRIGGER IF EXISTS barter_ad_count_insert_trigger ON barter_ad;
+DROP TRIGGER IF EXISTS barter_ad_count_update_trigger ON barter_ad;
+DROP TRIGGER IF EXISTS barter_ad_count_delete_trigger ON barter_ad;
+DROP FUNCTION IF EXISTS barter_category_active_ads_count();
+'''
+
+# Существующие категории становятся корнями; счётчики считаются уже под
+# триггерами, в той же транзакции, так что параллельные записи не теряются
+BACKFILL_SQL = '''
+UPDATE barter_category AS category SET
+    path = category.id || '/',
+    depth = 0,
+    active_ads_count = (
+        SELECT count(*) FROM barter_ad WHERE barter_ad.category_id = category.id AND barter_ad.is_active
+    );
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('barter', '0009_category_affinity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='active_ads_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Активных объявлений'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Глубина'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='children', to='barter.category', verbose_name='Родительская категория'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(default='', editable=False, max_length=255, verbose_name='Путь'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['path'], name='category_path_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.RunSQL(COUNT_TRIGGER_SQL, DROP_COUNT_TRIGGER_SQL),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+    ]
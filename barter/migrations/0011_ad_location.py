@@ -0,0 +1,55 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:24
+
+import django.core.validators
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+def create_geography_index(apps, schema_editor):
+    """GiST-индекс по geography для ST_DWithin, если в БД доступен PostGIS"""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'postgis'")
+        if cursor.fetchone() is None:
+            return
+        cursor.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS ad_active_geography_idx ON barter_ad USING gist '
+            '((ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)::geography)) WHERE is_active'
+        )
+
+
+def drop_geography_index(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('DROP INDEX CONCURRENTLY IF EXISTS ad_active_geography_idx')
+
+
+class Migration(migrations.Migration):
+    # индексы строятся CONCURRENTLY
+    atomic = False
+
+    dependencies = [
+        ('barter', '0010_category_tree'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ad',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(-90), django.core.validators.MaxValueValidator(90)], verbose_name='Широта'),
+        ),
+        migrations.AddField(
+            model_name='ad',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(-180), django.core.validators.MaxValueValidator(180)], verbose_name='Долгота'),
+        ),
+        AddIndexConcurrently(
+            model_name='ad',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['latitude', 'longitude'], name='ad_active_location_idx'),
+        ),
+        migrations.RunPython(create_geography_index, drop_geography_index),
+        migrations.AddConstraint(
+            model_name='ad',
+            constraint=models.CheckConstraint(condition=models.Q(models.Q(('latitude__isnull', True), ('longitude__isnull', True)), models.Q(('latitude__range', (-90, 90)), ('longitude__range', (-180, 180))), _connector='OR'), name='ad_location_valid'),
+        ),
+    ]
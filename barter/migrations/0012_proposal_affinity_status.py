@@ -0,0 +1,30 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def forget_runs(apps, schema_editor):
+    # учтённые статусы до этой миграции неизвестны: следующий update_affinity будет полным
+    apps.get_model('barter', 'AffinityRun').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('barter', '0011_ad_location'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exchangeproposal',
+            name='affinity_status',
+            field=models.CharField(choices=[('pending', 'На рассмотрении'), ('accepted', 'Принято'), ('rejected', 'Отклонено')], editable=False, max_length=10, null=True, verbose_name='Учтено в сродстве как'),
+        ),
+        migrations.AddIndex(
+            model_name='exchangeproposal',
+            index=models.Index(condition=models.Q(('affinity_status__isnull', True), models.Q(('affinity_status', models.F('status')), _negated=True), _connector='OR'), fields=['id'], name='proposal_affinity_stale_idx'),
+        ),
+        migrations.RunPython(forget_runs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+from django.contrib.postgres.operations import AddConstraintNotValid, ValidateConstraint
+from django.db import migrations, models
+
+
+def drop_half_locations(apps, schema_editor):
+    """Половина пары координат бесполезна для поиска рядом: обе в NULL"""
+    Ad = apps.get_model('barter', 'Ad')
+    Ad.objects.filter(
+        models.Q(latitude__isnull=True, longitude__isnull=False)
+        | models.Q(latitude__isnull=False, longitude__isnull=True)
+    ).update(latitude=None, longitude=None)
+
+
+class Migration(migrations.Migration):
+    # NOT VALID ставится под короткой блокировкой, а VALIDATE в своей транзакции
+    # проверяет таблицу, не блокируя запись
+    atomic = False
+
+    dependencies = [
+        ('barter', '0012_proposal_affinity_status'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='ad',
+            name='ad_location_valid',
+        ),
+        AddConstraintNotValid(
+            model_name='ad',
+            constraint=models.CheckConstraint(condition=models.Q(models.Q(('latitude__isnull', True), ('longitude__isnull', True)), models.Q(('latitude__isnull', False), ('latitude__range', (-90, 90)), ('longitude__isnull', False), ('longitude__range', (-180, 180))), _connector='OR'), name='ad_location_valid'),
+        ),
+        migrations.RunPython(drop_half_locations, migrations.RunPython.noop),
+        ValidateConstraint(
+            model_name='ad',
+            name='ad_location_valid',
+        ),
+    ]
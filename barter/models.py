@@ -1,4 +1,10 @@
-from django.db import models
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.functions import Concat, Substr
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import get_user_model
 
@@ -7,15 +13,89 @@ User = get_user_model()
 
 
 class Category(models.Model):
+    PATH_SEPARATOR = '/'
+    CYCLE_MESSAGE = _('Категория не может быть вложена в себя или своё поддерево')
+
     title = models.CharField(max_length=100, verbose_name=_('Название категории'))
+    parent = models.ForeignKey(
+        'self', related_name='children', on_delete=models.PROTECT, null=True, blank=True,
+        verbose_name=_('Родительская категория')
+    )
+    # Материализованный путь из id предков и своего: "1/5/12/"; поддерево — path LIKE '1/5/%'
+    path = models.CharField(max_length=255, editable=False, default='', verbose_name=_('Путь'))
+    depth = models.PositiveSmallIntegerField(editable=False, default=0, verbose_name=_('Глубина'))
+    # Активные объявления прямо в этой категории; ведёт триггер БД (см. миграцию 0010)
+    active_ads_count = models.PositiveIntegerField(
+        editable=False, default=0, verbose_name=_('Активных объявлений')
+    )
 
     class Meta:
         verbose_name = _('Категория')
         verbose_name_plural = _('Категории')
+        indexes = [
+            models.Index(fields=['path'], opclasses=['varchar_pattern_ops'], name='category_path_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_parent_id = instance.__dict__.get('parent_id')
+        return instance
+
+    def clean(self):
+        # не на уровне модуля: `from .models import *` в forms/views подменил бы ValidationError DRF
+        from django.core.exceptions import ValidationError
+
+        super().clean()
+        if self.pk is None or self.parent_id is None:
+            return
+        # пути из БД: объекты в памяти могли устареть после переноса
+        paths = dict(Category.objects.filter(pk__in=[self.pk, self.parent_id]).values_list('pk', 'path'))
+        own_path, parent_path = paths.get(self.pk), paths.get(self.parent_id)
+        if own_path and parent_path and parent_path.startswith(own_path):
+            raise ValidationError({'parent': self.CYCLE_MESSAGE})
+
+    def _build_path(self, using=None):
+        # путь родителя читаем из БД: объект self.parent мог устареть после переноса
+        parent_path = Category.objects.using(using).values_list('path', flat=True).get(
+            pk=self.parent_id
+        ) if self.parent_id else ''
+        # последний рубеж для сохранения мимо clean(): формы и админка ловят это раньше
+        if self.path and parent_path.startswith(self.path):
+            raise ValueError(self.CYCLE_MESSAGE)
+        return f'{parent_path}{self.pk}{self.PATH_SEPARATOR}', parent_path.count(self.PATH_SEPARATOR)
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using')
+        if self._state.adding:
+            with transaction.atomic(using=using):
+                super().save(*args, **kwargs)
+                self.path, self.depth = self._build_path(using)
+                Category.objects.using(using).filter(pk=self.pk).update(path=self.path, depth=self.depth)
+            self._loaded_parent_id = self.parent_id
+            return
+
+        # счётчик ведёт триггер, не перезаписываем его прочитанным значением
+        if kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'active_ads_count'
+            ]
+        with transaction.atomic(using=using):
+            if self.parent_id != getattr(self, '_loaded_parent_id', None):
+                old_path, old_depth = self.path, self.depth
+                self.path, self.depth = self._build_path(using)
+                # весь перенос поддерева — один UPDATE по префиксу пути
+                Category.objects.using(using).filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                    path=Concat(models.Value(self.path), Substr('path', len(old_path) + 1)),
+                    depth=F('depth') + (self.depth - old_depth),
+                )
+            super().save(*args, **kwargs)
+        self._loaded_parent_id = self.parent_id
+
 
 class Ad(models.Model):
     CONDITION_CHOICES = [
@@ -42,15 +122,85 @@ class Ad(models.Model):
         default='used',
         verbose_name='Состояние'
     )
+    # Координаты в градусах WGS 84; поиск рядом — barter.geo
+    latitude = models.FloatField(
+        null=True, blank=True, validators=[MinValueValidator(-90), MaxValueValidator(90)],
+        verbose_name=_('Широта')
+    )
+    longitude = models.FloatField(
+        null=True, blank=True, validators=[MinValueValidator(-180), MaxValueValidator(180)],
+        verbose_name=_('Долгота')
+    )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Создано'))
+    # Версия строки для ETag/If-Match; при queryset.update() выставлять вручную
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_('Изменено'))
+    # Заполняется триггером БД из title и description (см. миграцию 0004)
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         verbose_name = _('Объявление')
         verbose_name_plural = _('Объявления')
+        indexes = [
+            # Списки всегда идут по активным объявлениям
+            models.Index(fields=['id'], condition=models.Q(is_active=True), name='ad_active_idx'),
+            # Курсорная пагинация по (created_at, id)
+            models.Index(
+                fields=['-created_at', '-id'], condition=models.Q(is_active=True), name='ad_active_feed_idx'
+            ),
+            models.Index(
+                fields=['category', 'condition', '-created_at'],
+                condition=models.Q(is_active=True),
+                name='ad_active_cat_cond_idx',
+            ),
+            models.Index(
+                fields=['condition', '-created_at'],
+                condition=models.Q(is_active=True),
+                name='ad_active_cond_idx',
+            ),
+            GinIndex(fields=['search_vector'], name='ad_search_idx'),
+            # Ограничивающий прямоугольник в поиске рядом (barter.geo)
+            models.Index(
+                fields=['latitude', 'longitude'], condition=models.Q(is_active=True), name='ad_active_location_idx'
+            ),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=(
+                    models.Q(latitude__isnull=True, longitude__isnull=True)
+                    # без isnull=False половина пары даёт NULL, а NULL CHECK пропускает
+                    | models.Q(
+                        latitude__isnull=False, longitude__isnull=False,
+                        latitude__range=(-90, 90), longitude__range=(-180, 180),
+                    )
+                ),
+                name='ad_location_valid',
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_author_id = instance.__dict__.get('author_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        loaded_author_id = getattr(self, '_loaded_author_id', None)
+        author_changed = loaded_author_id is not None and loaded_author_id != self.author_id
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+            # Предложения хранят копию автора объявления
+            if author_changed:
+                self.sent_proposals.update(sender_author_id=self.author_id)
+                self.received_proposals.update(receiver_author_id=self.author_id)
+        self._loaded_author_id = self.author_id
+
+
+# Предложения, ещё не учтённые в сродстве категорий: новые и сменившие статус после учёта
+AFFINITY_STALE = models.Q(affinity_status__isnull=True) | ~models.Q(affinity_status=F('status'))
+
 
 class ExchangeProposal(models.Model):
     STATUS_CHOICES = [
@@ -59,12 +209,131 @@ class ExchangeProposal(models.Model):
         ('rejected', 'Отклонено')
     ]
 
-    sender = models.ForeignKey(Ad, related_name='sent_proposals', on_delete=models.CASCADE, verbose_name=_('Отправитель'))
-    receiver = models.ForeignKey(Ad, related_name='received_proposals', on_delete=models.CASCADE, verbose_name=_('Получатель'))
+    sender = models.ForeignKey(
+        Ad, related_name='sent_proposals', on_delete=models.CASCADE, db_index=False, verbose_name=_('Отправитель')
+    )
+    receiver = models.ForeignKey(
+        Ad, related_name='received_proposals', on_delete=models.CASCADE, db_index=False, verbose_name=_('Получатель')
+    )
+    # Копии Ad.author_id отправителя и получателя: права и ленты без join'а с Ad
+    sender_author = models.ForeignKey(
+        User, related_name='+', on_delete=models.CASCADE, null=True, editable=False, db_index=False,
+        verbose_name=_('Автор отправителя')
+    )
+    receiver_author = models.ForeignKey(
+        User, related_name='+', on_delete=models.CASCADE, null=True, editable=False, db_index=False,
+        verbose_name=_('Автор получателя')
+    )
     comment = models.CharField(max_length=500, verbose_name=_('Комментарий'))
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    # Статус, с которым предложение учтено в CategoryAffinity (barter.recommendations)
+    affinity_status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, null=True, editable=False, verbose_name=_('Учтено в сродстве как')
+    )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Создано'))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_('Изменено'))
 
     class Meta:
         verbose_name = _('Предложение обмена')
         verbose_name_plural = _('Предложения обмена')
+        indexes = [
+            # Исходящие и входящие; include даёт index-only scan для ленты
+            models.Index(
+                fields=['sender', 'status'], include=['receiver', 'created_at'], name='proposal_outbox_idx'
+            ),
+            models.Index(
+                fields=['receiver', 'status'], include=['sender', 'created_at'], name='proposal_inbox_idx'
+            ),
+            # Ветки ленты пользователя (ProposalFeed)
+            models.Index(
+                fields=['sender_author', 'status', '-created_at'], include=['id'], name='proposal_sender_author_idx'
+            ),
+            models.Index(
+                fields=['receiver_author', 'status', '-created_at'], include=['id'],
+                name='proposal_receiver_author_idx'
+            ),
+            # Очередь update_affinity: частичный индекс, пока строки ждут учёта
+            models.Index(
+                fields=['id'], condition=AFFINITY_STALE, name='proposal_affinity_stale_idx'
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_ad_ids = (instance.__dict__.get('sender_id'), instance.__dict__.get('receiver_id'))
+        return instance
+
+    def save(self, *args, **kwargs):
+        # копии авторов читаются из объявлений только для новых предложений и при смене объявления
+        loaded_sender_id, loaded_receiver_id = getattr(self, '_loaded_ad_ids', (None, None))
+        if self._state.adding or loaded_sender_id != self.sender_id:
+            self.sender_author_id = self.sender.author_id
+        if self._state.adding or loaded_receiver_id != self.receiver_id:
+            self.receiver_author_id = self.receiver.author_id
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # affinity_status ведёт только update_affinity: копия в памяти может быть устаревшей
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'affinity_status'
+            ]
+        super().save(*args, **kwargs)
+        self._loaded_ad_ids = (self.sender_id, self.receiver_id)
+
+
+class ExchangeChain(models.Model):
+    """Цепочка обмена по кругу, найденная barter.matching"""
+    # Объявления и предложения в порядке обхода: proposal_ids[i] ведёт из ad_ids[i] в ad_ids[i + 1]
+    ad_ids = ArrayField(models.BigIntegerField(), verbose_name=_('Объявления'))
+    proposal_ids = ArrayField(models.BigIntegerField(), verbose_name=_('Предложения'))
+    author_ids = ArrayField(models.BigIntegerField(), verbose_name=_('Участники'))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Создано'))
+
+    class Meta:
+        verbose_name = _('Цепочка обмена')
+        verbose_name_plural = _('Цепочки обмена')
+        indexes = [
+            # Цепочки пользователя: author_ids @> ARRAY[id]
+            GinIndex(fields=['author_ids'], name='chain_author_ids_idx'),
+        ]
+
+
+class ChainMatcherRun(models.Model):
+    """Прогон поиска цепочек; инкрементальный прогон продолжает с last_proposal_id"""
+    last_proposal_id = models.BigIntegerField(verbose_name=_('Последнее учтённое предложение'))
+    full = models.BooleanField(verbose_name=_('Полный пересчёт'))
+    created = models.PositiveIntegerField(verbose_name=_('Найдено цепочек'))
+    dropped = models.PositiveIntegerField(verbose_name=_('Удалено цепочек'))
+    duration = models.FloatField(verbose_name=_('Длительность, с'))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Создано'))
+
+    class Meta:
+        verbose_name = _('Прогон поиска цепочек')
+        verbose_name_plural = _('Прогоны поиска цепочек')
+
+
+class CategoryAffinity(models.Model):
+    """Взвешенное число предложений из категории source в категорию target (barter.recommendations)"""
+    source = models.ForeignKey(Category, related_name='+', on_delete=models.CASCADE, verbose_name=_('Из категории'))
+    target = models.ForeignKey(Category, related_name='+', on_delete=models.CASCADE, verbose_name=_('В категорию'))
+    weight = models.FloatField(default=0, verbose_name=_('Вес'))
+
+    class Meta:
+        verbose_name = _('Сродство категорий')
+        verbose_name_plural = _('Сродство категорий')
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'target'], name='category_affinity_pair_uniq'),
+        ]
+
+
+class AffinityRun(models.Model):
+    """Прогон update_affinity; watermark — время БД, к которому учтены все закоммиченные предложения"""
+    watermark = models.DateTimeField(verbose_name=_('Учтено до'))
+    full = models.BooleanField(verbose_name=_('Полный пересчёт'))
+    proposals = models.PositiveIntegerField(verbose_name=_('Учтено предложений'))
+    duration = models.FloatField(verbose_name=_('Длительность, с'))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Создано'))
+
+    class Meta:
+        verbose_name = _('Прогон пересчёта сродства')
+        verbose_name_plural = _('Прогоны пересчёта сродства')
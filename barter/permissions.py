@@ -6,7 +6,7 @@ class IsAdAuthorOrReadOnly(BasePermission):
         if request.method in ('GET', 'HEAD', 'OPTIONS'):
             return True
 
-        return obj.author == request.user
+        return obj.author_id == request.user.id
 
 
 class IsProposalAuthorOrReadOnly(BasePermission):
@@ -14,4 +14,10 @@ class IsProposalAuthorOrReadOnly(BasePermission):
         if request.method in ('GET', 'HEAD', 'OPTIONS'):
             return True
 
-        return obj.sender.author == request.user
+        return obj.sender_author_id == request.user.id
+
+
+class IsProposalReceiver(BasePermission):
+    """Решение по предложению принимает автор объявления-получателя"""
+    def has_object_permission(self, request, view, obj):
+        return obj.receiver_author_id == request.user.id
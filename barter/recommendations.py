@@ -0,0 +1,236 @@
+"""Рекомендации «на что можно обменять» по сродству категорий.
+
+Матрица counts[i, j] — взвешенное число предложений из категории i в
+категорию j; принятые весят больше ожидающих, отклонённые почти ничего.
+Счётчики хранятся в CategoryAffinity и обновляются командой
+update_affinity: инкрементально по предложениям, ещё не учтённым с текущим
+статусом, или полностью (--full). Для ответа строки нормируются со
+сглаживанием к общей популярности категорий, а индекс держится в памяти
+процесса до смены поколения в кэше.
+"""
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, transaction
+
+from .cache import bump_generations, get_generations
+from .models import AFFINITY_STALE, Ad, AffinityRun, Category, CategoryAffinity, ExchangeProposal
+
+AFFINITY_GENERATION = 'affinity'
+
+STATUS_WEIGHTS = {'pending': 1.0, 'accepted': 5.0, 'rejected': 0.2}
+
+
+def _weights(statuses):
+    return np.array([STATUS_WEIGHTS.get(status, 0.0) for status in statuses], dtype=np.float64)
+
+
+def _positions(category_ids, values):
+    """Индексы категорий в category_ids и маска тех, что там есть"""
+    values = np.asarray(values, dtype=np.int64)
+    positions = np.searchsorted(category_ids, values)
+    known = positions < len(category_ids)
+    known[known] = category_ids[positions[known]] == values[known]
+    return positions, known
+
+
+def count_matrix(category_ids, sources, targets, weights):
+    """Сумма весов по парам категорий одним bincount"""
+    size = len(category_ids)
+    source_index, source_known = _positions(category_ids, sources)
+    target_index, target_known = _positions(category_ids, targets)
+    known = source_known & target_known
+    codes = source_index[known] * size + target_index[known]
+    return np.bincount(codes, weights=np.asarray(weights)[known], minlength=size * size).reshape(size, size)
+
+
+# Берёт и помечает учтёнными строки одним запросом под блокировкой: статус,
+# который увидел пересчёт, и статус, записанный как учтённый, всегда совпадают
+_CLAIM_SQL = """
+WITH claimed (id, status, source, target, counted) AS ({select})
+UPDATE barter_exchangeproposal AS proposal SET affinity_status = claimed.status
+FROM claimed WHERE proposal.id = claimed.id
+RETURNING claimed.id, claimed.source, claimed.target, claimed.status, claimed.counted
+"""
+
+
+def _claim_batch(full, after, size):
+    """Следующие size предложений с id > after, помеченные учтёнными.
+
+    Строки — (id, категория отправителя, категория получателя, статус,
+    учтённый статус). Блокируются они по возрастанию id, как в barter.transitions, так что
+    пересчёт не взаимоблокируется с принятием предложений.
+    """
+    queryset = ExchangeProposal.objects.filter(pk__gt=after)
+    if not full:
+        queryset = queryset.filter(AFFINITY_STALE)
+    select, params = queryset.select_for_update(of=('self',)).order_by('pk').values_list(
+        'id', 'status', 'sender__category_id', 'receiver__category_id', 'affinity_status'
+    )[:size].query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(_CLAIM_SQL.format(select=select), params)
+        return cursor.fetchall()
+
+
+def _delta(category_ids, claimed, full):
+    rows = [row[1:] for row in claimed if row[1] is not None and row[2] is not None]
+    if not rows:
+        return np.zeros((len(category_ids), len(category_ids)))
+    sources, targets, statuses, counted = zip(*rows)
+    weights = _weights(statuses)
+    if not full:
+        weights -= _weights(counted)
+    return count_matrix(category_ids, sources, targets, weights)
+
+
+def _add_weights(category_ids, delta):
+    """Прибавляет delta к строкам CategoryAffinity"""
+    changed = np.argwhere(delta != 0)
+    existing = {
+        (cell.source_id, cell.target_id): cell
+        for cell in CategoryAffinity.objects.filter(source_id__in=set(category_ids[changed[:, 0]].tolist()))
+    }
+    new, updated = [], []
+    for i, j in changed:
+        source, target, weight = int(category_ids[i]), int(category_ids[j]), float(delta[i, j])
+        cell = existing.get((source, target))
+        if cell is None:
+            new.append(CategoryAffinity(source_id=source, target_id=target, weight=weight))
+        else:
+            cell.weight += weight
+            updated.append(cell)
+    CategoryAffinity.objects.bulk_create(new)
+    CategoryAffinity.objects.bulk_update(updated, ['weight'])
+
+
+def update_affinity(full=False, batch_size=None):
+    """Пересчитывает счётчики сродства; возвращает AffinityRun.
+
+    Каждое предложение помнит статус, с которым учтено (affinity_status):
+    инкрементальный прогон берёт по частичному индексу новые и сменившие
+    статус предложения и заменяет вес учтённого статуса весом нового, так
+    что повторное сохранение и поздний коммит не дают двойного счёта.
+    Полный пересчёт проходит все строки таблицы. Удалённые предложения и
+    смена категории объявления учитываются только полным пересчётом.
+
+    Строки берутся пачками по batch_size, каждая в своей транзакции: принятия
+    и отклонения ждут только текущую пачку. Инкрементальный прогон сразу
+    прибавляет приращение пачки к CategoryAffinity; полный копит матрицу в
+    памяти и заменяет таблицу в последней транзакции, поэтому прерванный
+    полный пересчёт надо повторить.
+    """
+    started = time.perf_counter()
+    batch_size = batch_size or settings.BARTER_AFFINITY_BATCH_SIZE
+    previous = AffinityRun.objects.order_by('-id').first()
+    full = full or previous is None
+    with connection.cursor() as cursor:
+        # часы БД, как у updated_at из Now(): всё, что закоммичено до прогона, им учтено
+        cursor.execute('SELECT now()')
+        watermark, = cursor.fetchone()
+    category_ids = np.array(sorted(Category.objects.values_list('pk', flat=True)), dtype=np.int64)
+
+    counts = np.zeros((len(category_ids), len(category_ids)))
+    proposals, after = 0, 0
+    while True:
+        with transaction.atomic():
+            claimed = _claim_batch(full, after, batch_size)
+            if not claimed:
+                break
+            proposals += len(claimed)
+            after = max(row[0] for row in claimed)
+            delta = _delta(category_ids, claimed, full)
+            if full:
+                counts += delta
+            else:
+                _add_weights(category_ids, delta)
+
+    with transaction.atomic():
+        if full:
+            CategoryAffinity.objects.all().delete()
+            _add_weights(category_ids, counts)
+        run = AffinityRun.objects.create(
+            watermark=watermark, full=full, proposals=proposals, duration=time.perf_counter() - started
+        )
+        bump_generations(AFFINITY_GENERATION)
+    return run
+
+
+class AffinityIndex:
+    """Нормированная матрица сродства категорий в памяти"""
+
+    def __init__(self, category_ids, counts, smoothing=None):
+        self.category_ids = np.asarray(category_ids, dtype=np.int64)
+        smoothing = settings.BARTER_AFFINITY_SMOOTHING if smoothing is None else smoothing
+        counts = np.clip(counts, 0, None)
+
+        # популярность категорий как получателей — априорное распределение
+        popularity = counts.sum(axis=0) + 1.0
+        self.popularity = popularity / popularity.sum()
+        totals = counts.sum(axis=1, keepdims=True)
+        self.affinity = (counts + smoothing * self.popularity) / (totals + smoothing)
+
+    @classmethod
+    def build(cls):
+        # с основной БД, как и дерево категорий: индекс живёт до смены поколения
+        category_ids = np.array(
+            sorted(Category.objects.using(DEFAULT_DB_ALIAS).values_list('pk', flat=True)), dtype=np.int64
+        )
+        rows = list(CategoryAffinity.objects.using(DEFAULT_DB_ALIAS).values_list('source_id', 'target_id', 'weight'))
+        if rows:
+            sources, targets, weights = zip(*rows)
+            counts = count_matrix(category_ids, sources, targets, np.array(weights))
+        else:
+            counts = np.zeros((len(category_ids), len(category_ids)))
+        return cls(category_ids, counts)
+
+    def scores(self, own_category_ids):
+        """Оценка каждой категории как цели обмена для набора своих категорий"""
+        positions, known = _positions(self.category_ids, own_category_ids)
+        if not known.any():
+            return self.popularity
+        weights = np.bincount(positions[known], minlength=len(self.category_ids))
+        return weights @ self.affinity / weights.sum()
+
+    def top_categories(self, own_category_ids, limit):
+        scores = self.scores(own_category_ids)
+        top = np.argsort(-scores, kind='stable')[:limit]
+        return [(int(self.category_ids[i]), float(scores[i])) for i in top]
+
+
+_index = None
+_index_key = None
+
+
+def get_index():
+    """Индекс процесса; перестраивается при смене поколения или по возрасту"""
+    global _index, _index_key
+    generation, = get_generations(AFFINITY_GENERATION)
+    # поколение из locmem не видно другим процессам, поэтому есть и предельный возраст
+    key = (generation, int(time.monotonic() // settings.BARTER_AFFINITY_MAX_AGE))
+    if _index is None or key != _index_key:
+        _index, _index_key = AffinityIndex.build(), key
+    return _index
+
+
+def recommend(user, ad_id=None, limit=20):
+    """[(объявление id, оценка)] — чужие активные объявления из самых близких категорий"""
+    own = Ad.objects.filter(author=user, is_active=True, category__isnull=False)
+    if ad_id is not None:
+        own = own.filter(pk=ad_id)
+    own_categories = list(own.values_list('category_id', flat=True))
+
+    categories = get_index().top_categories(own_categories, settings.BARTER_RECOMMENDATION_CATEGORIES)
+    if not categories:
+        return []
+    score = dict(categories)
+
+    # по ветке на категорию: каждая идёт по индексу (category, ..., -created_at)
+    branches = [
+        Ad.objects.filter(is_active=True, category_id=category_id).exclude(author=user)
+        .order_by('-created_at').values_list('id', 'category_id', 'created_at')[:limit]
+        for category_id, _ in categories
+    ]
+    candidates = branches[0].union(*branches[1:], all=True) if len(branches) > 1 else branches[0]
+    ranked = sorted(candidates, key=lambda row: (-score[row[1]], -row[2].timestamp(), -row[0]))[:limit]
+    return [(ad_id, score[category_id]) for ad_id, category_id, _ in ranked]
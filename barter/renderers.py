@@ -0,0 +1,98 @@
+import csv
+import io
+from itertools import islice
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer на orjson; без orjson — стандартный.
+
+    Вывод совпадает с JSONRenderer побайтно, кроме чисел с плавающей точкой:
+    значения те же, но запись другая (0.00001 вместо 1e-05, 1e16
+    вместо 1e+16), а NaN и бесконечности orjson пишет как null, тогда как
+    JSONRenderer при STRICT_JSON падает. Отступы (?indent / Accept: ...;
+    indent=N) и настройки DRF, которые orjson не умеет (UNICODE_JSON=False,
+    COMPACT_JSON=False), уходят в JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {})):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            # datetime отдаём энкодеру DRF: у него свой формат (Z, миллисекунды)
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # как и JSONRenderer, экранируем разделители строк для JavaScript
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Список — по объекту JSON на строку, всё остальное — одной строкой"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return b''.join(self.stream(data if isinstance(data, list) else [data]))
+
+    def stream(self, items):
+        renderer = FastJSONRenderer()
+        for item in items:
+            yield renderer.render(item) + b'\n'
+
+
+class CSVRenderer(BaseRenderer):
+    """Список словарей — таблица с заголовком из ключей первой строки"""
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return b''.join(self.stream(data if isinstance(data, list) else [data]))
+
+    def stream(self, items):
+        buffer = io.StringIO()
+        writer = None
+        for item in items:
+            if writer is None:
+                writer = csv.DictWriter(buffer, fieldnames=list(item), extrasaction='ignore')
+                writer.writeheader()
+            writer.writerow(item)
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+
+
+def stream_json_array(items, batch_size=None):
+    """JSON-массив по частям: в памяти только текущая пачка элементов"""
+    batch_size = batch_size or settings.BARTER_STREAM_CHUNK_SIZE
+    renderer = FastJSONRenderer()
+    items = iter(items)
+    yield b'['
+    separator = b''
+    while batch := list(islice(items, batch_size)):
+        yield separator + renderer.render(batch)[1:-1]
+        separator = b','
+    yield b']'
+
+
+def streaming_json_response(items, batch_size=None):
+    return StreamingHttpResponse(stream_json_array(items, batch_size), content_type='application/json')
@@ -0,0 +1,99 @@
+"""Чтение с реплик.
+
+На время GET/HEAD/OPTIONS-запроса ReplicaReadMiddleware разрешает читать
+модели barter с реплик (settings.BARTER_READ_REPLICAS). Реплика выбирается
+случайно одна на весь HTTP-запрос: у разных реплик разное отставание, и
+число строк, страница или ETag и сам объект, прочитанные с разных, могли бы
+не сойтись в одном ответе. Пользователи, сессии и всё вне запроса
+(команды, миграции) читаются с основной БД, запись всегда идёт в неё.
+
+После POST/PUT/PATCH/DELETE клиент получает куку PRIMARY_COOKIE на
+BARTER_REPLICA_STICKY_SECONDS: пока она жива, его GET тоже читают с
+основной БД, и он видит свои изменения, даже если реплики отстают.
+"""
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PRIMARY_COOKIE = 'barter_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# алиас реплики текущего запроса; None — читать с основной БД
+_replica = ContextVar('barter_read_replica', default=None)
+
+
+def replica_reads_enabled():
+    """Читает ли текущий запрос модели barter с реплик"""
+    return _replica.get() is not None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == 'barter':
+            return _replica.get()
+        return None
+
+    def db_for_write(self, model, **hints):
+        # явно: иначе объект, прочитанный с реплики, сохранялся бы в неё же
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # реплики хранят те же строки, что и основная БД
+        databases = {DEFAULT_DB_ALIAS, *settings.BARTER_READ_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # схема приходит на реплики репликацией
+        if db in settings.BARTER_READ_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaReadMiddleware:
+    """Включает чтение с реплик для безопасных запросов и ставит куку после изменяющих"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = _replica.set(self.choose_replica(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _replica.reset(token)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        # sync_to_async копирует контекст в поток, так что реплику видят и синхронные части
+        token = _replica.set(self.choose_replica(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _replica.reset(token)
+        return self.process_response(request, response)
+
+    def choose_replica(self, request):
+        """Реплика на весь запрос или None, если читать надо с основной БД"""
+        if request.method in SAFE_METHODS and PRIMARY_COOKIE not in request.COOKIES and settings.BARTER_READ_REPLICAS:
+            return random.choice(settings.BARTER_READ_REPLICAS)
+        return None
+
+    def process_response(self, request, response):
+        if request.method not in SAFE_METHODS and settings.BARTER_READ_REPLICAS:
+            response.set_cookie(
+                PRIMARY_COOKIE, '1', max_age=settings.BARTER_REPLICA_STICKY_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,72 @@
+import re
+from functools import lru_cache
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db import connections
+from django.db.models import F, Q, Value
+from rest_framework.filters import BaseFilterBackend
+
+# Конфигурации, с которыми триггер строит Ad.search_vector
+SEARCH_CONFIGS = ('russian', 'english')
+
+_term_re = re.compile(r'\w+')
+
+
+@lru_cache(maxsize=None)
+def has_trigram(alias='default'):
+    """Установлено ли расширение pg_trgm в БД"""
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+def build_query(text):
+    """Префиксный tsquery по всем словам запроса во всех конфигурациях"""
+    terms = _term_re.findall(text)
+    if not terms:
+        return None
+    raw = ' & '.join(f'{term}:*' for term in terms)
+    query = None
+    for config in SEARCH_CONFIGS:
+        config_query = SearchQuery(raw, config=config, search_type='raw')
+        query = config_query if query is None else query | config_query
+    return query
+
+
+def search_ads(queryset, text):
+    """Полнотекстовый поиск с ранжированием и допуском опечаток в названии"""
+    query = build_query(text)
+    if query is None:
+        return queryset
+
+    match = Q(search_vector=query)
+    rank = SearchRank(F('search_vector'), query)
+    # Опечатки ловит триграммный индекс по названию (порог pg_trgm.word_similarity_threshold)
+    if has_trigram(queryset.db):
+        match |= Q(title__trigram_word_similar=text)
+        rank = rank + TrigramWordSimilarity(Value(text), 'title')
+
+    return queryset.filter(match).annotate(search_rank=rank).order_by('-search_rank', '-id')
+
+
+class AdSearchFilter(BaseFilterBackend):
+    """Параметр ?search= поверх полнотекстового индекса"""
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, '').strip()
+        if not text:
+            return queryset
+        return search_ads(queryset, text)
+
+    def get_schema_operation_parameters(self, view):
+        return [{
+            'name': self.search_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Поиск по названию и описанию',
+            'schema': {'type': 'string'},
+        }]
@@ -1,6 +1,10 @@
 from rest_framework import serializers
+from django.conf import settings
+from drf_spectacular.utils import extend_schema_field
 from django.contrib.auth import get_user_model
-from .models import Ad, ExchangeProposal, Category
+from .models import Ad, ExchangeChain, ExchangeProposal, Category
+from .transitions import TRANSITIONS
+from .categories import find_category, get_tree
 
 
 User = get_user_model()
@@ -18,10 +22,49 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'title']
 
 
+class CategoryIdField(serializers.PrimaryKeyRelatedField):
+    """id категории, проверенный по дереву в памяти; в validated_data — объект Category"""
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            category = find_category(int(data))
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if category is None:
+            self.fail('does_not_exist', pk_value=data)
+        return category
+
+    def get_choices(self, cutoff=None):
+        return dict(get_tree().choices()[:cutoff])
+
+
+@extend_schema_field(CategorySerializer)
+class CategoryNestedField(serializers.PrimaryKeyRelatedField):
+    """Вложенная категория по category_id из дерева в памяти, без join'а"""
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+        self._represent = None
+
+    def pk_representer(self):
+        """pk -> {'id', 'title'} по одному снимку дерева на весь ответ; так же читает ValuesReader"""
+        tree = get_tree()
+        return lambda pk: None if pk is None else tree.representation(pk)
+
+    def to_representation(self, value):
+        # поле копируется в каждый экземпляр сериализатора, так что снимок живёт один ответ
+        if self._represent is None:
+            self._represent = self.pk_representer()
+        return self._represent(value.pk)
+
+
 class AdSerializer(serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
-    category = CategorySerializer(read_only=True)
-    category_id = serializers.PrimaryKeyRelatedField(
+    category = CategoryNestedField()
+    category_id = CategoryIdField(
         source='category',
         queryset=Category.objects.all(),
         write_only=True
@@ -36,7 +79,7 @@ class AdSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'title', 'description', 'image_url',
             'category', 'category_id', 'condition', 'condition_display',
-            'is_active', 'created_at', 'author'
+            'latitude', 'longitude', 'is_active', 'created_at', 'author'
         ]
         read_only_fields = ['created_at', 'author', 'condition_display']
         extra_kwargs = {
@@ -46,6 +89,16 @@ class AdSerializer(serializers.ModelSerializer):
             }
         }
 
+    def validate(self, data):
+        # при PATCH недостающая половина берётся из объявления
+        location = {
+            field: data.get(field, getattr(self.instance, field, None)) for field in ('latitude', 'longitude')
+        }
+        missing = [field for field, value in location.items() if value is None]
+        if len(missing) == 1:
+            raise serializers.ValidationError({missing[0]: ['Широта и долгота задаются вместе']})
+        return data
+
 
 class ExchangeProposalSerializer(serializers.ModelSerializer):
     sender_id = serializers.PrimaryKeyRelatedField(
@@ -77,12 +130,12 @@ class ExchangeProposalSerializer(serializers.ModelSerializer):
         if not sender or not receiver:
             raise serializers.ValidationError("Необходимо указать объявления отправителя и получателя")
 
-        if sender.author != request.user:
+        if sender.author_id != request.user.id:
             raise serializers.ValidationError({
                 'sender_id': 'Вы можете предлагать только свои объявления'
             })
 
-        if receiver.author == request.user:
+        if receiver.author_id == request.user.id:
             raise serializers.ValidationError({
                 'receiver_id': 'Нельзя предлагать обмен на собственное объявление'
             })
@@ -92,3 +145,70 @@ class ExchangeProposalSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         validated_data['status'] = 'pending'
         return super().create(validated_data)
+
+
+class ProposalBatchItemSerializer(serializers.Serializer):
+    sender_id = serializers.IntegerField()
+    receiver_id = serializers.IntegerField()
+    comment = serializers.CharField(max_length=500)
+
+
+class ProposalBatchCreateSerializer(serializers.Serializer):
+    """Много предложений за один запрос; права проверяются одним запросом к Ad"""
+    proposals = serializers.ListField(
+        child=ProposalBatchItemSerializer(), allow_empty=False, max_length=settings.BARTER_BATCH_MAX_SIZE
+    )
+
+    def validate_proposals(self, proposals):
+        user_id = self.context['request'].user.id
+        ids = {item[key] for item in proposals for key in ('sender_id', 'receiver_id')}
+        authors = dict(Ad.objects.filter(pk__in=ids, is_active=True).values_list('id', 'author_id'))
+
+        errors, has_errors = [], False
+        for item in proposals:
+            item_errors = {}
+            sender_author, receiver_author = authors.get(item['sender_id']), authors.get(item['receiver_id'])
+            if sender_author is None:
+                item_errors['sender_id'] = ['Объявление не найдено или неактивно']
+            elif sender_author != user_id:
+                item_errors['sender_id'] = ['Вы можете предлагать только свои объявления']
+            if receiver_author is None:
+                item_errors['receiver_id'] = ['Объявление не найдено или неактивно']
+            elif receiver_author == user_id:
+                item_errors['receiver_id'] = ['Нельзя предлагать обмен на собственное объявление']
+            item['sender_author_id'], item['receiver_author_id'] = sender_author, receiver_author
+            errors.append(item_errors)
+            has_errors = has_errors or bool(item_errors)
+
+        if has_errors:
+            raise serializers.ValidationError(errors)
+        return proposals
+
+    def create(self, validated_data):
+        return ExchangeProposal.objects.bulk_create(
+            ExchangeProposal(status='pending', **item) for item in validated_data['proposals']
+        )
+
+
+class ProposalBatchStatusSerializer(serializers.Serializer):
+    """Принять или отклонить пачку входящих предложений"""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=settings.BARTER_BATCH_MAX_SIZE
+    )
+    status = serializers.ChoiceField(choices=['accepted', 'rejected'])
+
+    def save(self):
+        # чужие и уже рассмотренные предложения отсекает условие UPDATE
+        transition = TRANSITIONS[self.validated_data['status']]
+        return transition(self.context['request'].user, self.validated_data['ids'])
+
+
+class ExchangeChainSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ExchangeChain
+        fields = ['id', 'ad_ids', 'proposal_ids', 'created_at']
+
+
+class RecommendationSerializer(serializers.Serializer):
+    score = serializers.FloatField(read_only=True)
+    ad = AdSerializer(read_only=True)
@@ -0,0 +1,30 @@
+from django.contrib.auth import get_user_model
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import ADS_GENERATION, CATEGORIES_GENERATION, USERS_GENERATION, ad_generation, bump_generations
+from .metrics import instrument_connection
+from .models import Ad, Category
+
+
+@receiver([post_save, post_delete], sender=Ad)
+def invalidate_ad_cache(sender, instance, **kwargs):
+    bump_generations(ADS_GENERATION, ad_generation(instance.pk))
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_category_cache(sender, instance, **kwargs):
+    bump_generations(CATEGORIES_GENERATION)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_user_cache(sender, instance, update_fields=None, **kwargs):
+    # вход сохраняет только last_login, в ответах его нет
+    if update_fields is None or 'username' in update_fields:
+        bump_generations(USERS_GENERATION)
+
+
+@receiver(connection_created)
+def instrument_new_connection(sender, connection, **kwargs):
+    instrument_connection(connection)
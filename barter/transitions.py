@@ -0,0 +1,93 @@
+"""Переходы статусов предложений обмена.
+
+pending -> accepted | rejected, других переходов нет. Каждое изменение —
+условный UPDATE ... WHERE status = 'pending', поэтому повторное или
+параллельное решение по тому же предложению ничего не меняет.
+
+Принятие забирает оба объявления: они блокируются (SELECT ... FOR UPDATE в
+порядке id) и снимаются с публикации, а остальные ожидающие предложения с
+их участием отклоняются. Блокировки всегда берутся в порядке
+«объявления, затем предложения», и внутри каждой таблицы — по возрастанию
+id: строки предложений под UPDATE блокирует подзапрос
+SELECT ... ORDER BY id FOR UPDATE (_in_id_order), иначе два принятия или
+принятие и reject() могли бы захватить общие предложения в разном порядке.
+Так параллельные переходы не взаимоблокируются, и одно объявление не
+уходит в два обмена.
+"""
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Now
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .cache import invalidate_ads
+from .models import Ad, ExchangeProposal
+
+PENDING = 'pending'
+ACCEPTED = 'accepted'
+REJECTED = 'rejected'
+
+
+class TransitionConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Предложение уже рассмотрено или объявление больше не доступно'
+    default_code = 'transition_conflict'
+
+
+def _incoming(user, ids):
+    return ExchangeProposal.objects.filter(pk__in=ids, receiver_author_id=user.id, status=PENDING)
+
+
+def _in_id_order(queryset):
+    """Те же предложения для UPDATE; строки блокируются подзапросом по возрастанию id"""
+    return ExchangeProposal.objects.filter(pk__in=queryset.select_for_update().order_by('pk').values('pk'))
+
+
+def accept(user, ids):
+    """Принимает входящие предложения пользователя; возвращает id принятых.
+
+    Из предложений на одно и то же объявление принимается первое по id.
+    """
+    with transaction.atomic():
+        candidates = list(_incoming(user, ids).order_by('pk').values_list('pk', 'sender_id', 'receiver_id'))
+        if not candidates:
+            return []
+
+        ad_ids = {ad_id for _, sender_id, receiver_id in candidates for ad_id in (sender_id, receiver_id)}
+        available = set(
+            Ad.objects.select_for_update().filter(pk__in=ad_ids, is_active=True)
+            .order_by('pk').values_list('pk', flat=True)
+        )
+        chosen = []
+        for pk, sender_id, receiver_id in candidates:
+            if sender_id in available and receiver_id in available:
+                available -= {sender_id, receiver_id}
+                chosen.append(pk)
+        if not chosen:
+            return []
+
+        # под блокировкой объявлений перечитываем статус: его мог сменить reject()
+        accepted = list(
+            _incoming(user, chosen).select_for_update().order_by('pk').values_list('pk', 'sender_id', 'receiver_id')
+        )
+        if not accepted:
+            return []
+        taken = {ad_id for _, sender_id, receiver_id in accepted for ad_id in (sender_id, receiver_id)}
+        accepted_ids = [pk for pk, _, _ in accepted]
+
+        ExchangeProposal.objects.filter(pk__in=accepted_ids).update(status=ACCEPTED, updated_at=Now())
+        Ad.objects.filter(pk__in=taken).update(is_active=False, updated_at=Now())
+        _in_id_order(ExchangeProposal.objects.filter(
+            Q(sender_id__in=taken) | Q(receiver_id__in=taken), status=PENDING
+        )).update(status=REJECTED, updated_at=Now())
+        invalidate_ads(taken)
+    return accepted_ids
+
+
+def reject(user, ids):
+    """Отклоняет входящие предложения одним UPDATE; возвращает их число"""
+    with transaction.atomic():
+        return _in_id_order(_incoming(user, ids)).update(status=REJECTED, updated_at=Now())
+
+
+TRANSITIONS = {ACCEPTED: lambda user, ids: len(accept(user, ids)), REJECTED: reject}
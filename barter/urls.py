@@ -1,18 +1,40 @@
 from django.urls import path
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
 from .views import *
+from . import async_views, metrics, transitions
 
 
 urlpatterns = [
     # Объявления
     path('ads/', AdListCreateView.as_view(), name='ad-list'),
     path('ads/<int:pk>/', AdRetrieveUpdateDestroyView.as_view(), name='ad-detail'),
+    path('ads/bulk/', AdBulkView.as_view(), name='ad-bulk'),
+    path('categories/', CategoryTreeView.as_view(), name='category-tree'),
 
     # Предложения обмена
     path('proposals/', ProposalListCreateView.as_view(), name='proposal-list'),
     path('proposals/<int:pk>/', ProposalRetrieveDestroyView.as_view(), name='proposal-detail'),
+    path('proposals/<int:pk>/accept/', ProposalTransitionView.as_view(transition=transitions.accept),
+         name='proposal-accept'),
+    path('proposals/<int:pk>/reject/', ProposalTransitionView.as_view(transition=transitions.reject),
+         name='proposal-reject'),
+    path('proposals/batch/', ProposalBatchCreateView.as_view(), name='proposal-batch'),
+    path('proposals/batch/status/', ProposalBatchStatusView.as_view(), name='proposal-batch-status'),
+
+    # Цепочки обмена и рекомендации
+    path('chains/', ChainListView.as_view(), name='chain-list'),
+    path('recommendations/', RecommendationView.as_view(), name='recommendations'),
+
+    # Асинхронное чтение (ASGI)
+    path('async/ads/', async_views.ad_list, name='async-ad-list'),
+    path('async/ads/<int:pk>/', async_views.ad_detail, name='async-ad-detail'),
+    path('async/proposals/', async_views.proposal_list, name='async-proposal-list'),
+    path('async/proposals/<int:pk>/', async_views.proposal_detail, name='async-proposal-detail'),
 ]
 
+# Метрики для Prometheus
+urlpatterns.append(path('metrics', metrics.metrics_view, name='metrics'))
+
 # Документация
 urlpatterns.extend([
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
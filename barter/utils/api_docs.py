@@ -1,5 +1,6 @@
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample, OpenApiResponse
 from drf_spectacular.types import OpenApiTypes
+from rest_framework import serializers
 
 SUCCESS_CODES = {
     'get': 200,
@@ -8,71 +9,94 @@ SUCCESS_CODES = {
     'delete': 204,
 }
 
+# (view, method, is_list) -> параметры extend_schema
+_schema_cache = {}
 
-def auto_schema(is_list=False):
-    def decorator(view_method):
 
-        def build_schema(self, request):
-            """Конструктор схемы документации"""
-            method = request.method.lower()
-            serializer_class = getattr(self, 'serializer_class', None)
-
-            success_response = OpenApiResponse(description='Успешный ответ')
-            request_body = None
-            parameters = []
-            required_fields = []
-            error_examples = {}
-
-            if serializer_class is not None:
-                serializer = serializer_class()
-                if method == 'get':
-                    for field_name, field in serializer.fields.items():
-                        param = OpenApiParameter(
-                            name=field_name,
-                            type=OpenApiTypes.STR,
-                            description=getattr(field, 'help_text', ''),
-                            required=field.required,
-                            enum=list(field.choices.keys()) if hasattr(field, 'choices') else None
-                        )
-                        parameters.append(param)
-                    if is_list:
-                        success_response = serializer_class(many=True)
-                    else:
-                        success_response = serializer_class
-                else:
-                    for field_name, field in serializer.fields.items():
-                        if field.required:
-                            required_fields.append(field_name)
-                            error_examples[field_name] = ["Это поле обязательно."]
-                    request_body = serializer_class
-
-            schema_config = {
-                'responses': {
-                    SUCCESS_CODES.get(method, 200): success_response,
-                    400: OpenApiResponse(
-                        description='Ошибка валидации',
-                        examples={'application/json': error_examples} if error_examples else None
-                    ),
-                    403: OpenApiResponse(description='Доступ запрещен'),
-                    404: OpenApiResponse(description='Не найдено')
-                }
-            }
-            if method == 'get':
-                schema_config['parameters'] = parameters
+def _build_schema(view_class, method, is_list=False):
+    """Конструктор схемы документации"""
+    serializer_class = getattr(view_class, 'serializer_class', None)
+
+    success_response = OpenApiResponse(description='Успешный ответ')
+    request_body = None
+    parameters = []
+    required_fields = []
+    error_examples = {}
+
+    if serializer_class is not None:
+        serializer = serializer_class()
+        if method == 'get':
+            for field_name, field in serializer.fields.items():
+                # choices связанных полей — это запрос к БД, поэтому берём только статические
+                param = OpenApiParameter(
+                    name=field_name,
+                    type=OpenApiTypes.STR,
+                    description=getattr(field, 'help_text', ''),
+                    required=field.required,
+                    enum=list(field.choices.keys()) if isinstance(field, serializers.ChoiceField) else None
+                )
+                parameters.append(param)
+            if is_list:
+                success_response = serializer_class(many=True)
             else:
-                schema_config['request'] = request_body
+                success_response = serializer_class
+        else:
+            for field_name, field in serializer.fields.items():
+                if field.required:
+                    required_fields.append(field_name)
+                    error_examples[field_name] = ["Это поле обязательно."]
+            request_body = serializer_class
+
+    schema_config = {
+        'responses': {
+            SUCCESS_CODES.get(method, 200): success_response,
+            400: OpenApiResponse(
+                description='Ошибка валидации',
+                examples=[
+                    OpenApiExample('Ошибка валидации', value=error_examples, response_only=True)
+                ] if error_examples else None
+            ),
+            403: OpenApiResponse(description='Доступ запрещен'),
+            404: OpenApiResponse(description='Не найдено')
+        }
+    }
+    if method == 'get':
+        schema_config['parameters'] = parameters
+    else:
+        schema_config['request'] = request_body
+
+    return schema_config
+
 
-            return schema_config
+def build_schema(view_class, method, is_list=False):
+    """Схема документации, построенная один раз на (view, method, is_list)"""
+    key = (view_class, method, is_list)
+    if key not in _schema_cache:
+        _schema_cache[key] = _build_schema(view_class, method, is_list)
+    return _schema_cache[key]
 
-        def wrapped(self, request, *args, **kwargs):
-            # Сначала выполняется оригинальный метод
-            response = view_method(self, request, *args, **kwargs)
 
-            # Затем формируем схему для документации
-            schema_config = build_schema(self, request)
-            extend_schema(**schema_config)(view_method)
+class _AutoSchemaMethod:
+    """Метод представления, схема которого строится при создании класса.
 
-            # Возвращаем оригинальный response
-            return response
-        return wrapped
-    return decorator
\ No newline at end of file
+    После __set_name__ в классе остаётся сам исходный метод, так что
+    на обработку запроса декоратор ничего не добавляет.
+    """
+
+    def __init__(self, view_method, is_list, parameters):
+        self.view_method = view_method
+        self.is_list = is_list
+        self.parameters = parameters
+
+    def __set_name__(self, owner, name):
+        schema_config = build_schema(owner, name, self.is_list)
+        if self.parameters:
+            schema_config = {**schema_config, 'parameters': schema_config.get('parameters', []) + self.parameters}
+        setattr(owner, name, extend_schema(**schema_config)(self.view_method))
+
+
+def auto_schema(is_list=False, parameters=None):
+    """parameters — дополнительные OpenApiParameter, которых нет в сериализаторе"""
+    def decorator(view_method):
+        return _AutoSchemaMethod(view_method, is_list, parameters)
+    return decorator
@@ -0,0 +1,84 @@
+from functools import lru_cache
+
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField, RelatedField
+
+
+def _relation_steps(model, attrs):
+    """Проходит по цепочке source_attrs, пока она идёт по связям модели.
+
+    Возвращает список (имя, связь_множественная) и модель, на которой остановились.
+    """
+    steps = []
+    for attr in attrs:
+        try:
+            field = model._meta.get_field(attr)
+        except Exception:
+            break
+        if not field.is_relation or field.related_model is None:
+            break
+        steps.append((attr, field.many_to_many or field.one_to_many))
+        model = field.related_model
+    return steps, model
+
+
+def _collect(serializer, model, prefix, many, select, prefetch):
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*':
+            continue
+
+        attrs = field.source_attrs
+        if isinstance(field, serializers.BaseSerializer):
+            steps, related_model = _relation_steps(model, attrs)
+            if len(steps) != len(attrs):
+                continue
+        elif isinstance(field, (RelatedField, ManyRelatedField)):
+            steps, related_model = _relation_steps(model, attrs)
+            # pk связи берётся из <fk>_id без запроса
+            if (isinstance(field, PrimaryKeyRelatedField) and len(steps) == 1
+                    and not steps[0][1]):
+                continue
+        else:
+            steps, related_model = _relation_steps(model, attrs[:-1])
+
+        path, path_many = prefix, many
+        for name, step_many in steps:
+            path = f'{path}__{name}' if path else name
+            path_many = path_many or step_many
+            (prefetch if path_many else select).add(path)
+
+        if isinstance(field, serializers.BaseSerializer) and steps:
+            child = field.child if isinstance(field, serializers.ListSerializer) else field
+            _collect(child, related_model, path, path_many, select, prefetch)
+
+
+@lru_cache(maxsize=None)
+def related_paths(serializer_class):
+    """Цепочки select_related/prefetch_related по дереву полей сериализатора"""
+    serializer = serializer_class()
+    select, prefetch = set(), set()
+    _collect(serializer, serializer.Meta.model, '', False, select, prefetch)
+
+    # вложенные пути уже покрывают своих родителей
+    select = {p for p in select if not any(o.startswith(p + '__') for o in select)}
+    return tuple(sorted(select)), tuple(sorted(prefetch))
+
+
+def optimize_queryset(queryset, serializer_class):
+    select, prefetch = related_paths(serializer_class)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
+
+
+class SerializerQuerysetMixin:
+    """Подгружает связи, которые читает сериализатор, чтобы не было N+1"""
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        # DELETE ничего не сериализует
+        if self.request.method == 'DELETE':
+            return queryset
+        return optimize_queryset(queryset, self.get_serializer_class())
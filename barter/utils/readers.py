@@ -0,0 +1,175 @@
+"""Быстрое чтение списков: строки .values() собираются в словари без полей DRF.
+
+Дерево полей сериализатора компилируется один раз в плоский список путей
+для .values() и геттеров для каждого поля. Результат совпадает с
+serializer.data побайтно после рендеринга; сериализаторы с полями, которые
+так не выразить (SerializerMethodField, many=True и т.п.), читаются как обычно.
+"""
+from functools import lru_cache, partial
+from operator import itemgetter
+
+from django.conf import settings
+from rest_framework import serializers
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.response import Response
+
+from ..renderers import streaming_json_response
+from .queryset import _relation_steps
+
+# Поля, у которых to_representation для значения из БД — тождество
+IDENTITY_FIELDS = (
+    serializers.CharField, serializers.IntegerField, serializers.BooleanField,
+    serializers.ChoiceField, serializers.ReadOnlyField,
+)
+
+
+class Unsupported(Exception):
+    pass
+
+
+def _display_getter(model, source, path):
+    """get_<поле>_display по заранее собранной карте choices"""
+    field = model._meta.get_field(source[len('get_'):-len('_display')])
+    labels = {value: str(label) for value, label in field.flatchoices}
+    get = itemgetter(path)
+    return lambda row: labels.get(get(row), get(row))
+
+
+def _constant(getter):
+    return lambda: getter
+
+
+def _compile(serializer, model, prefix, paths):
+    """Возвращает bind(): он собирает build(row) заново на каждый ответ.
+
+    Геттеры почти всегда постоянные; привязка нужна полям с
+    pk_representer(), которым на ответ нужен свежий снимок данных.
+    """
+    getters = []
+    for field in serializer._readable_fields:
+        source = field.source
+        path = f'{prefix}{source}'
+
+        if isinstance(field, serializers.ListSerializer) or field.source == '*':
+            raise Unsupported(field.field_name)
+
+        if isinstance(field, serializers.BaseSerializer):
+            steps, related_model = _relation_steps(model, field.source_attrs)
+            if len(steps) != 1 or steps[0][1]:
+                raise Unsupported(field.field_name)
+            # по самому fk видно, есть ли связанный объект
+            paths.append(path)
+            bind = _compile(field, related_model, f'{path}__', paths)
+            getters.append((field.field_name, partial(_nullable, path, bind)))
+        elif isinstance(field, PrimaryKeyRelatedField):
+            steps, _ = _relation_steps(model, field.source_attrs)
+            if len(steps) != 1 or steps[0][1] or field.pk_field is not None:
+                raise Unsupported(field.field_name)
+            paths.append(path)
+            # pk_representer() -> функция pk -> представление связи (категория из памяти)
+            representer = getattr(field, 'pk_representer', None)
+            if representer is None:
+                getters.append((field.field_name, _constant(itemgetter(path))))
+            else:
+                getters.append((field.field_name, partial(_mapped, path, representer)))
+        elif source.startswith('get_') and source.endswith('_display'):
+            path = f'{prefix}{source[len("get_"):-len("_display")]}'
+            paths.append(path)
+            getters.append((field.field_name, _constant(_display_getter(model, source, path))))
+        elif len(field.source_attrs) == 1 and not isinstance(field, serializers.SerializerMethodField):
+            try:
+                model_field = model._meta.get_field(source)
+            except Exception:
+                raise Unsupported(field.field_name)
+            if model_field.is_relation:
+                raise Unsupported(field.field_name)
+            paths.append(path)
+            getters.append((field.field_name, _constant(_field_getter(field, path))))
+        else:
+            raise Unsupported(field.field_name)
+
+    def bind():
+        bound = [(name, make()) for name, make in getters]
+
+        def build(row):
+            return {name: get(row) for name, get in bound}
+        return build
+    return bind
+
+
+def _mapped(path, representer):
+    get, represent = itemgetter(path), representer()
+    return lambda row: represent(get(row))
+
+
+def _nullable(path, bind):
+    get_key, build = itemgetter(path), bind()
+    return lambda row: None if get_key(row) is None else build(row)
+
+
+def _field_getter(field, path):
+    get = itemgetter(path)
+    if isinstance(field, IDENTITY_FIELDS):
+        return get
+    to_representation = field.to_representation
+    # None сериализатор отдаёт как есть, не вызывая поле
+    return lambda row: None if (value := get(row)) is None else to_representation(value)
+
+
+class ValuesReader:
+    def __init__(self, paths, bind):
+        self.paths = paths
+        self.bind = bind
+
+    def queryset(self, queryset):
+        return queryset.values(*self.paths)
+
+    def many(self, rows):
+        build = self.bind()
+        return [build(row) for row in rows]
+
+    def iterate(self, queryset, chunk_size):
+        """Строки по одной, из серверного курсора пачками по chunk_size"""
+        return map(self.bind(), queryset.iterator(chunk_size=chunk_size))
+
+
+@lru_cache(maxsize=None)
+def compile_reader(serializer_class):
+    """ValuesReader для сериализатора или None, если его поля так не читаются"""
+    serializer = serializer_class()
+    paths = []
+    try:
+        bind = _compile(serializer, serializer.Meta.model, '', paths)
+    except Unsupported:
+        return None
+    return ValuesReader(tuple(dict.fromkeys(paths)), bind)
+
+
+class ValuesListMixin:
+    """list() через .values() и ValuesReader вместо экземпляров моделей и полей DRF.
+
+    С ?stream=1 весь список без пагинации отдаётся StreamingHttpResponse:
+    строки читаются итератором и кодируются пачками, память воркера не растёт
+    с размером выгрузки.
+    """
+    stream_query_param = 'stream'
+
+    def is_streaming(self, request):
+        return request.query_params.get(self.stream_query_param) in ('1', 'true')
+
+    def list(self, request, *args, **kwargs):
+        reader = compile_reader(self.get_serializer_class())
+        if reader is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = reader.queryset(self.filter_queryset(self.get_queryset()))
+        if self.is_streaming(request):
+            if not queryset.ordered:
+                queryset = queryset.order_by(*getattr(self.paginator, 'ordering', ('pk',)))
+            chunk_size = settings.BARTER_STREAM_CHUNK_SIZE
+            return streaming_json_response(reader.iterate(queryset, chunk_size), chunk_size)
+
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(reader.many(queryset))
+        return self.get_paginated_response(reader.many(page))
@@ -1,25 +1,43 @@
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
 from drf_spectacular.utils import extend_schema, OpenApiResponse, OpenApiParameter
 from rest_framework import generics
+from rest_framework.exceptions import UnsupportedMediaType, ValidationError
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import filters
-from django.db.models import Q
 from .permissions import *
 # from .models import *
 from .serializers import *
 from .forms import *
 from .utils.api_docs import auto_schema
+from .utils.queryset import SerializerQuerysetMixin
+from .utils.readers import ValuesListMixin, compile_reader
+from .search import AdSearchFilter
+from .geo import AdGeoFilter
+from .filters import AdFilter
+from .categories import get_tree
+from .pagination import KeysetPagination
+from .feed import ProposalFeed, BOXES
+from .cache import AnonymousCacheMixin
+from .metrics import RequestTimingMixin
+from .conditional import ConditionalDetailMixin
+from .bulk import AdImporter, AdImportSerializer, PARSERS, export_rows
+from .renderers import CSVRenderer, FastJSONRenderer, NDJSONRenderer
+from . import transitions
+from .recommendations import recommend
 
 
-class AdListCreateView(generics.ListCreateAPIView):
+class AdListCreateView(RequestTimingMixin, AnonymousCacheMixin, ValuesListMixin, SerializerQuerysetMixin,
+                       generics.ListCreateAPIView):
     # Фильтры
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
-    filterset_fields = ['category', 'condition']
-    search_fields = ['title', 'description']
+    filter_backends = [DjangoFilterBackend, AdSearchFilter, AdGeoFilter]
+    filterset_class = AdFilter
 
     queryset = Ad.objects.filter(is_active=True)
     serializer_class = AdSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
 
     @auto_schema(is_list=True)
     def get(self, request, *args, **kwargs):
@@ -31,17 +49,6 @@ class AdListCreateView(generics.ListCreateAPIView):
             })
         return super().get(request, *args, **kwargs)
 
-    def get_queryset(self):
-        queryset = super().get_queryset()
-        search_query = self.request.query_params.get('search', None)
-
-        if search_query:
-            queryset = queryset.filter(
-                Q(title__icontains=search_query) |
-                Q(description__icontains=search_query)
-            )
-        return queryset
-
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
@@ -50,8 +57,10 @@ class AdListCreateView(generics.ListCreateAPIView):
         return super().post(request, *args, **kwargs)
 
 
-class AdRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
+class AdRetrieveUpdateDestroyView(RequestTimingMixin, AnonymousCacheMixin, ConditionalDetailMixin,
+                                  SerializerQuerysetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Ad.objects.all()
+    identity_fields = ('author__username',)
     serializer_class = AdSerializer
     permission_classes = [IsAuthenticatedOrReadOnly, IsAdAuthorOrReadOnly]
 
@@ -72,20 +81,70 @@ class AdRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
         return super().delete(request, *args, **kwargs)
 
 
-class ProposalListCreateView(generics.ListCreateAPIView):
+class AdBulkView(RequestTimingMixin, generics.GenericAPIView):
+    """Пакетный импорт (POST) и потоковый экспорт (GET) своих объявлений.
+
+    Импорт принимает NDJSON (application/x-ndjson) или CSV (text/csv);
+    формат экспорта выбирается по Accept или ?format=ndjson|csv.
+    """
+    serializer_class = AdImportSerializer
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [FastJSONRenderer, NDJSONRenderer, CSVRenderer]
+
+    @extend_schema(
+        responses={200: {'type': 'string', 'description': 'Строки NDJSON или CSV'}},
+    )
+    def get(self, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        if not hasattr(renderer, 'stream'):
+            renderer = NDJSONRenderer()
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type += f'; charset={renderer.charset}'
+        return StreamingHttpResponse(renderer.stream(export_rows(request.user)), content_type=content_type)
+
+    @extend_schema(
+        request={'application/x-ndjson': AdImportSerializer, 'text/csv': AdImportSerializer},
+        responses={200: OpenApiResponse(description='{"created": N, "updated": N, "errors": [{"line": N, "errors": {...}}]}')},
+    )
+    def post(self, request, *args, **kwargs):
+        parse = PARSERS.get(request.content_type.split(';')[0].strip())
+        if parse is None:
+            raise UnsupportedMediaType(request.content_type)
+        # тело читается построчно, без request.data и парсеров DRF
+        return Response(AdImporter(request.user).run(parse(request.stream or ())))
+
+
+class CategoryTreeView(RequestTimingMixin, generics.GenericAPIView):
+    """Дерево категорий с числом активных объявлений в каждом поддереве"""
+    permission_classes = [AllowAny]
+    pagination_class = None
+
+    @extend_schema(responses={200: OpenApiResponse(
+        description='[{"id", "title", "depth", "active_ads_count", "children": [...]}]'
+    )})
+    def get(self, request, *args, **kwargs):
+        # структура — из памяти, счётчики (их ведёт триггер) — одним запросом
+        counts = dict(Category.objects.values_list('id', 'active_ads_count'))
+        return Response(get_tree().nested(counts))
+
+
+class ProposalListCreateView(RequestTimingMixin, ValuesListMixin, SerializerQuerysetMixin,
+                             generics.ListCreateAPIView):
     serializer_class = ExchangeProposalSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
 
-    @auto_schema(is_list=True)
+    @auto_schema(is_list=True, parameters=[
+        OpenApiParameter('box', str, enum=list(BOXES), description='Входящие, исходящие или все'),
+        OpenApiParameter('status', str, enum=list(dict(ExchangeProposal.STATUS_CHOICES))),
+    ])
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
 
     def get_queryset(self):
-        return ExchangeProposal.objects.filter(
-            sender__author=self.request.user
-        ) | ExchangeProposal.objects.filter(
-            receiver__author=self.request.user
-        )
+        return ProposalFeed.from_request(self.request)
+
     def perform_create(self, serializer):
         serializer.save()
 
@@ -94,8 +153,101 @@ class ProposalListCreateView(generics.ListCreateAPIView):
         return super().post(request, *args, **kwargs)
 
 
-class ProposalRetrieveDestroyView(generics.RetrieveDestroyAPIView):
+class ProposalBatchCreateView(RequestTimingMixin, generics.GenericAPIView):
+    serializer_class = ProposalBatchCreateSerializer
+    permission_classes = [IsAuthenticated]
+
+    @auto_schema()
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = [proposal.pk for proposal in serializer.save()]
+
+        # созданные предложения читаются одним запросом, как в списке
+        reader = compile_reader(ExchangeProposalSerializer)
+        rows = reader.queryset(ExchangeProposal.objects.filter(pk__in=ids).order_by('id'))
+        return Response(reader.many(rows), status=201)
+
+
+class ProposalBatchStatusView(RequestTimingMixin, generics.GenericAPIView):
+    serializer_class = ProposalBatchStatusSerializer
+    permission_classes = [IsAuthenticated]
+
+    @auto_schema()
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response({'updated': serializer.save()})
+
+
+class ProposalTransitionView(RequestTimingMixin, generics.GenericAPIView):
+    """Принять или отклонить входящее предложение; 409, если оно уже рассмотрено"""
+    queryset = ExchangeProposal.objects.all()
+    serializer_class = ExchangeProposalSerializer
+    permission_classes = [IsAuthenticated, IsProposalReceiver]
+    transition = None
+
+    @extend_schema(request=None, responses={
+        200: ExchangeProposalSerializer,
+        403: OpenApiResponse(description='Доступ запрещен'),
+        404: OpenApiResponse(description='Не найдено'),
+        409: OpenApiResponse(description='Предложение уже рассмотрено или объявление недоступно'),
+    })
+    def post(self, request, *args, **kwargs):
+        proposal = self.get_object()
+        if not self.transition(request.user, [proposal.pk]):
+            raise transitions.TransitionConflict()
+
+        reader = compile_reader(ExchangeProposalSerializer)
+        return Response(reader.many(reader.queryset(self.get_queryset().filter(pk=proposal.pk)))[0])
+
+
+class ChainListView(RequestTimingMixin, ValuesListMixin, generics.ListAPIView):
+    """Цепочки обмена с участием объявлений пользователя (см. команду match_chains)"""
+    serializer_class = ExchangeChainSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        return ExchangeChain.objects.filter(author_ids__contains=[self.request.user.id])
+
+    @auto_schema(is_list=True)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+class RecommendationView(RequestTimingMixin, generics.GenericAPIView):
+    """Чужие объявления, на которые пользователь скорее всего захочет обменять свои"""
+    serializer_class = RecommendationSerializer
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('ad', int, description='Только для этого своего объявления'),
+            OpenApiParameter('limit', int, description='Сколько объявлений вернуть (до 100)'),
+        ],
+        responses={200: RecommendationSerializer(many=True)},
+    )
+    def get(self, request, *args, **kwargs):
+        try:
+            ad_id = int(request.query_params['ad']) if request.query_params.get('ad') else None
+            limit = min(int(request.query_params.get('limit', 20)), 100)
+        except ValueError:
+            raise ValidationError({'detail': 'ad и limit должны быть числами'})
+
+        scored = recommend(request.user, ad_id=ad_id, limit=max(limit, 1))
+        reader = compile_reader(AdSerializer)
+        rows = reader.queryset(Ad.objects.filter(pk__in=[pk for pk, _ in scored]))
+        ads = {row['id']: row for row in reader.many(rows)}
+        return Response([{'score': score, 'ad': ads[pk]} for pk, score in scored if pk in ads])
+
+
+class ProposalRetrieveDestroyView(RequestTimingMixin, ConditionalDetailMixin, SerializerQuerysetMixin,
+                                  generics.RetrieveDestroyAPIView):
     queryset = ExchangeProposal.objects.all()
+    # в ответ вложены оба объявления, их версии тоже входят в ETag
+    version_fields = ('updated_at', 'sender__updated_at', 'receiver__updated_at')
+    identity_fields = ('sender__author__username', 'receiver__author__username')
     serializer_class = ExchangeProposalSerializer
     permission_classes = [IsAuthenticatedOrReadOnly, IsProposalAuthorOrReadOnly]
 
@@ -0,0 +1,33 @@
+"""Бенчмарки сервиса.
+
+Каждый модуль запускается отдельно из корня репозитория::
+
+    python -m benchmarks.schema_overhead
+"""
+import os
+import time
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    import django
+    django.setup()
+
+
+def measure(func, number=1000, repeat=5):
+    """Лучшее из repeat время одного вызова func, в секундах"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - started) / number)
+    return best
+
+
+def print_table(title, rows):
+    """Печатает строки (название, секунды) в микросекундах"""
+    print(title)
+    width = max(len(name) for name, _ in rows)
+    for name, seconds in rows:
+        print(f'  {name:<{width}}  {seconds * 1e6:10.2f} us')
@@ -0,0 +1,76 @@
+"""Импорт объявлений: по одному через POST /ads/ против /ads/bulk/.
+
+    python -m benchmarks.bulk_import --rows 10000
+
+Запросы идут тестовым клиентом Django в том же процессе, от имени
+отдельного пользователя, чьи объявления удаляются после каждого замера.
+Для поштучного пути берётся не больше --single строк.
+"""
+import argparse
+import csv
+import io
+import json
+import time
+
+from benchmarks import setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--single', type=int, default=500)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth import get_user_model
+    from rest_framework.test import APIClient
+    from barter.models import Ad, Category
+
+    user, _ = get_user_model().objects.get_or_create(username='bench_bulk')
+    client = APIClient()
+    client.force_authenticate(user=user)
+    category_ids = list(Category.objects.values_list('pk', flat=True)[:20]) or [None]
+    rows = [
+        {'title': f'Товар {i}', 'description': 'Импорт партнёра', 'category_id': category_ids[i % len(category_ids)],
+         'condition': ('new', 'used', 'broken')[i % 3]}
+        for i in range(args.rows)
+    ]
+
+    def single():
+        for row in rows[:args.single]:
+            client.post('/ads/', row, format='json')
+        return args.single
+
+    def ndjson():
+        body = '\n'.join(json.dumps(row, ensure_ascii=False) for row in rows).encode()
+        return client.post('/ads/bulk/', body, content_type='application/x-ndjson').json()['created']
+
+    def csv_import():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+        return client.post('/ads/bulk/', buffer.getvalue().encode(), content_type='text/csv').json()['created']
+
+    def export():
+        response = client.get('/ads/bulk/', HTTP_ACCEPT='application/x-ndjson')
+        return sum(chunk.count(b'\n') for chunk in response.streaming_content)
+
+    print('Строк в секунду')
+    for name, func, keep in [
+        ('POST /ads/ по одной', single, False),
+        ('bulk NDJSON', ndjson, False),
+        ('bulk CSV', csv_import, True),
+        ('экспорт NDJSON', export, False),
+    ]:
+        started = time.perf_counter()
+        count = func()
+        elapsed = time.perf_counter() - started
+        print(f'  {name:<22} {count / elapsed:10.0f}  ({count} строк за {elapsed:.2f} s)')
+        if not keep:
+            Ad.objects.filter(author=user).delete()
+    user.delete()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Поиск объявлений в радиусе: полный перебор против прямоугольника по индексу.
+
+    python -m benchmarks.geo --ads 1000000
+
+Если в БД меньше объявлений, чем --ads, недостающие засеваются seed_barter
+(с координатами вокруг городов); старым объявлениям без координат они
+проставляются случайно вокруг Москвы. Меряется первая страница «рядом,
+по расстоянию» и подсчёт объявлений в круге для нескольких радиусов.
+"""
+import argparse
+
+from benchmarks import measure, print_table, setup_django
+
+MOSCOW = (55.7558, 37.6173)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--ads', type=int, default=1_000_000)
+    parser.add_argument('--radius', type=float, nargs='+', default=[1, 10, 50])
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.management import call_command
+    from django.db import connection
+    from barter.geo import has_postgis, haversine_km, nearby
+    from barter.models import Ad
+
+    missing = args.ads - Ad.objects.count()
+    if missing > 0:
+        call_command('seed_barter', ads=missing, proposals=0, users=max(missing // 100, 2))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'UPDATE barter_ad SET latitude = %s + (random() - 0.5), longitude = %s + (random() - 0.5) * 2 '
+            'WHERE latitude IS NULL', MOSCOW
+        )
+        cursor.execute('ANALYZE barter_ad')
+
+    active = Ad.objects.filter(is_active=True)
+    rows = []
+    for radius in args.radius:
+        # без прямоугольника: расстояние считается для каждой строки
+        scan = active.annotate(distance=haversine_km(*MOSCOW)).filter(distance__lte=radius)
+        rows.append((f'{radius:g} км, перебор: число', measure(scan.count, number=1, repeat=3)))
+        rows.append((f'{radius:g} км, индекс:  число', measure(nearby(active, *MOSCOW, radius).count, number=3, repeat=3)))
+        page = nearby(active, *MOSCOW, radius, order=True)[:args.limit]
+        rows.append((f'{radius:g} км, индекс:  страница', measure(lambda: list(page.all()), number=3, repeat=3)))
+        print(f'{radius:g} км: {nearby(active, *MOSCOW, radius).count()} объявлений')
+
+    engine = 'PostGIS' if has_postgis() else 'гаверсинусы'
+    print_table(f'Поиск рядом по {Ad.objects.count()} объявлениям ({engine})', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""Нагрузочный прогон смеси сценариев, как в locust, но без зависимостей.
+
+Виртуальные пользователи — asyncio-корутины: каждый в цикле выбирает
+сценарий из benchmarks.scenarios по весу (список 40, карточка 30, поиск 15,
+лента 10, создание 5) и шлёт запрос от имени пользователя с самой длинной
+лентой. По каждому сценарию — rps, p50/p95/p99 и ошибки; отчёт пишется в
+benchmarks/results/ и сравнивается с прошлым через --compare. Без --url
+сервер поднимается из gunicorn.conf.py на --port; созданные объявления в
+конце удаляются.
+
+    python -m benchmarks.load --users 50 --duration 60 --output benchmarks/results/load-baseline.json
+    python -m benchmarks.load --users 50 --duration 60 --compare benchmarks/results/load-baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+from benchmarks import setup_django
+from benchmarks.load_asgi import _wait_ready
+
+
+async def _request(host, port, method, path, body, headers):
+    reader, writer = await asyncio.open_connection(host, port)
+    payload = b'' if body is None else json.dumps(body).encode()
+    lines = [f'{method} {path} HTTP/1.1', f'Host: {host}', 'Connection: close', *headers]
+    if body is not None:
+        lines += ['Content-Type: application/json', f'Content-Length: {len(payload)}']
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode() + payload)
+    await writer.drain()
+    status = (await reader.readline()).split()[1]
+    await reader.read()
+    writer.close()
+    return int(status)
+
+
+async def _run(host, port, targets, headers, users, duration, seed):
+    from benchmarks.scenarios import SCENARIOS
+
+    latencies = {scenario.name: [] for scenario in SCENARIOS}
+    errors = dict.fromkeys(latencies, 0)
+    weights = [scenario.weight for scenario in SCENARIOS]
+    deadline = time.monotonic() + duration
+
+    async def user(number):
+        rnd = random.Random(seed + number)
+        while time.monotonic() < deadline:
+            scenario = rnd.choices(SCENARIOS, weights)[0]
+            method, path, body = scenario.request(targets, rnd)
+            started = time.perf_counter()
+            try:
+                if await _request(host, port, method, path, body, headers) >= 400:
+                    errors[scenario.name] += 1
+            except (OSError, IndexError):
+                errors[scenario.name] += 1
+            latencies[scenario.name].append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user(number) for number in range(users)))
+    return time.perf_counter() - started, latencies, errors
+
+
+def _stats(latencies, errors, elapsed):
+    ordered = sorted(latencies)
+
+    def percentile(q):
+        return ordered[max(int(len(ordered) * q) - 1, 0)] * 1e3 if ordered else 0.0
+
+    return {
+        'requests': len(ordered), 'rps': len(ordered) / elapsed, 'errors': errors,
+        'p50': percentile(0.5), 'p95': percentile(0.95), 'p99': percentile(0.99),
+    }
+
+
+def _session_headers(user):
+    """Cookie сессии и CSRF-токен, чтобы POST проходил SessionAuthentication"""
+    from django.conf import settings
+    from django.test import Client
+    from django.utils.crypto import get_random_string
+
+    client = Client()
+    client.force_login(user)
+    session = client.cookies[settings.SESSION_COOKIE_NAME].value
+    token = get_random_string(32)
+    return [
+        f'Cookie: {settings.SESSION_COOKIE_NAME}={session}; {settings.CSRF_COOKIE_NAME}={token}',
+        f'X-CSRFToken: {token}',
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='Уже запущенный сервер, например http://127.0.0.1:8000')
+    parser.add_argument('--port', type=int, default=8766, help='Порт для своего gunicorn, если нет --url')
+    parser.add_argument('--users', type=int, default=50, help='Одновременных виртуальных пользователей')
+    parser.add_argument('--duration', type=float, default=30, help='Длительность, секунд')
+    parser.add_argument('--random-seed', type=int, default=0)
+    parser.add_argument('--output', help='Куда сохранить отчёт (по умолчанию benchmarks/results/load-<время>.json)')
+    parser.add_argument('--compare', help='Отчёт, с которым сравнить')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Ухудшение, которое считается регрессией')
+    args = parser.parse_args()
+
+    # на тяжёлых данных журнал медленных запросов забивает вывод и сам тратит время
+    os.environ.setdefault('BARTER_SLOW_QUERY_MS', '1e9')
+    setup_django()
+    from benchmarks import report
+    from benchmarks.scenarios import Targets
+    from barter.cache import invalidate_ads
+    from barter.models import Ad
+
+    targets = Targets.load(seed=args.random_seed)
+    headers = _session_headers(targets.user)
+    host, port, server = '127.0.0.1', args.port, None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        server = subprocess.Popen(
+            ['gunicorn', '-c', 'gunicorn.conf.py', '--access-logfile', '/dev/null', '--log-level', 'warning'],
+            env={**os.environ, 'GUNICORN_BIND': f'{host}:{port}'}, stdout=sys.stdout, stderr=sys.stderr,
+        )
+    try:
+        _wait_ready(host, port, '/ads/?limit=1')
+        print(f'{args.users} пользователей, {args.duration:g} с, {host}:{port}')
+        elapsed, latencies, errors = asyncio.run(
+            _run(host, port, targets, headers, args.users, args.duration, args.random_seed)
+        )
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+        Ad.objects.filter(author=targets.user, title__startswith='bench ').delete()
+        invalidate_ads()
+
+    results = {name: _stats(values, errors[name], elapsed) for name, values in latencies.items()}
+    everything = [value for values in latencies.values() for value in values]
+    results['total'] = _stats(everything, sum(errors.values()), elapsed)
+    print(f'{"сценарий":<10} {"запросов":>8} {"rps":>8} {"p50":>9} {"p95":>9} {"p99":>9} {"ошибок":>6}')
+    for name, stats in results.items():
+        print(f'{name:<10} {stats["requests"]:8d} {stats["rps"]:8.1f} {stats["p50"]:7.1f}ms {stats["p95"]:7.1f}ms '
+              f'{stats["p99"]:7.1f}ms {stats["errors"]:6d}')
+
+    meta = {**report.environment(), 'users': args.users, 'duration': args.duration}
+    print(f'Отчёт: {report.save("load", meta, results, args.output)}')
+    if args.compare:
+        current = {'kind': 'load', 'meta': meta, 'results': results}
+        sys.exit(1 if report.compare(report.load(args.compare), current, args.threshold) else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Нагрузка на синхронный (gunicorn, WSGI) и асинхронный (uvicorn, ASGI) путь чтения.
+
+Оба сервера поднимаются на одной БД с одинаковым числом воркеров, клиенты —
+asyncio-корутины на «сырых» HTTP/1.1-соединениях, чтобы не тянуть лишних
+зависимостей. Кэш анонимных ответов выключен (BARTER_CACHE_TIMEOUT=0),
+иначе синхронный путь меряет Redis, а не БД. Нужны данные:
+``python manage.py seed_barter``.
+
+    python -m benchmarks.load_asgi --concurrency 200 --requests 5000
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+SERVERS = {
+    'wsgi /ads/': (['gunicorn', 'core.wsgi:application'], '/ads/'),
+    'asgi /async/ads/': (['gunicorn', 'core.asgi:application', '-k', 'uvicorn.workers.UvicornWorker'], '/async/ads/'),
+}
+
+
+async def _get(host, port, path):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n'.encode())
+    await writer.drain()
+    status = (await reader.readline()).split()[1]
+    await reader.read()
+    writer.close()
+    return int(status)
+
+
+async def _load(host, port, path, concurrency, total):
+    latencies, errors = [], 0
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+
+    async def client():
+        nonlocal errors
+        while not queue.empty():
+            queue.get_nowait()
+            started = time.perf_counter()
+            try:
+                if await _get(host, port, path) != 200:
+                    errors += 1
+            except OSError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return total / (time.perf_counter() - started), sorted(latencies), errors
+
+
+def _wait_ready(host, port, path, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if asyncio.run(_get(host, port, path)) == 200:
+                return
+        except (OSError, IndexError):
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f'Сервер {host}:{port} не поднялся')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--query', default='limit=20', help='Параметры запроса к списку')
+    args = parser.parse_args()
+
+    print(f'{args.requests} запросов, {args.concurrency} клиентов, {args.workers} воркера')
+    for name, (command, path) in SERVERS.items():
+        path = f'{path}?{args.query}' if args.query else path
+        server = subprocess.Popen(
+            [*command, '-b', f'{args.host}:{args.port}', '-w', str(args.workers), '--log-level', 'warning'],
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'core.settings', 'BARTER_CACHE_TIMEOUT': '0'},
+            stdout=sys.stdout, stderr=sys.stderr,
+        )
+        try:
+            _wait_ready(args.host, args.port, path)
+            rps, latencies, errors = asyncio.run(
+                _load(args.host, args.port, path, args.concurrency, args.requests)
+            )
+        finally:
+            server.terminate()
+            server.wait()
+        p50 = latencies[len(latencies) // 2] * 1e3
+        p99 = latencies[int(len(latencies) * 0.99) - 1] * 1e3
+        print(f'  {name:<18} {rps:8.1f} rps  p50 {p50:7.1f} ms  p99 {p99:7.1f} ms  ошибок {errors}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Нагрузка на WSGI-профиль gunicorn с новыми и постоянными соединениями к БД.
+
+Сервер поднимается по gunicorn.conf.py дважды: с DB_CONN_MAX_AGE=0 (новое
+соединение с Postgres на каждый запрос) и с постоянными соединениями.
+Кроме пропускной способности считается, сколько сессий открыл Postgres
+(pg_stat_database.sessions), и отдельно — сколько стоит одно подключение.
+Кэш анонимных ответов выключен. Нужны данные: ``python manage.py seed_barter``.
+
+    python -m benchmarks.load_connections --concurrency 50 --requests 5000
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks import setup_django
+from benchmarks.load_asgi import _load, _wait_ready
+
+
+def _sessions(connection):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT sessions FROM pg_stat_database WHERE datname = current_database()')
+        return cursor.fetchone()[0]
+
+
+def _connect_cost(number=50):
+    """Среднее время установки соединения с БД, секунды"""
+    from django.db import connections
+    started = time.perf_counter()
+    for _ in range(number):
+        connection = connections.create_connection('default')
+        connection.ensure_connection()
+        connection.close()
+    return (time.perf_counter() - started) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--path', help='По умолчанию — карточка первого объявления')
+    parser.add_argument('--max-age', type=int, nargs='+', default=[0, 60], help='Значения DB_CONN_MAX_AGE')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+    from barter.models import Ad
+
+    path = args.path or f'/ads/{Ad.objects.order_by("id").values_list("id", flat=True).first()}/'
+    print(f'Подключение к БД: {_connect_cost() * 1e3:.2f} ms')
+    print(f'{path}: {args.requests} запросов, {args.concurrency} клиентов, '
+          f'{args.workers} воркера x {args.threads} потока')
+
+    for max_age in args.max_age:
+        server = subprocess.Popen(
+            ['gunicorn', '-c', 'gunicorn.conf.py', '-b', f'{args.host}:{args.port}',
+             '-w', str(args.workers), '--threads', str(args.threads), '--log-level', 'warning',
+             '--access-logfile', '/dev/null'],
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'core.settings', 'BARTER_CACHE_TIMEOUT': '0',
+                 'DB_CONN_MAX_AGE': str(max_age), 'GUNICORN_WORKER_CLASS': 'gthread'},
+            stdout=sys.stdout, stderr=sys.stderr,
+        )
+        try:
+            _wait_ready(args.host, args.port, path)
+            before = _sessions(connection)
+            rps, latencies, errors = asyncio.run(
+                _load(args.host, args.port, path, args.concurrency, args.requests)
+            )
+            opened = _sessions(connection) - before
+        finally:
+            server.terminate()
+            server.wait()
+        p50 = latencies[len(latencies) // 2] * 1e3
+        p99 = latencies[int(len(latencies) * 0.99) - 1] * 1e3
+        print(f'  CONN_MAX_AGE={max_age:<4} {rps:8.1f} rps  p50 {p50:7.1f} ms  p99 {p99:7.1f} ms  '
+              f'сессий БД {opened:6d}  ошибок {errors}')
+
+
+if __name__ == '__main__':
+    main()
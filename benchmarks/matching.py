@@ -0,0 +1,69 @@
+"""Поиск цепочек обмена на синтетическом графе предложений.
+
+    python -m benchmarks.matching --edges 1000000 3000000 --nodes-ratio 4
+
+Граф случайный: вершины — объявления, в среднем --nodes-ratio рёбер на
+вершину. Меряются построение CSR, полный поиск циклов до --max-length и
+инкрементальный прогон после --new новых рёбер. Django и БД не нужны.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks import setup_django
+
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--edges', type=int, nargs='+', default=[1_000_000, 3_000_000])
+    parser.add_argument('--nodes-ratio', type=float, default=4.0, help='Рёбер на вершину')
+    parser.add_argument('--max-length', type=int, default=4)
+    parser.add_argument('--new', type=int, default=1000)
+    parser.add_argument('--random-seed', type=int, default=0)
+    args = parser.parse_args()
+
+    setup_django()
+    from barter.matching import ProposalGraph
+
+    rng = np.random.default_rng(args.random_seed)
+    for edges in args.edges:
+        nodes = int(edges / args.nodes_ratio)
+        senders = rng.integers(0, nodes, edges)
+        receivers = rng.integers(0, nodes, edges)
+        ids = np.arange(1, edges + 1)
+
+        graph, build = timed(lambda: ProposalGraph.from_edges(ids, senders, receivers))
+        chains, full = timed(lambda: graph.match(args.max_length))
+        by_length = np.bincount([len(ad_ids) for ad_ids, _ in chains], minlength=args.max_length + 1)[2:]
+
+        # новые рёбра: пересобираем граф и ищем только в окрестности новых рёбер
+        new_senders = rng.integers(0, nodes, args.new)
+        new_receivers = rng.integers(0, nodes, args.new)
+        graph = ProposalGraph.from_edges(
+            np.concatenate([ids, np.arange(edges + 1, edges + args.new + 1)]),
+            np.concatenate([senders, new_senders]), np.concatenate([receivers, new_receivers]),
+        )
+
+        def incremental():
+            used = graph.node_mask([ad_id for ad_ids, _ in chains for ad_id in ad_ids])
+            touched = graph.node_mask(np.concatenate([new_senders, new_receivers]))
+            depth = args.max_length - 1
+            region = graph.ball(touched, depth) & graph.ball(touched, depth, reverse=True)
+            return graph.match(args.max_length, mask=region, used=used)
+
+        added, partial = timed(incremental)
+        print(f'{edges} рёбер, {nodes} вершин')
+        print(f'  CSR               {build:7.2f} s')
+        print(f'  полный поиск      {full:7.2f} s  цепочек {len(chains)} (по длинам 2..: {by_length.tolist()})')
+        print(f'  +{args.new} рёбер        {partial:7.2f} s  новых цепочек {len(added)}')
+
+
+if __name__ == '__main__':
+    main()
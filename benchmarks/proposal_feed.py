@@ -0,0 +1,54 @@
+"""Лента предложений: OR по двум join'ам против UNION ALL по индексам.
+
+    python -m benchmarks.proposal_feed --sizes 10000 100000 1000000
+
+Для каждого размера БД очищается и засеивается заново (seed_barter --clear).
+Меряется первая страница ленты: COUNT(*) и выборка 10 строк.
+"""
+import argparse
+import io
+
+from benchmarks import measure, print_table, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from django.db import connection
+    from barter.feed import ProposalFeed
+    from barter.models import ExchangeProposal
+
+    User = get_user_model()
+
+    for size in args.sizes:
+        call_command(
+            'seed_barter', clear=True, proposals=size, ads=max(size // 5, 100), users=max(size // 50, 10),
+            categories=20, stdout=io.StringIO(),
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        user = User.objects.filter(username__startswith='seed_').order_by('?').first()
+
+        legacy = (
+            ExchangeProposal.objects.filter(sender__author=user)
+            | ExchangeProposal.objects.filter(receiver__author=user)
+        ).order_by('-created_at', '-id')
+        feed = ProposalFeed(user).get()
+
+        def page(queryset):
+            return lambda: (queryset.count(), list(queryset[:args.limit]))
+
+        print_table(f'{size} предложений', [
+            ('OR по join', measure(page(legacy), number=5, repeat=3)),
+            ('UNION ALL', measure(page(feed), number=5, repeat=3)),
+        ])
+
+
+if __name__ == '__main__':
+    main()
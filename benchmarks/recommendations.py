@@ -0,0 +1,50 @@
+"""Матрица сродства категорий и выбор категорий для рекомендаций.
+
+    python -m benchmarks.recommendations --proposals 1000000 --categories 200
+
+Предложения синтетические: категории получателей распределены по Ципфу.
+Меряются сборка матрицы count_matrix, построение AffinityIndex и ответ
+top_categories для пользователя с несколькими объявлениями. БД не нужна.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks import measure, print_table, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--proposals', type=int, default=1_000_000)
+    parser.add_argument('--categories', type=int, default=200)
+    parser.add_argument('--random-seed', type=int, default=0)
+    args = parser.parse_args()
+
+    setup_django()
+    from barter.recommendations import STATUS_WEIGHTS, AffinityIndex, count_matrix
+
+    rng = np.random.default_rng(args.random_seed)
+    category_ids = np.arange(1, args.categories + 1)
+    sources = rng.integers(1, args.categories + 1, args.proposals)
+    targets = np.minimum(rng.zipf(1.5, args.proposals), args.categories)
+    weights = rng.choice(list(STATUS_WEIGHTS.values()), args.proposals)
+
+    started = time.perf_counter()
+    counts = count_matrix(category_ids, sources, targets, weights)
+    matrix = time.perf_counter() - started
+    started = time.perf_counter()
+    index = AffinityIndex(category_ids, counts, smoothing=5)
+    build = time.perf_counter() - started
+    own = rng.integers(1, args.categories + 1, 5)
+
+    print(f'{args.proposals} предложений, {args.categories} категорий')
+    print_table('', [
+        ('count_matrix', matrix),
+        ('AffinityIndex', build),
+        ('top_categories', measure(lambda: index.top_categories(own, 5), number=1000)),
+    ])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Отчёты бенчмарков в JSON и сравнение с сохранённым прогоном.
+
+Отчёт — {'kind', 'meta', 'results': {сценарий: {метрика: число}}}. Сравнение
+идёт по метрикам из COMPARED, которые есть в обоих отчётах; ухудшение больше порога
+помечается, и скрипт завершается с кодом 1, чтобы это было видно в CI.
+"""
+import json
+import os
+import platform
+import subprocess
+import time
+from pathlib import Path
+
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+
+# что сравнивается: min, mean и разброс слишком шумные, чтобы по ним ловить регрессии
+COMPARED = ('median', 'p50', 'p95', 'p99', 'ops', 'rps', 'queries', 'errors')
+# метрики, где больше — лучше; остальные (время, ошибки, запросы) — чем меньше, тем лучше
+HIGHER_IS_BETTER = {'ops', 'rps'}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    """Что влияет на цифры: версия кода, машина, объём данных"""
+    from django.conf import settings
+    from barter.models import Ad, ExchangeProposal
+    from barter.pagination import estimate_count
+
+    return {
+        'commit': _git_commit(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'cpus': len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count(),
+        'database': settings.DATABASES['default']['NAME'],
+        'ads': estimate_count(Ad.objects.all()),
+        'proposals': estimate_count(ExchangeProposal.objects.all()),
+    }
+
+
+def save(kind, meta, results, path=None):
+    path = Path(path) if path else RESULTS_DIR / f'{kind}-{time.strftime("%Y%m%d-%H%M%S")}.json'
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({'kind': kind, 'meta': meta, 'results': results}, indent=2, ensure_ascii=False))
+    return path
+
+
+def load(path):
+    return json.loads(Path(path).read_text())
+
+
+def compare(baseline, report, threshold=0.1):
+    """Печатает изменения относительно baseline; возвращает число ухудшений больше threshold"""
+    if baseline['kind'] != report['kind']:
+        raise ValueError(f'Разные виды отчётов: {baseline["kind"]} и {report["kind"]}')
+    for key in ('ads', 'proposals', 'cpus'):
+        if baseline['meta'].get(key) != report['meta'].get(key):
+            before, after = baseline['meta'].get(key), report['meta'].get(key)
+            print(f'Внимание: {key} {before} -> {after}, цифры могут быть несравнимы')
+
+    print(f'Сравнение с {baseline["meta"].get("commit")} ({baseline["meta"].get("date")}), порог {threshold:.0%}')
+    regressions = 0
+    for name, stats in report['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            print(f'  {name:<12} новый сценарий')
+            continue
+        for metric in COMPARED:
+            value, old = stats.get(metric), before.get(metric)
+            if value is None or old is None:
+                continue
+            if old == 0:
+                change = 0.0 if value == 0 else float('inf')
+            else:
+                change = (value - old) / old
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            mark = ''
+            if worse > threshold:
+                mark = '  << хуже'
+                regressions += 1
+            elif worse < -threshold:
+                mark = '  лучше'
+            print(f'  {name:<12} {metric:<8} {old:12.3f} -> {value:12.3f}  {change:+8.1%}{mark}')
+    return regressions
@@ -0,0 +1,62 @@
+"""Сценарии для benchmarks.suite и benchmarks.load: список, поиск, карточка, лента, создание.
+
+Цели выбираются из данных seed_barter: пользователь с самой длинной лентой
+предложений (при степенном распределении — «тяжёлый» пользователь), выборка
+id объявлений для карточек и слова из словаря сидера для поиска.
+"""
+import random
+from collections import namedtuple
+from urllib.parse import urlencode
+
+# name, доля в смеси нагрузки, функция (targets, rnd) -> (метод, путь, тело JSON или None)
+Scenario = namedtuple('Scenario', ['name', 'weight', 'request'])
+
+SEARCH_TERMS = ('велосипед', 'горный велосипед', 'xiaomi42', 'гитара yamaha', 'laptop')
+
+
+class Targets:
+    def __init__(self, user, ad_ids, category_id):
+        self.user = user
+        self.ad_ids = ad_ids
+        self.category_id = category_id
+
+    @classmethod
+    def load(cls, sample=1000, seed=0):
+        from django.contrib.auth import get_user_model
+        from django.db.models import Count
+        from barter.models import Category, ExchangeProposal
+
+        top = (
+            ExchangeProposal.objects.values('receiver_author').annotate(total=Count('id')).order_by('-total').first()
+        )
+        if top is None:
+            raise SystemExit('Нет данных: python manage.py seed_barter')
+        user = get_user_model().objects.get(pk=top['receiver_author'])
+        ad_ids = _sample_ad_ids(sample, seed)
+        category_id = Category.objects.order_by('-active_ads_count').values_list('id', flat=True).first()
+        return cls(user, ad_ids, category_id)
+
+
+def _sample_ad_ids(sample, seed):
+    # случайные id из диапазона вместо ORDER BY random() по всей таблице
+    from django.db.models import Max, Min
+    from barter.models import Ad
+
+    bounds = Ad.objects.aggregate(low=Min('id'), high=Max('id'))
+    rnd = random.Random(seed)
+    candidates = [rnd.randint(bounds['low'], bounds['high']) for _ in range(sample * 2)]
+    return list(Ad.objects.filter(pk__in=candidates).values_list('id', flat=True)[:sample])
+
+
+SCENARIOS = (
+    Scenario('list', 40, lambda t, rnd: ('GET', '/ads/?limit=20', None)),
+    Scenario('search', 15, lambda t, rnd: (
+        'GET', '/ads/?' + urlencode({'limit': 20, 'search': rnd.choice(SEARCH_TERMS)}), None
+    )),
+    Scenario('detail', 30, lambda t, rnd: ('GET', f'/ads/{rnd.choice(t.ad_ids)}/', None)),
+    Scenario('feed', 10, lambda t, rnd: ('GET', '/proposals/?limit=20', None)),
+    Scenario('create', 5, lambda t, rnd: ('POST', '/ads/', {
+        'title': f'bench {rnd.randrange(10 ** 6)}', 'description': 'Нагрузочный тест', 'category_id': t.category_id,
+        'condition': 'used',
+    })),
+)
@@ -0,0 +1,44 @@
+"""Накладные расходы auto_schema на один запрос.
+
+"до" — прежнее поведение: после каждого вызова метода строилась схема
+и заново применялся extend_schema. "после" — метод, оставленный в классе
+декоратором. Запросы к БД, которые прежняя версия делала при чтении
+choices связанных полей, здесь не учитываются.
+"""
+from benchmarks import measure, print_table, setup_django
+
+
+def main():
+    setup_django()
+
+    from drf_spectacular.utils import extend_schema
+    from barter.utils.api_docs import _build_schema, auto_schema
+    from barter.serializers import ExchangeProposalSerializer
+
+    def view_method(self, request):
+        return None
+
+    def legacy_wrapped(self, request):
+        response = view_method(self, request)
+        schema_config = _build_schema(type(self), 'post', False)
+        extend_schema(**schema_config)(view_method)
+        return response
+
+    class View:
+        serializer_class = ExchangeProposalSerializer
+
+        @auto_schema()
+        def post(self, request):
+            return None
+
+    view = View()
+    rows = [
+        ('без декоратора', measure(lambda: view_method(view, None))),
+        ('до (схема на каждый запрос)', measure(lambda: legacy_wrapped(view, None), number=200)),
+        ('после (схема при создании класса)', measure(lambda: view.post(None))),
+    ]
+    print_table('auto_schema: время вызова метода представления', rows)
+
+
+if __name__ == '__main__':
+    main()
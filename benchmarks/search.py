@@ -0,0 +1,45 @@
+"""Поиск объявлений: ILIKE по двум полям против полнотекстового индекса.
+
+    python -m benchmarks.search --ads 1000000
+
+Если в БД меньше объявлений, чем --ads, недостающие засеваются seed_barter.
+"""
+import argparse
+
+from benchmarks import measure, print_table, setup_django
+
+# от редкого к частому: модель, бренд с префиксом, пара слов, одно частое слово
+TERMS = ('yamaha4242', 'xiaomi42', 'горный велосипед', 'велосипед')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--ads', type=int, default=1_000_000)
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.management import call_command
+    from django.db import connection
+    from django.db.models import Q
+    from barter.models import Ad
+    from barter.search import search_ads
+
+    missing = args.ads - Ad.objects.count()
+    if missing > 0:
+        call_command('seed_barter', ads=missing, proposals=0, users=max(missing // 100, 2))
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE barter_ad')
+
+    active = Ad.objects.filter(is_active=True)
+    rows = []
+    for term in TERMS:
+        legacy = active.filter(Q(title__icontains=term) | Q(description__icontains=term))
+        rows.append((f'icontains  "{term}"', measure(lambda: list(legacy[:args.limit]), number=3, repeat=3)))
+        found = search_ads(active, term)
+        rows.append((f'fulltext   "{term}"', measure(lambda: list(found[:args.limit]), number=3, repeat=3)))
+    print_table(f'Поиск по {Ad.objects.count()} объявлениям, первая страница', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""Сериализация списка объявлений: ModelSerializer против ValuesReader.
+
+    python -m benchmarks.serializers --rows 10000
+
+Нужны данные (python manage.py seed_barter --ads 10000). Меряется отдельно
+чтение с сериализацией и сериализация уже загруженных строк; итоговый JSON
+обоих путей сравнивается побайтно.
+"""
+import argparse
+
+from benchmarks import measure, print_table, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=10_000)
+    args = parser.parse_args()
+
+    setup_django()
+    from rest_framework.renderers import JSONRenderer
+    from barter.models import Ad
+    from barter.serializers import AdSerializer
+    from barter.utils.queryset import optimize_queryset
+    from barter.utils.readers import compile_reader
+
+    queryset = Ad.objects.order_by('-created_at', '-id')[:args.rows]
+    reader = compile_reader(AdSerializer)
+
+    def drf():
+        return AdSerializer(list(optimize_queryset(queryset, AdSerializer)), many=True).data
+
+    def fast():
+        return reader.many(list(reader.queryset(queryset)))
+
+    if JSONRenderer().render(drf()) != JSONRenderer().render(fast()):
+        raise SystemExit('Вывод ValuesReader отличается от AdSerializer')
+
+    instances = list(optimize_queryset(queryset, AdSerializer))
+    rows = list(reader.queryset(queryset))
+    print_table(f'{len(rows)} объявлений, на весь список', [
+        ('AdSerializer: чтение + сериализация', measure(drf, number=1, repeat=3)),
+        ('ValuesReader: чтение + сериализация', measure(fast, number=1, repeat=3)),
+        ('AdSerializer: только сериализация', measure(lambda: AdSerializer(instances, many=True).data, number=1, repeat=3)),
+        ('ValuesReader: только сериализация', measure(lambda: reader.many(rows), number=1, repeat=3)),
+    ])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""Выгрузка всего списка объявлений: обычный ответ против ?stream=1.
+
+    python -m benchmarks.streaming --rows 50000
+
+Нужны данные (python manage.py seed_barter). Для каждого режима меряются
+время и пик выделенной памяти Python (tracemalloc) на один запрос.
+"""
+import argparse
+import time
+import tracemalloc
+
+from benchmarks import setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=50_000)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import Client
+
+    client = Client()
+    modes = {
+        'обычный ответ': {'limit': args.rows},
+        'stream=1': {'stream': '1'},
+    }
+    print(f'Выгрузка до {args.rows} объявлений')
+    for name, params in modes.items():
+        tracemalloc.start()
+        started = time.perf_counter()
+        response = client.get('/ads/', params, HTTP_ACCEPT='application/json')
+        size = sum(len(chunk) for chunk in response.streaming_content) if response.streaming else len(response.content)
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f'  {name:<14} {elapsed:7.2f} s  пик {peak / 2 ** 20:8.1f} MiB  ответ {size / 2 ** 20:7.1f} MiB')
+
+
+if __name__ == '__main__':
+    main()
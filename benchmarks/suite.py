@@ -0,0 +1,106 @@
+"""Набор микробенчмарков эндпоинтов в процессе, без сети и сервера.
+
+Каждый сценарий из benchmarks.scenarios прогоняется через тестовый клиент
+Django от имени пользователя с самой длинной лентой: после разогрева
+--rounds вызовов, по ним — min/median/mean/p95/stddev и ops, как в
+pytest-benchmark, плюс число запросов к БД на вызов. Создание объявления
+откатывается, данные между прогонами не меняются. Отчёт пишется в
+benchmarks/results/, с --compare сравнивается с прошлым:
+
+    python manage.py seed_barter --clear --users 20000 --ads 1000000 --proposals 1000000
+    python -m benchmarks.suite --output benchmarks/results/baseline.json
+    python -m benchmarks.suite --compare benchmarks/results/baseline.json
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+from benchmarks import setup_django
+
+
+def _stats(timings, queries):
+    ordered = sorted(timings)
+    mean = statistics.fmean(ordered)
+    return {
+        'min': ordered[0] * 1e3,
+        'median': statistics.median(ordered) * 1e3,
+        'mean': mean * 1e3,
+        'p95': ordered[max(int(len(ordered) * 0.95) - 1, 0)] * 1e3,
+        'stddev': (statistics.stdev(ordered) if len(ordered) > 1 else 0.0) * 1e3,
+        'ops': 1 / mean,
+        'queries': queries,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--only', nargs='+', help='Только эти сценарии')
+    parser.add_argument('--random-seed', type=int, default=0)
+    parser.add_argument('--output', help='Куда сохранить отчёт (по умолчанию benchmarks/results/suite-<время>.json)')
+    parser.add_argument('--compare', help='Отчёт, с которым сравнить')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Ухудшение, которое считается регрессией')
+    args = parser.parse_args()
+
+    # на тяжёлых данных журнал медленных запросов забивает вывод и сам тратит время
+    os.environ.setdefault('BARTER_SLOW_QUERY_MS', '1e9')
+    setup_django()
+    from django.db import connection, transaction
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext, setup_test_environment
+    from benchmarks import report
+    from benchmarks.scenarios import SCENARIOS, Targets
+
+    # тестовый клиент шлёт Host: testserver, которого нет в ALLOWED_HOSTS вне pytest
+    setup_test_environment()
+    targets = Targets.load(seed=args.random_seed)
+    client = Client()
+    client.force_login(targets.user)
+    rnd = random.Random(args.random_seed)
+
+    def call(scenario):
+        method, path, body = scenario.request(targets, rnd)
+        # запись откатывается, чтобы прогоны шли на одних и тех же данных
+        with transaction.atomic():
+            if body is None:
+                response = getattr(client, method.lower())(path)
+            else:
+                response = getattr(client, method.lower())(path, json.dumps(body), content_type='application/json')
+            transaction.set_rollback(True)
+        if response.status_code >= 400:
+            raise SystemExit(f'{scenario.name}: {method} {path} -> {response.status_code}')
+
+    results = {}
+    print(f'{"сценарий":<10} {"min":>9} {"median":>9} {"mean":>9} {"p95":>9} {"stddev":>9} {"ops":>8} {"SQL":>4}')
+    for scenario in SCENARIOS:
+        if args.only and scenario.name not in args.only:
+            continue
+        for _ in range(args.warmup):
+            call(scenario)
+        with CaptureQueriesContext(connection) as context:
+            call(scenario)
+        # SAVEPOINT/RELEASE от atomic() в счёт не идут
+        queries = sum(1 for query in context.captured_queries if 'SAVEPOINT' not in query['sql'])
+        timings = []
+        for _ in range(args.rounds):
+            started = time.perf_counter()
+            call(scenario)
+            timings.append(time.perf_counter() - started)
+        stats = results[scenario.name] = _stats(timings, queries)
+        print(f'{scenario.name:<10} {stats["min"]:7.2f}ms {stats["median"]:7.2f}ms {stats["mean"]:7.2f}ms '
+              f'{stats["p95"]:7.2f}ms {stats["stddev"]:7.2f}ms {stats["ops"]:8.1f} {queries:4d}')
+
+    meta = {**report.environment(), 'rounds': args.rounds}
+    print(f'Отчёт: {report.save("suite", meta, results, args.output)}')
+    if args.compare:
+        current = {'kind': 'suite', 'meta': meta, 'results': results}
+        sys.exit(1 if report.compare(report.load(args.compare), current, args.threshold) else 0)
+
+
+if __name__ == '__main__':
+    main()
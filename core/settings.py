@@ -34,6 +34,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'barter',
     'django_filters',
@@ -42,7 +43,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'barter.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'barter.replicas.ReplicaReadMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -83,12 +86,118 @@ DATABASES = {
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'barter123'),
         'HOST': os.getenv('POSTGRES_HOST', 'db'),
         'PORT': os.getenv('POSTGRES_PORT', '5432'),
+        # Соединение живёт между запросами (секунды; 0 — новое на каждый запрос).
+        # Перед повторным использованием проверяется, что оно не оборвалось.
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE') or 60),
+        'CONN_HEALTH_CHECKS': True,
         'OPTIONS': {
             'connect_timeout': 5,
         },
     }
 }
 
+# Реплики только для чтения: POSTGRES_REPLICA_HOSTS=host[:port],... — по
+# алиасу replica1, replica2, ... с теми же учётными данными, что у основной БД.
+# POSTGRES_REPLICA_DB задаёт имя базы на репликах (по умолчанию как у основной);
+# локально можно поднять вторую базу на том же сервере и указать её здесь.
+# В тестах реплики смотрят в тестовую основную БД (MIRROR).
+for number, replica in enumerate(filter(None, (os.getenv('POSTGRES_REPLICA_HOSTS') or '').split(',')), 1):
+    host, _, port = replica.strip().rpartition(':')
+    if not port.isdigit():
+        host, port = replica.strip(), DATABASES['default']['PORT']
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'NAME': os.getenv('POSTGRES_REPLICA_DB') or DATABASES['default']['NAME'],
+        'HOST': host,
+        'PORT': port,
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['barter.replicas.ReplicaRouter']
+
+# Алиасы реплик, с которых GET-запросы читают модели barter
+BARTER_READ_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+
+# Сколько секунд после изменяющего запроса клиент читает с основной БД,
+# чтобы видеть свои изменения; должно покрывать отставание реплик
+BARTER_REPLICA_STICKY_SECONDS = int(os.getenv('BARTER_REPLICA_STICKY_SECONDS') or 5)
+
+# Cache
+# Локально и в тестах — память процесса, в проде — Redis (REDIS_URL)
+
+# Кэш metrics — счётчики гистограмм /metrics, общие для воркеров; отдельный
+# алиас, чтобы в памяти процесса они не вытесняли кэш ответов и наоборот.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        },
+        'metrics': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+            'KEY_PREFIX': 'metrics',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'metrics': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'metrics',
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        },
+    }
+
+BARTER_CACHE_TIMEOUT = int(os.getenv('BARTER_CACHE_TIMEOUT', '300'))
+
+# Сколько строк за раз читается из БД и кодируется при ?stream=1
+BARTER_STREAM_CHUNK_SIZE = int(os.getenv('BARTER_STREAM_CHUNK_SIZE', '2000'))
+
+# Строк в одной транзакции пакетного импорта
+BARTER_BULK_BATCH_SIZE = int(os.getenv('BARTER_BULK_BATCH_SIZE', '1000'))
+
+# Предельный размер пачки в /proposals/batch/
+BARTER_BATCH_MAX_SIZE = int(os.getenv('BARTER_BATCH_MAX_SIZE', '1000'))
+
+# Самая длинная цепочка обмена, которую ищет barter.matching
+BARTER_CHAIN_MAX_LENGTH = int(os.getenv('BARTER_CHAIN_MAX_LENGTH', '4'))
+
+# Сколько секунд дерево категорий живёт в памяти процесса, если смену поколения не видно (кэш не общий)
+BARTER_CATEGORIES_MAX_AGE = int(os.getenv('BARTER_CATEGORIES_MAX_AGE', '60'))
+
+# Рекомендации: сглаживание к популярности, возраст индекса в памяти (с), число категорий-кандидатов,
+# предложений в одной транзакции update_affinity
+BARTER_AFFINITY_SMOOTHING = float(os.getenv('BARTER_AFFINITY_SMOOTHING', '5'))
+BARTER_AFFINITY_MAX_AGE = int(os.getenv('BARTER_AFFINITY_MAX_AGE', '300'))
+BARTER_RECOMMENDATION_CATEGORIES = int(os.getenv('BARTER_RECOMMENDATION_CATEGORIES', '5'))
+BARTER_AFFINITY_BATCH_SIZE = int(os.getenv('BARTER_AFFINITY_BATCH_SIZE', '5000'))
+
+# Замеры ответов (barter.metrics): заголовок Server-Timing, порог медленного
+# SQL в миллисекундах, как часто воркер сливает гистограммы в кэш metrics
+BARTER_SERVER_TIMING = os.getenv('BARTER_SERVER_TIMING', 'True') == 'True'
+BARTER_SLOW_QUERY_MS = float(os.getenv('BARTER_SLOW_QUERY_MS') or 200)
+BARTER_METRICS_FLUSH_SECONDS = float(os.getenv('BARTER_METRICS_FLUSH_SECONDS') or 10)
+# Кому отдавать /metrics: по Bearer-токену, если он задан, иначе по адресу клиента
+BARTER_METRICS_TOKEN = os.getenv('BARTER_METRICS_TOKEN', '')
+BARTER_METRICS_ALLOWED_NETWORKS = (
+    os.getenv('BARTER_METRICS_ALLOWED_NETWORKS') or '127.0.0.0/8,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16'
+).split(',')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'barter.slow_queries': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -140,7 +249,7 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'barter.renderers.FastJSONRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
     ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
@@ -0,0 +1,96 @@
+"""Настройки gunicorn для продакшена: gunicorn -c gunicorn.conf.py
+
+По умолчанию — WSGI (core.wsgi) с воркерами gthread. Процессов по
+формуле 2 * CPU + 1 от доступных контейнеру ядер (с учётом квоты cgroup,
+docker --cpus), потоков в каждом — GUNICORN_THREADS. Каждый поток держит
+своё постоянное соединение с БД (DB_CONN_MAX_AGE), так что к Postgres
+открыто до workers * threads соединений. Число процессов по умолчанию
+урезается под бюджет DB_MAX_CONNECTIONS, а явно заданная конфигурация
+сверх бюджета не запускается.
+
+GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker переключает на ASGI
+(core.asgi, эндпоинты /async/); там постоянные соединения Django не
+переиспользует между запросами, поэтому по умолчанию они выключены, и
+соединение открывается на время запроса.
+"""
+import math
+import multiprocessing
+import os
+
+CGROUP_ROOT = '/sys/fs/cgroup'
+
+
+def _cgroup_cpus(root=CGROUP_ROOT):
+    """Квота CPU контейнера в ядрах (вверх до целого) или None, если её нет"""
+    try:
+        # cgroup v2: "<квота> <период>" или "max <период>"
+        with open(os.path.join(root, 'cpu.max')) as file:
+            quota, period = file.read().split()[:2]
+    except OSError:
+        # cgroup v1: квота -1 — без ограничения
+        try:
+            with open(os.path.join(root, 'cpu', 'cpu.cfs_quota_us')) as file:
+                quota = file.read().strip()
+            with open(os.path.join(root, 'cpu', 'cpu.cfs_period_us')) as file:
+                period = file.read().strip()
+        except OSError:
+            return None
+    if quota in ('max', '-1'):
+        return None
+    return max(math.ceil(int(quota) / int(period)), 1)
+
+
+def _cpu_count(root=CGROUP_ROOT):
+    # ядра, доступные процессу (taskset/cpuset контейнера), а не всей машины,
+    # и не больше квоты: sched_getaffinity её не видит
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover
+        cpus = multiprocessing.cpu_count()
+    quota = _cgroup_cpus(root)
+    return min(cpus, quota) if quota else cpus
+
+
+worker_class = os.getenv('GUNICORN_WORKER_CLASS') or 'gthread'
+asgi = worker_class.startswith('uvicorn')
+
+wsgi_app = 'core.asgi:application' if asgi else 'core.wsgi:application'
+bind = os.getenv('GUNICORN_BIND') or '0.0.0.0:8000'
+threads = 1 if asgi else int(os.getenv('GUNICORN_THREADS') or 4)
+
+if asgi and not os.getenv('DB_CONN_MAX_AGE'):
+    os.environ['DB_CONN_MAX_AGE'] = '0'
+
+# Соединений с БД, которые может держать этот экземпляр: с запасом под
+# max_connections Postgres (по умолчанию 100) для миграций, cron и psql
+db_connections_budget = int(os.getenv('DB_MAX_CONNECTIONS') or 80)
+persistent = os.getenv('DB_CONN_MAX_AGE') != '0'
+# сколько соединений держит один воркер; без постоянных соединений — не держит
+connections_per_worker = threads if persistent else 0
+
+workers = int(os.getenv('GUNICORN_WORKERS') or 0)
+if not workers:
+    workers = 2 * _cpu_count() + 1
+    if connections_per_worker:
+        workers = max(min(workers, db_connections_budget // connections_per_worker), 1)
+if workers * connections_per_worker > db_connections_budget:
+    raise RuntimeError(
+        f'{workers} воркеров по {connections_per_worker} соединений с БД — больше бюджета '
+        f'DB_MAX_CONNECTIONS={db_connections_budget}: уменьшите GUNICORN_WORKERS или GUNICORN_THREADS '
+        f'либо поднимите бюджет вместе с max_connections Postgres'
+    )
+
+# перезапуск воркеров против утечек памяти; jitter — чтобы не все разом
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS') or 2000)
+max_requests_jitter = max_requests // 10
+timeout = int(os.getenv('GUNICORN_TIMEOUT') or 30)
+graceful_timeout = 30
+# за nginx: держим keep-alive чуть дольше его keepalive_timeout к upstream
+keepalive = 75
+
+# heartbeat воркеров в памяти, а не на диске контейнера
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+accesslog = '-'
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL') or 'info'
+forwarded_allow_ips = os.getenv('GUNICORN_FORWARDED_ALLOW_IPS') or '*'
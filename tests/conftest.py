@@ -1,6 +1,40 @@
 import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
 
 @pytest.fixture(autouse=True)
 def enable_db_access_for_all_tests(db):
     """Даем доступ к БД всем тестам"""
-    pass
\ No newline at end of file
+    pass
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Кэш живёт дольше транзакции теста, поэтому чистим его сами"""
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def primary_reads_only(settings):
+    """Транзакцию теста видит только соединение default, реплики включают сами тесты"""
+    settings.BARTER_READ_REPLICAS = []
+
+
+@pytest.fixture
+def assert_constant_queries():
+    """Проверяет, что число запросов на страницу не растёт с её размером"""
+    def check(client, url, limits=(1, 10)):
+        # прогрев: кэши процесса (дерево категорий) заполняются первым запросом
+        client.get(url, {'limit': limits[0]})
+        counts = []
+        for limit in limits:
+            with CaptureQueriesContext(connection) as ctx:
+                response = client.get(url, {'limit': limit})
+            assert response.status_code == 200
+            assert len(response.data['results']) == limit
+            counts.append(len(ctx))
+        assert len(set(counts)) == 1, f'Число запросов зависит от размера страницы: {counts}'
+        return counts[0]
+    return check
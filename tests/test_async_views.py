@@ -0,0 +1,82 @@
+import json
+
+import pytest
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from barter.models import Ad, Category, ExchangeProposal
+
+User = get_user_model()
+
+
+@pytest.fixture
+def data():
+    me = User.objects.create_user(username='async_me', password='pass')
+    other = User.objects.create_user(username='async_other', password='pass')
+    category = Category.objects.create(title='Музыка')
+    ads = [
+        Ad.objects.create(title=f'Пластинка {i}', description='-', author=me if i % 2 else other, category=category)
+        for i in range(6)
+    ]
+    ExchangeProposal.objects.create(sender=ads[1], receiver=ads[0], comment='Обмен')
+    return me, category, ads
+
+
+@pytest.fixture
+def client(data):
+    """Сессионный клиент: асинхронные представления аутентифицируют через сессию"""
+    client = APIClient()
+    client.force_login(data[0])
+    return client
+
+
+@pytest.mark.parametrize('url, params', [
+    ('ads/', {}),
+    ('ads/', {'limit': 2, 'offset': 2}),
+    ('ads/', {'cursor': '', 'limit': 4}),
+    ('ads/', {'category': 'CATEGORY', 'condition': 'used'}),
+    ('ads/', {'search': 'пластинка'}),
+    ('ads/', {'category': '999999'}),
+    ('ads/', {'category': 'x', 'condition': 'spam'}),
+    ('ads/', {'near': '55.75,37.62', 'radius': '10', 'sort': 'distance'}),
+    ('ads/', {'radius': '10'}),
+    ('ads/AD/', {}),
+    ('ads/999999/', {}),
+    ('proposals/', {}),
+    ('proposals/', {'box': 'inbox'}),
+    ('proposals/PROPOSAL/', {}),
+])
+def test_async_matches_sync(client, data, url, params):
+    """Асинхронный путь отдаёт то же, что синхронный"""
+    _, category, ads = data
+    url = url.replace('AD', str(ads[0].id)).replace('PROPOSAL', str(ExchangeProposal.objects.first().id))
+    params = {k: str(category.id) if v == 'CATEGORY' else v for k, v in params.items()}
+
+    sync = client.get(f'/{url}', params)
+    async_ = client.get(f'/async/{url}', params)
+    assert async_.status_code == sync.status_code
+    assert json.loads(async_.content.decode().replace('/async/', '/')) == json.loads(sync.content)
+
+
+def test_async_is_read_only(client):
+    assert client.post('/async/ads/', {}).status_code == 405
+
+
+@pytest.mark.parametrize('url', ['/async/ads/', '/async/ads/AD/'])
+def test_async_survives_category_change_mid_request(client, data, monkeypatch, url):
+    """Поколение категорий меняется между запросом страницы и сериализацией: дерево — из снимка"""
+    from asgiref.sync import sync_to_async
+    from barter.cache import CATEGORIES_GENERATION, bump_generations
+    from django.db.models.query import QuerySet
+
+    def bumped(original):
+        async def method(queryset, *args, **kwargs):
+            result = await original(queryset, *args, **kwargs)
+            await sync_to_async(bump_generations)(CATEGORIES_GENERATION)
+            return result
+        return method
+
+    for name in ('aget', 'afirst', 'acount'):
+        monkeypatch.setattr(QuerySet, name, bumped(getattr(QuerySet, name)))
+    response = client.get(url.replace('AD', str(data[2][0].id)))
+    assert response.status_code == 200
+    assert 'Музыка' in response.content.decode()
@@ -0,0 +1,84 @@
+import pytest
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from barter.models import Ad, ExchangeProposal
+
+User = get_user_model()
+
+
+@pytest.fixture
+def users():
+    return User.objects.create_user(username='batch_me'), User.objects.create_user(username='batch_other')
+
+
+@pytest.fixture
+def client(users):
+    client = APIClient()
+    client.force_authenticate(user=users[0])
+    return client
+
+
+def make_ads(author, count, **kwargs):
+    return [Ad.objects.create(title=f'Ad {i}', description='-', author=author, **kwargs) for i in range(count)]
+
+
+def test_batch_create_in_constant_queries(client, users, django_assert_max_num_queries):
+    me, other = users
+    mine = make_ads(me, 1)[0]
+    targets = make_ads(other, 20)
+    payload = {'proposals': [
+        {'sender_id': mine.id, 'receiver_id': target.id, 'comment': 'Меняю'} for target in targets
+    ]}
+
+    # проверка прав, вставка и чтение результата не зависят от размера пачки
+    with django_assert_max_num_queries(5):
+        response = client.post('/proposals/batch/', payload, format='json')
+
+    assert response.status_code == 201
+    assert [item['receiver']['id'] for item in response.json()] == [target.id for target in targets]
+    proposal = ExchangeProposal.objects.filter(sender=mine).first()
+    assert (proposal.status, proposal.sender_author_id, proposal.receiver_author_id) == ('pending', me.id, other.id)
+
+
+def test_batch_create_is_all_or_nothing(client, users):
+    me, other = users
+    mine, foreign = make_ads(me, 1)[0], make_ads(other, 1)[0]
+    inactive = make_ads(other, 1, is_active=False)[0]
+
+    response = client.post('/proposals/batch/', {'proposals': [
+        {'sender_id': mine.id, 'receiver_id': foreign.id, 'comment': 'ok'},
+        {'sender_id': foreign.id, 'receiver_id': mine.id, 'comment': 'чужое'},
+        {'sender_id': mine.id, 'receiver_id': inactive.id, 'comment': 'неактивное'},
+    ]}, format='json')
+
+    assert response.status_code == 400
+    errors = response.json()['proposals']
+    assert errors[0] == {}
+    assert set(errors[1]) == {'sender_id', 'receiver_id'}
+    assert set(errors[2]) == {'receiver_id'}
+    assert not ExchangeProposal.objects.filter(sender_author=me).exists()
+
+
+def test_batch_status_updates_only_own_pending(client, users, django_assert_max_num_queries):
+    me, other = users
+    mine, foreign = make_ads(me, 1)[0], make_ads(other, 2)
+    inbox = [ExchangeProposal.objects.create(sender=ad, receiver=mine, comment='-') for ad in foreign]
+    outbox = ExchangeProposal.objects.create(sender=mine, receiver=foreign[0], comment='-')
+    ExchangeProposal.objects.filter(pk=inbox[1].pk).update(status='rejected')
+    before = ExchangeProposal.objects.get(pk=inbox[0].pk).updated_at
+
+    # блокировка объявлений и несколько UPDATE, без запросов на каждое предложение
+    with django_assert_max_num_queries(8):
+        response = client.post('/proposals/batch/status/', {
+            'ids': [inbox[0].id, inbox[1].id, outbox.id], 'status': 'accepted',
+        }, format='json')
+
+    assert response.json() == {'updated': 1}
+    statuses = dict(ExchangeProposal.objects.filter(receiver_author__in=users).values_list('id', 'status'))
+    # исходящее с тем же объявлением отклонено как конфликтующее
+    assert statuses == {inbox[0].id: 'accepted', inbox[1].id: 'rejected', outbox.id: 'rejected'}
+    assert ExchangeProposal.objects.get(pk=inbox[0].pk).updated_at > before
+
+
+def test_batch_status_rejects_unknown_status(client):
+    assert client.post('/proposals/batch/status/', {'ids': [1], 'status': 'pending'}, format='json').status_code == 400
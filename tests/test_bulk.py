@@ -0,0 +1,123 @@
+import csv
+import io
+import json
+
+import pytest
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from barter.models import Ad, Category
+
+User = get_user_model()
+
+
+@pytest.fixture
+def user():
+    return User.objects.create_user(username='partner', password='pass')
+
+
+@pytest.fixture
+def client(user):
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client
+
+
+@pytest.fixture
+def category():
+    return Category.objects.create(title='Инструменты')
+
+
+def ndjson(*rows):
+    return '\n'.join(json.dumps(row, ensure_ascii=False) for row in rows).encode()
+
+
+def test_ndjson_import_reports_row_errors(client, user, category, django_assert_max_num_queries):
+    body = ndjson(
+        {'title': 'Дрель', 'description': '-', 'category_id': category.id, 'condition': 'new'},
+        {'title': 'Пила', 'description': '-', 'category_id': 999999},
+        {'description': 'без названия'},
+        {'title': 'Молоток', 'description': '-', 'condition': 'как новый'},
+    ) + '\n\nне json\n'.encode()
+
+    # категории, вставка и транзакция — не больше десятка запросов на всю пачку
+    with django_assert_max_num_queries(10):
+        response = client.post('/ads/bulk/', body, content_type='application/x-ndjson')
+
+    assert response.status_code == 200
+    result = response.json()
+    assert result['created'] == 1
+    assert [error['line'] for error in result['errors']] == [2, 3, 4, 6]
+    assert 'category_id' in result['errors'][0]['errors']
+    assert 'title' in result['errors'][1]['errors']
+    assert Ad.objects.get(author=user).title == 'Дрель'
+
+
+def test_csv_import_updates_own_ads_only(client, user, category):
+    own = Ad.objects.create(title='Старое', description='-', author=user)
+    foreign = Ad.objects.create(title='Чужое', description='-', author=User.objects.create_user(username='x'))
+    before = Ad.objects.get(pk=own.pk).updated_at
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['id', 'title', 'description', 'category_id', 'is_active'])
+    writer.writerow([own.id, 'Новое', '', category.id, 'false'])
+    writer.writerow([foreign.id, 'Захват', '', '', ''])
+    writer.writerow(['', 'Созданное из CSV', 'описание', '', ''])
+    response = client.post('/ads/bulk/', buffer.getvalue().encode(), content_type='text/csv')
+
+    result = response.json()
+    assert (result['created'], result['updated']) == (1, 1)
+    assert result['errors'] == [{'line': 3, 'errors': {'id': ['Объявление не найдено']}}]
+    own.refresh_from_db()
+    assert (own.title, own.description, own.category_id, own.is_active) == ('Новое', '-', category.id, False)
+    assert own.updated_at > before
+    assert Ad.objects.get(pk=foreign.pk).title == 'Чужое'
+
+
+def test_database_error_skips_only_its_batch(client, user, category, settings, monkeypatch):
+    """Ошибка БД во второй пачке: первая и третья записаны, строки второй — в errors"""
+    from django.db import IntegrityError
+    from django.db.models.query import QuerySet
+
+    settings.BARTER_BULK_BATCH_SIZE = 2
+    bulk_create = QuerySet.bulk_create
+
+    def failing(self, objs, *args, **kwargs):
+        if any(obj.title == 'Сбой' for obj in objs):
+            raise IntegrityError('duplicate key')
+        return bulk_create(self, objs, *args, **kwargs)
+
+    monkeypatch.setattr(QuerySet, 'bulk_create', failing)
+    titles = ['Дрель', 'Пила', 'Сбой', 'Рубанок', 'Молоток']
+    body = ndjson(*({'title': title, 'description': '-', 'category_id': category.id} for title in titles))
+    response = client.post('/ads/bulk/', body, content_type='application/x-ndjson')
+
+    assert response.status_code == 200
+    result = response.json()
+    assert result['created'] == 3
+    assert [error['line'] for error in result['errors']] == [3, 4]
+    assert set(Ad.objects.filter(author=user).values_list('title', flat=True)) == {'Дрель', 'Пила', 'Молоток'}
+
+
+def test_import_requires_supported_type(client):
+    assert client.post('/ads/bulk/', {'title': 'x'}, format='json').status_code == 415
+    assert APIClient().post('/ads/bulk/', b'', content_type='text/csv').status_code in (401, 403)
+
+
+@pytest.mark.parametrize('accept, parse', [
+    ('application/x-ndjson', lambda text: [json.loads(line) for line in text.splitlines()]),
+    ('text/csv', lambda text: list(csv.DictReader(io.StringIO(text)))),
+])
+def test_export_round_trips(client, user, category, accept, parse):
+    for i in range(3):
+        Ad.objects.create(title=f'Ключ {i}', description='-', author=user, category=category)
+    Ad.objects.create(title='Чужое', description='-', author=User.objects.create_user(username='y'))
+
+    response = client.get('/ads/bulk/', HTTP_ACCEPT=accept)
+    assert response.streaming
+    assert response['Content-Type'].startswith(accept)
+    if accept == 'text/csv':
+        assert response['Content-Type'] == 'text/csv; charset=utf-8'
+    rows = parse(b''.join(response.streaming_content).decode())
+    assert [row['title'] for row in rows] == ['Ключ 0', 'Ключ 1', 'Ключ 2']
+    assert str(rows[0]['category_id']) == str(category.id)
@@ -0,0 +1,70 @@
+import pytest
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from barter.models import Ad, Category
+
+User = get_user_model()
+
+
+@pytest.fixture
+def ad():
+    author = User.objects.create_user(username='cached', password='pass')
+    category = Category.objects.create(title='Спорт')
+    return Ad.objects.create(title='Мяч', description='-', author=author, category=category)
+
+
+def test_anonymous_list_served_from_cache(ad, django_assert_num_queries):
+    """Повторный анонимный запрос не ходит в БД"""
+    client = APIClient()
+    first = client.get('/ads/', {'limit': 5})
+    with django_assert_num_queries(0):
+        second = client.get('/ads/', {'limit': 5, 'utm_source': 'ignored'})
+    assert second.status_code == 200
+    assert second.content == first.content
+    assert second['ETag'] == first['ETag']
+
+
+def test_etag_gives_not_modified(ad):
+    client = APIClient()
+    etag = client.get(f'/ads/{ad.id}/')['ETag']
+    response = client.get(f'/ads/{ad.id}/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert not response.content
+
+
+def test_ad_save_invalidates(ad):
+    client = APIClient()
+    client.get(f'/ads/{ad.id}/')
+    client.get('/ads/')
+    ad.title = 'Ракетка'
+    ad.save()
+    assert client.get(f'/ads/{ad.id}/').data['title'] == 'Ракетка'
+    assert any(item['title'] == 'Ракетка' for item in client.get('/ads/').data['results'])
+
+
+def test_category_change_invalidates_nested_output(ad):
+    client = APIClient()
+    client.get(f'/ads/{ad.id}/')
+    ad.category.title = 'Туризм'
+    ad.category.save()
+    assert client.get(f'/ads/{ad.id}/').data['category']['title'] == 'Туризм'
+
+
+def test_author_rename_invalidates_nested_output(ad):
+    client = APIClient()
+    etag = client.get(f'/ads/{ad.id}/')['ETag']
+    client.get('/ads/')
+    ad.author.username = 'renamed'
+    ad.author.save()
+    response = client.get(f'/ads/{ad.id}/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.data['author']['username'] == 'renamed'
+    assert any(item['author']['username'] == 'renamed' for item in client.get('/ads/').data['results'])
+
+
+def test_authenticated_requests_bypass_cache(ad):
+    client = APIClient()
+    client.force_authenticate(user=ad.author)
+    client.get('/ads/')
+    response = client.get('/ads/')
+    assert 'ETag' not in response
@@ -0,0 +1,221 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from barter.cache import CATEGORIES_GENERATION, bump_generations
+from barter import categories
+from barter.categories import get_tree
+from barter.forms import AdForm
+from barter.models import Ad, Category
+
+User = get_user_model()
+
+
+@pytest.fixture
+def tree():
+    """Электроника > Телефоны > Смартфоны, Электроника > Ноутбуки"""
+    electronics = Category.objects.create(title='Электроника')
+    phones = Category.objects.create(title='Телефоны', parent=electronics)
+    smartphones = Category.objects.create(title='Смартфоны', parent=phones)
+    laptops = Category.objects.create(title='Ноутбуки', parent=electronics)
+    return electronics, phones, smartphones, laptops
+
+
+@pytest.fixture
+def author():
+    return User.objects.create_user(username='tree_author')
+
+
+def counts(*categories):
+    return list(
+        Category.objects.filter(pk__in=[c.pk for c in categories]).order_by('pk')
+        .values_list('active_ads_count', flat=True)
+    )
+
+
+def test_path_and_depth(tree):
+    electronics, phones, smartphones, laptops = tree
+    smartphones.refresh_from_db()
+    assert smartphones.path == f'{electronics.pk}/{phones.pk}/{smartphones.pk}/'
+    assert smartphones.depth == 2
+    assert get_tree().subtree_ids(phones.pk) == [phones.pk, smartphones.pk]
+
+
+def test_move_subtree_rewrites_descendant_paths(tree):
+    electronics, phones, smartphones, laptops = tree
+    phones.parent = laptops
+    phones.save()
+    smartphones.refresh_from_db()
+    assert smartphones.path == f'{electronics.pk}/{laptops.pk}/{phones.pk}/{smartphones.pk}/'
+    assert smartphones.depth == 3
+
+    electronics.parent = smartphones
+    with pytest.raises(ValueError):
+        electronics.save()
+
+
+def test_move_into_own_subtree_is_a_validation_error(tree, client):
+    electronics, phones, smartphones, laptops = tree
+    electronics.parent = smartphones
+    with pytest.raises(ValidationError) as error:
+        electronics.full_clean()
+    assert 'parent' in error.value.message_dict
+    phones.parent = phones
+    with pytest.raises(ValidationError):
+        phones.full_clean()
+
+    # админка показывает ошибку в форме вместо 500
+    client.force_login(User.objects.create_superuser(username='tree_admin', password='-'))
+    response = client.post(
+        f'/admin/barter/category/{electronics.pk}/change/', {'title': 'Электроника', 'parent': smartphones.pk}
+    )
+    assert response.status_code == 200
+    assert 'parent' in response.context['adminform'].form.errors
+    electronics.refresh_from_db()
+    assert electronics.parent_id is None
+
+
+def test_trigger_maintains_active_ads_count(tree, author):
+    electronics, phones, smartphones, laptops = tree
+    ad = Ad.objects.create(title='-', description='-', author=author, category=smartphones)
+    Ad.objects.bulk_create([Ad(title='-', description='-', author=author, category=laptops) for _ in range(3)])
+    assert counts(smartphones, laptops) == [1, 3]
+
+    ad.category = laptops
+    ad.save()
+    Ad.objects.filter(category=laptops).exclude(pk=ad.pk).update(is_active=False)
+    assert counts(smartphones, laptops) == [0, 1]
+
+    ad.delete()
+    assert counts(smartphones, laptops) == [0, 0]
+
+
+def test_saving_category_keeps_trigger_count(tree, author):
+    electronics, phones, smartphones, laptops = tree
+    Ad.objects.create(title='-', description='-', author=author, category=laptops)
+    laptops.title = 'Ноутбуки и планшеты'
+    laptops.save()
+    assert counts(laptops) == [1]
+
+
+def test_filter_includes_descendants(tree, author, django_assert_num_queries):
+    electronics, phones, smartphones, laptops = tree
+    in_phones = Ad.objects.create(title='-', description='-', author=author, category=smartphones)
+    Ad.objects.create(title='-', description='-', author=author, category=laptops)
+    client = APIClient()
+    client.force_authenticate(user=author)
+
+    response = client.get('/ads/', {'category': phones.pk})
+    assert [item['id'] for item in response.data['results']] == [in_phones.pk]
+    assert len(client.get('/ads/', {'category': electronics.pk}).data['results']) == 2
+    # дерево уже в памяти: категория проверяется без запроса, остаются счётчик и страница
+    with django_assert_num_queries(2):
+        client.get('/ads/', {'category': phones.pk})
+
+    assert client.get('/ads/', {'category': 0}).status_code == 400
+    assert client.get('/async/ads/', {'category': phones.pk}).json()['results'][0]['id'] == in_phones.pk
+
+
+def test_tree_endpoint_sums_subtree_counts(tree, author):
+    electronics, phones, smartphones, laptops = tree
+    Ad.objects.create(title='-', description='-', author=author, category=smartphones)
+    Ad.objects.create(title='-', description='-', author=author, category=laptops)
+
+    roots = {node['id']: node for node in APIClient().get('/categories/').json()}
+    root = roots[electronics.pk]
+    assert root['active_ads_count'] == 2
+    assert [child['title'] for child in root['children']] == ['Ноутбуки', 'Телефоны']
+    assert root['children'][1]['children'][0]['active_ads_count'] == 1
+
+
+def test_tree_cache_invalidated_on_change(tree):
+    electronics, phones, smartphones, laptops = tree
+    assert get_tree() is get_tree()
+    tablets = Category.objects.create(title='Планшеты', parent=electronics)
+    assert tablets.pk in get_tree().subtree_ids(electronics.pk)
+
+
+def category_queries(context):
+    return [query['sql'] for query in context.captured_queries if 'barter_category' in query['sql']]
+
+
+def test_ad_reads_and_writes_skip_category_table(tree, author):
+    electronics, phones, smartphones, laptops = tree
+    client = APIClient()
+    client.force_authenticate(user=author)
+    get_tree()
+
+    with CaptureQueriesContext(connection) as context:
+        created = client.post('/ads/', {
+            'title': 'Телефон', 'description': '-', 'category_id': smartphones.pk, 'condition': 'used',
+        }, format='json')
+        detail = client.get(f'/ads/{created.data["id"]}/')
+        listed = client.get('/ads/', {'category': phones.pk})
+    assert created.status_code == 201
+    assert detail.data['category'] == {'id': smartphones.pk, 'title': 'Смартфоны'}
+    assert listed.data['results'][0]['category'] == {'id': smartphones.pk, 'title': 'Смартфоны'}
+    # счётчик ведёт триггер, в запросах Django таблица категорий не появляется
+    assert category_queries(context) == []
+
+    missing = client.post(
+        '/ads/', {'title': '-', 'description': '-', 'category_id': 0, 'condition': 'used'}, format='json'
+    )
+    assert missing.status_code == 400
+    assert 'category_id' in missing.data
+
+
+def test_form_choices_come_from_tree(tree, author):
+    electronics, phones, smartphones, laptops = tree
+    get_tree()
+    with CaptureQueriesContext(connection) as context:
+        form = AdForm(user=author)
+        choices = dict(form.fields['category_id'].choices)
+        bound = AdForm({
+            'title': '-', 'description': '-', 'category_id': smartphones.pk, 'condition': 'new',
+        }, user=author)
+        assert bound.is_valid(), bound.errors
+    assert choices[smartphones.pk] == '— — Смартфоны'
+    assert bound.cleaned_data['category_id'].pk == smartphones.pk
+    assert category_queries(context) == []
+    assert not AdForm({'title': '-', 'description': '-', 'category_id': 0, 'condition': 'new'}).is_valid()
+
+
+def test_version_key_invalidates_other_processes(tree):
+    """Изменение мимо сигналов видно после сдвига поколения в общем кэше"""
+    electronics, phones, smartphones, laptops = tree
+    assert get_tree().representation(laptops.pk)['title'] == 'Ноутбуки'
+    Category.objects.filter(pk=laptops.pk).update(title='Лэптопы')
+    assert get_tree().representation(laptops.pk)['title'] == 'Ноутбуки'
+    bump_generations(CATEGORIES_GENERATION)
+    assert get_tree().representation(laptops.pk)['title'] == 'Лэптопы'
+
+
+def test_tree_expires_without_shared_generation(tree, settings, monkeypatch):
+    """С кэшем в памяти процесса смену поколения не видно: дерево перечитывается по возрасту"""
+    electronics, phones, smartphones, laptops = tree
+    settings.BARTER_CATEGORIES_MAX_AGE = 60
+    now = [1000.0]
+    monkeypatch.setattr(categories.time, 'monotonic', lambda: now[0])
+    assert get_tree().representation(laptops.pk)['title'] == 'Ноутбуки'
+    Category.objects.filter(pk=laptops.pk).update(title='Лэптопы')
+    assert get_tree().representation(laptops.pk)['title'] == 'Ноутбуки'
+    now[0] += 60
+    assert get_tree().representation(laptops.pk)['title'] == 'Лэптопы'
+
+
+def test_category_from_other_process_is_accepted(tree, author):
+    """Категория, о которой дерево процесса ещё не знает, перепроверяется в БД"""
+    electronics, phones, smartphones, laptops = tree
+    get_tree()
+    # bulk_create не шлёт сигналов: как будто категорию создал другой процесс со своим кэшем
+    fresh, = Category.objects.bulk_create([Category(title='Планшеты', parent=electronics)])
+    client = APIClient()
+    client.force_authenticate(user=author)
+
+    response = client.post(
+        '/ads/', {'title': '-', 'description': '-', 'category_id': fresh.pk, 'condition': 'used'}, format='json'
+    )
+    assert response.status_code == 201
+    assert response.data['category'] == {'id': fresh.pk, 'title': 'Планшеты'}
@@ -0,0 +1,89 @@
+import pytest
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from barter.models import Ad, Category, ExchangeProposal
+
+User = get_user_model()
+
+
+@pytest.fixture
+def proposal():
+    me = User.objects.create_user(username='poller', password='pass')
+    other = User.objects.create_user(username='peer', password='pass')
+    category = Category.objects.create(title='Игры')
+    mine = Ad.objects.create(title='Приставка', description='-', author=me, category=category)
+    theirs = Ad.objects.create(title='Джойстик', description='-', author=other, category=category)
+    return ExchangeProposal.objects.create(sender=mine, receiver=theirs, comment='Меняю')
+
+
+@pytest.fixture
+def owner_client(proposal):
+    client = APIClient()
+    client.force_authenticate(user=proposal.sender_author)
+    return client
+
+
+def test_proposal_not_modified_with_single_query(owner_client, proposal, django_assert_num_queries):
+    """304 по версиям строк, без загрузки и сериализации объявлений"""
+    url = f'/proposals/{proposal.id}/'
+    etag = owner_client.get(url)['ETag']
+    with django_assert_num_queries(1):
+        response = owner_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+
+
+def test_nested_ad_change_changes_etag(owner_client, proposal):
+    url = f'/proposals/{proposal.id}/'
+    etag = owner_client.get(url)['ETag']
+    proposal.receiver.title = 'Руль'
+    proposal.receiver.save()
+    response = owner_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+
+
+def rename_category(proposal):
+    category = proposal.sender.category
+    category.title = 'Консоли'
+    category.save()
+
+
+def rename_author(proposal):
+    author = proposal.receiver_author
+    author.username = 'peer2'
+    author.save()
+
+
+@pytest.mark.parametrize('rename', [rename_category, rename_author], ids=['category', 'author'])
+def test_nested_rename_changes_etag(owner_client, proposal, rename):
+    """Категории и пользователи без updated_at: 304 после переименования отдавать нельзя"""
+    url = f'/proposals/{proposal.id}/'
+    etag = owner_client.get(url)['ETag']
+    rename(proposal)
+    response = owner_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+
+
+def test_if_match_guards_ad_update(proposal):
+    """PUT с устаревшим ETag получает 412, с актуальным проходит"""
+    ad = proposal.sender
+    client = APIClient()
+    client.force_authenticate(user=ad.author)
+    url = f'/ads/{ad.id}/'
+    data = {'title': 'Приставка 2', 'description': '-', 'category_id': ad.category_id, 'condition': 'used'}
+
+    stale = client.get(url)['ETag']
+    Ad.objects.get(pk=ad.pk).save()
+    assert client.put(url, data, HTTP_IF_MATCH=stale).status_code == 412
+
+    fresh = client.get(url)['ETag']
+    response = client.put(url, data, HTTP_IF_MATCH=fresh)
+    assert response.status_code == 200
+    assert response['ETag'] != fresh
+
+
+def test_if_match_guards_delete(owner_client, proposal):
+    url = f'/proposals/{proposal.id}/'
+    assert owner_client.delete(url, HTTP_IF_MATCH='"stale"').status_code == 412
+    assert owner_client.delete(url, HTTP_IF_MATCH=owner_client.get(url)['ETag']).status_code == 204
@@ -0,0 +1,87 @@
+import pytest
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from barter.models import Ad, ExchangeProposal
+
+User = get_user_model()
+
+
+@pytest.fixture
+def feed_user():
+    """Пользователь с двумя исходящими и одним входящим предложением"""
+    me = User.objects.create_user(username='me', password='pass')
+    other = User.objects.create_user(username='them', password='pass')
+    mine = Ad.objects.create(title='Моё', description='-', author=me)
+    theirs = Ad.objects.create(title='Чужое', description='-', author=other)
+    ExchangeProposal.objects.create(sender=mine, receiver=theirs, comment='out-1')
+    ExchangeProposal.objects.create(sender=mine, receiver=theirs, comment='out-2', status='rejected')
+    ExchangeProposal.objects.create(sender=theirs, receiver=mine, comment='in-1')
+    return me
+
+
+@pytest.fixture
+def feed_client(feed_user):
+    client = APIClient()
+    client.force_authenticate(user=feed_user)
+    return client
+
+
+def comments(client, **params):
+    response = client.get('/proposals/', params)
+    assert response.status_code == 200
+    return [item['comment'] for item in response.data['results']]
+
+
+def test_boxes(feed_client):
+    """Лента отдаёт обе стороны в порядке от новых к старым"""
+    assert comments(feed_client) == ['in-1', 'out-2', 'out-1']
+    assert comments(feed_client, box='outbox') == ['out-2', 'out-1']
+    assert comments(feed_client, box='inbox') == ['in-1']
+
+
+def test_status_filter(feed_client):
+    assert comments(feed_client, status='pending') == ['in-1', 'out-1']
+    assert comments(feed_client, box='outbox', status='rejected') == ['out-2']
+
+
+def test_invalid_params(feed_client):
+    assert feed_client.get('/proposals/', {'box': 'spam'}).status_code == 400
+    assert feed_client.get('/proposals/', {'status': 'spam'}).status_code == 400
+
+
+def test_anonymous_feed_is_empty(feed_user):
+    response = APIClient().get('/proposals/')
+    assert response.status_code == 200
+    assert response.data['results'] == []
+
+
+def test_author_ids_follow_ad_owner(feed_user):
+    """Копии авторов заполняются при создании и следуют за сменой владельца"""
+    proposal = ExchangeProposal.objects.get(comment='in-1')
+    assert proposal.receiver_author_id == feed_user.id
+
+    newcomer = User.objects.create_user(username='newcomer', password='pass')
+    ad = Ad.objects.get(title='Моё')
+    ad.author = newcomer
+    ad.save()
+    assert set(ExchangeProposal.objects.filter(sender=ad).values_list('sender_author_id', flat=True)) == {newcomer.id}
+    assert ExchangeProposal.objects.get(comment='in-1').receiver_author_id == newcomer.id
+
+
+def test_proposal_save_skips_ads_unless_they_change(feed_user, django_assert_num_queries):
+    proposal = ExchangeProposal.objects.get(comment='out-1')
+    proposal.status = 'rejected'
+    with django_assert_num_queries(1):  # только UPDATE, без чтения объявлений
+        proposal.save()
+
+    proposal.receiver = Ad.objects.get(title='Моё')
+    proposal.save()
+    assert ExchangeProposal.objects.get(pk=proposal.pk).receiver_author_id == feed_user.id
+
+
+def test_delete_checks_author_without_join(feed_client, django_assert_num_queries):
+    """Права на удаление проверяются по копии автора, без чтения объявлений"""
+    proposal = ExchangeProposal.objects.get(comment='out-1')
+    with django_assert_num_queries(2):  # выборка предложения и DELETE
+        response = feed_client.delete(f'/proposals/{proposal.id}/')
+    assert response.status_code == 204
@@ -0,0 +1,126 @@
+from math import asin, cos, degrees, radians, sin, sqrt
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from rest_framework.test import APIClient
+from barter.geo import EARTH_RADIUS_KM, bounding_box, nearby
+from barter.models import Ad, Category
+
+User = get_user_model()
+
+MOSCOW = (55.7558, 37.6173)
+# Длина градуса меридиана у экватора на сфероиде WGS84: a * (1 - e^2) * pi / 180, км
+WGS84_EQUATOR_DEGREE_KM = 110.574
+
+
+def haversine(a, b):
+    (lat1, lon1), (lat2, lon2) = map(lambda p: (radians(p[0]), radians(p[1])), (a, b))
+    h = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * asin(sqrt(h))
+
+
+@pytest.fixture
+def ads():
+    author = User.objects.create_user(username='geo_author')
+    points = {
+        'центр': MOSCOW,
+        '5 км': (MOSCOW[0] + 0.045, MOSCOW[1]),
+        '50 км': (MOSCOW[0], MOSCOW[1] + 0.8),
+        'Петербург': (59.9343, 30.3351),
+        'без координат': (None, None),
+    }
+    return {
+        title: Ad.objects.create(title=title, description='-', author=author, latitude=lat, longitude=lon)
+        for title, (lat, lon) in points.items()
+    }
+
+
+def box_contains(q, lat, lon):
+    return Ad.objects.filter(pk=Ad.objects.create(
+        title='-', description='-', author=User.objects.get(username='geo_author'), latitude=lat, longitude=lon
+    ).pk).filter(q).exists()
+
+
+def test_bounding_box_contains_circle(ads):
+    # точки ровно на радиусе по сторонам света и через антимеридиан
+    q = bounding_box(*MOSCOW, 100)
+    assert box_contains(q, MOSCOW[0] + 0.899, MOSCOW[1])
+    assert box_contains(q, MOSCOW[0], MOSCOW[1] + 1.59)
+    assert not box_contains(q, MOSCOW[0], MOSCOW[1] + 1.7)
+
+    across = bounding_box(65.0, 179.9, 50)
+    assert box_contains(across, 65.0, -179.5)
+    assert not box_contains(across, 65.0, 0)
+    assert box_contains(bounding_box(89.9, 0, 50), 89.9, 180)
+
+
+def test_bounding_box_covers_spheroid(ads):
+    # 0.998 радиуса к северу по геодезической WGS84 — внутри круга для ST_DWithin, но за сферическим прямоугольником
+    north = 0.998 * 100 / WGS84_EQUATOR_DEGREE_KM
+    assert north > degrees(100 / EARTH_RADIUS_KM)
+    assert box_contains(bounding_box(0.0, 30.0, 100), north, 30.0)
+    assert box_contains(bounding_box(0.0, 30.0, 100), -north, 30.0)
+
+
+def test_distance_matches_haversine(ads):
+    rows = nearby(Ad.objects.filter(pk__in=[ad.pk for ad in ads.values()]), *MOSCOW, order=True)
+    distances = {ad.title: ad.distance for ad in rows}
+    assert list(distances) == ['центр', '5 км', '50 км', 'Петербург']
+    for title, distance in distances.items():
+        ad = ads[title]
+        assert distance == pytest.approx(haversine(MOSCOW, (ad.latitude, ad.longitude)), rel=1e-3, abs=1e-6)
+
+
+def test_list_within_radius_sorted_by_distance(ads):
+    client = APIClient()
+    client.force_authenticate(user=ads['центр'].author)
+    near = f'{MOSCOW[0]},{MOSCOW[1]}'
+
+    response = client.get('/ads/', {'near': near, 'radius': 60, 'sort': 'distance'})
+    assert response.status_code == 200
+    assert [item['title'] for item in response.data['results']] == ['центр', '5 км', '50 км']
+    assert response.data['results'][1]['latitude'] == pytest.approx(MOSCOW[0] + 0.045)
+
+    within = client.get('/ads/', {'near': near, 'radius': 10}).data['results']
+    assert {item['title'] for item in within} == {'центр', '5 км'}
+    assert client.get('/async/ads/', {'near': near, 'radius': 10, 'sort': 'distance'}).json()['results'][0]['title'] == 'центр'
+
+
+@pytest.mark.parametrize('params', [
+    {'radius': 10},
+    {'near': '91,0'},
+    {'near': 'москва'},
+    {'near': '55,37', 'radius': -1},
+    {'near': '55,37', 'sort': 'title'},
+])
+def test_invalid_geo_params(params):
+    assert APIClient().get('/ads/', params).status_code == 400
+
+
+def test_location_must_be_valid(ads):
+    client = APIClient()
+    client.force_authenticate(user=ads['центр'].author)
+    response = client.post('/ads/', {
+        'title': '-', 'description': '-', 'category_id': None, 'condition': 'used', 'latitude': 95, 'longitude': 0,
+    }, format='json')
+    assert 'latitude' in response.data
+
+
+def test_location_is_set_as_a_pair(ads):
+    client = APIClient()
+    client.force_authenticate(user=ads['центр'].author)
+    category = Category.objects.create(title='Гео')
+    response = client.post('/ads/', {
+        'title': '-', 'description': '-', 'category_id': category.pk, 'condition': 'used', 'latitude': 50,
+    }, format='json')
+    assert response.status_code == 400
+    assert 'longitude' in response.data
+
+    ad = ads['центр']
+    response = client.patch(f'/ads/{ad.pk}/', {'longitude': None}, format='json')
+    assert 'longitude' in response.data
+    assert client.patch(f'/ads/{ad.pk}/', {'latitude': None, 'longitude': None}, format='json').status_code == 200
+
+    with pytest.raises(IntegrityError), transaction.atomic():
+        Ad.objects.filter(pk=ad.pk).update(latitude=50)
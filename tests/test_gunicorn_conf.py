@@ -0,0 +1,47 @@
+import os
+import runpy
+from pathlib import Path
+
+import pytest
+
+CONF = Path(__file__).resolve().parent.parent / 'gunicorn.conf.py'
+
+
+def load_conf(monkeypatch, cpus, **env):
+    for name in ('GUNICORN_WORKERS', 'GUNICORN_THREADS', 'GUNICORN_WORKER_CLASS', 'DB_CONN_MAX_AGE',
+                 'DB_MAX_CONNECTIONS'):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.setattr(os, 'sched_getaffinity', lambda pid: set(range(cpus)))
+    return runpy.run_path(str(CONF))
+
+
+@pytest.mark.parametrize('files, cpus', [
+    ({'cpu.max': '150000 100000\n'}, 2),
+    ({'cpu.max': 'max 100000\n'}, None),
+    ({'cpu/cpu.cfs_quota_us': '400000\n', 'cpu/cpu.cfs_period_us': '100000\n'}, 4),
+    ({'cpu/cpu.cfs_quota_us': '-1\n', 'cpu/cpu.cfs_period_us': '100000\n'}, None),
+    ({}, None),
+])
+def test_cgroup_quota(monkeypatch, tmp_path, files, cpus):
+    for name, content in files.items():
+        (tmp_path / name).parent.mkdir(exist_ok=True)
+        (tmp_path / name).write_text(content)
+    assert load_conf(monkeypatch, 1)['_cgroup_cpus'](str(tmp_path)) == cpus
+
+
+def test_default_workers_fit_connection_budget(monkeypatch):
+    # 32 ядра хоста без квоты: 65 воркеров по 4 потока — 260 постоянных соединений
+    conf = load_conf(monkeypatch, 32)
+    assert conf['workers'] * conf['threads'] <= 80
+    assert load_conf(monkeypatch, 1)['workers'] == 3
+
+
+def test_explicit_config_over_budget_refuses_to_start(monkeypatch):
+    with pytest.raises(RuntimeError, match='DB_MAX_CONNECTIONS'):
+        load_conf(monkeypatch, 1, GUNICORN_WORKERS='30')
+    with pytest.raises(RuntimeError):
+        load_conf(monkeypatch, 1, GUNICORN_WORKERS='5', GUNICORN_THREADS='20')
+    # без постоянных соединений воркер их не держит
+    assert load_conf(monkeypatch, 1, GUNICORN_WORKERS='30', DB_CONN_MAX_AGE='0')['workers'] == 30
@@ -0,0 +1,103 @@
+import itertools
+import random
+
+import numpy as np
+import pytest
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from barter.matching import ProposalGraph, run_matcher
+from barter.models import Ad, ExchangeChain, ExchangeProposal
+
+User = get_user_model()
+
+
+def graph(*edges):
+    """Граф из пар (sender, receiver); id предложения — номер пары с единицы"""
+    senders, receivers = zip(*edges)
+    return ProposalGraph.from_edges(range(1, len(edges) + 1), senders, receivers)
+
+
+def brute_force_cycles(edges, length):
+    """Простые циклы перебором, каждый как кортеж от наименьшей вершины"""
+    edge_set = set(edges)
+    nodes = sorted({node for edge in edges for node in edge})
+    found = set()
+    for path in itertools.permutations(nodes, length):
+        if path[0] == min(path) and all((path[i], path[(i + 1) % length]) in edge_set for i in range(length)):
+            found.add(path)
+    return found
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('length', [2, 3, 4, 5])
+def test_cycles_match_brute_force(seed, length):
+    rng = random.Random(seed)
+    edges = list({(rng.randrange(9), rng.randrange(9)) for _ in range(30)} - {(n, n) for n in range(9)})
+    g = graph(*edges)
+
+    nodes, proposals = g.cycles(length, np.ones(g.size, dtype=bool))
+    found = {tuple(g.ad_ids[row].tolist()) for row in nodes}
+    assert len(found) == len(nodes)
+    assert found == brute_force_cycles(edges, length)
+    # рёбра цикла идут по порядку обхода
+    for cycle, cycle_edges in zip(nodes, proposals):
+        assert [(g.sources[e], g.targets[e]) for e in cycle_edges] == list(zip(cycle, np.roll(cycle, -1)))
+
+
+def test_match_prefers_short_disjoint_cycles():
+    # 1<->2 и треугольник 2->3->4->2 делят вершину 2; 5->6->7->8->5 отдельно
+    g = graph((1, 2), (2, 1), (2, 3), (3, 4), (4, 2), (5, 6), (6, 7), (7, 8), (8, 5), (9, 10))
+    assert g.match(4) == [([1, 2], [1, 2]), ([5, 6, 7, 8], [6, 7, 8, 9])]
+    assert g.match(3) == [([1, 2], [1, 2])]
+
+
+def test_duplicate_proposals_keep_earliest():
+    g = graph((1, 2), (1, 2), (2, 1))
+    assert g.match(2) == [([1, 2], [1, 3])]
+
+
+@pytest.fixture
+def ring():
+    """Четыре пользователя, предложения по кругу a0 -> a1 -> a2 -> a3"""
+    users = [User.objects.create_user(username=f'ring_{i}') for i in range(4)]
+    ads = [Ad.objects.create(title=f'Кольцо {i}', description='-', author=user) for i, user in enumerate(users)]
+    proposals = [
+        ExchangeProposal.objects.create(sender=ads[i], receiver=ads[i + 1], comment='-') for i in range(3)
+    ]
+    return users, ads, proposals
+
+
+def chains():
+    return list(ExchangeChain.objects.order_by('id').values_list('ad_ids', flat=True))
+
+
+def test_incremental_run_finds_closed_ring(ring):
+    users, ads, _ = ring
+    run_matcher(full=True)
+    assert chains() == []
+
+    closing = ExchangeProposal.objects.create(sender=ads[3], receiver=ads[0], comment='-')
+    run = run_matcher()
+    assert (run.full, run.created) == (False, 1)
+    assert chains() == [[ad.id for ad in ads]]
+
+    chain = ExchangeChain.objects.get()
+    assert chain.proposal_ids[-1] == closing.id
+    assert sorted(chain.author_ids) == sorted(user.id for user in users)
+
+    client = APIClient()
+    client.force_authenticate(user=users[2])
+    results = client.get('/chains/').json()['results']
+    assert [item['ad_ids'] for item in results] == [[ad.id for ad in ads]]
+
+
+def test_incremental_run_drops_stale_chains(ring):
+    _, ads, proposals = ring
+    ExchangeProposal.objects.create(sender=ads[3], receiver=ads[0], comment='-')
+    run_matcher(full=True)
+    assert len(chains()) == 1
+
+    ExchangeProposal.objects.filter(pk=proposals[0].pk).update(status='rejected')
+    run = run_matcher()
+    assert (run.created, run.dropped) == (0, 1)
+    assert chains() == []
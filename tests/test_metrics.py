@@ -0,0 +1,132 @@
+import logging
+import re
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from barter.metrics import exposition, registry
+from barter.models import Ad
+
+User = get_user_model()
+
+
+@pytest.fixture
+def ad():
+    author = User.objects.create_user(username='metrics_author')
+    return Ad.objects.create(title='Часы', description='-', author=author)
+
+
+def timings(response):
+    """Server-Timing -> {имя: (мс, desc)}"""
+    result = {}
+    for entry in response['Server-Timing'].split(', '):
+        name, *params = entry.split(';')
+        params = dict(param.split('=', 1) for param in params)
+        result[name] = (float(params['dur']), params.get('desc'))
+    return result
+
+
+def sample(text, name, labels):
+    match = re.search(rf'^{name}\{{{re.escape(labels)}\}} (\S+)$', text, re.M)
+    return float(match.group(1)) if match else 0
+
+
+def test_server_timing_splits_request(ad):
+    with CaptureQueriesContext(connection) as context:
+        response = APIClient().get(f'/ads/{ad.pk}/')
+    parts = timings(response)
+    assert list(parts) == ['db', 'serialize', 'render', 'total']
+    assert parts['db'][1] == f'"{len(context)} queries"'
+    assert sum(parts[name][0] for name in ('db', 'serialize', 'render')) <= parts['total'][0] + 0.3
+
+
+def test_server_timing_can_be_disabled(ad, settings):
+    settings.BARTER_SERVER_TIMING = False
+    assert 'Server-Timing' not in APIClient().get(f'/ads/{ad.pk}/')
+
+
+def test_metrics_aggregate_per_view(ad):
+    labels = 'view="ad-detail",method="GET"'
+    before = exposition()
+    client = APIClient()
+    for _ in range(3):
+        client.get(f'/ads/{ad.pk}/')
+
+    response = client.get('/metrics')
+    assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+    text = response.content.decode()
+    assert '# TYPE barter_db_queries histogram' in text
+    for name in ('barter_request_duration_seconds_count', 'barter_response_size_bytes_count',
+                 'barter_serialize_duration_seconds_count'):
+        assert sample(text, name, labels) - sample(before, name, labels) == 3
+    size = len(client.get(f'/ads/{ad.pk}/').content)
+    assert sample(exposition(), 'barter_response_size_bytes_sum', labels) - sample(
+        text, 'barter_response_size_bytes_sum', labels) == size
+
+
+def test_histogram_buckets_are_cumulative():
+    labels = ('test-view', 'GET')
+    for value in (0.003, 0.02, 0.02, 30):
+        registry.observe('total', labels, value)
+    text = exposition()
+    name = 'barter_request_duration_seconds'
+    prefix = 'view="test-view",method="GET",'
+    assert sample(text, f'{name}_bucket', prefix + 'le="0.005"') >= 1
+    assert sample(text, f'{name}_bucket', prefix + 'le="0.025"') - sample(
+        text, f'{name}_bucket', prefix + 'le="0.005"') >= 2
+    assert sample(text, f'{name}_bucket', prefix + 'le="+Inf"') == sample(
+        text, f'{name}_count', 'view="test-view",method="GET"')
+
+
+def test_slow_queries_logged_with_view(ad, settings, caplog):
+    settings.BARTER_SLOW_QUERY_MS = 0
+    # логгер не передаёт записи корневому (LOGGING), слушаем его напрямую
+    logger = logging.getLogger('barter.slow_queries')
+    logger.addHandler(caplog.handler)
+    try:
+        APIClient().get(f'/ads/{ad.pk}/')
+    finally:
+        logger.removeHandler(caplog.handler)
+    messages = [record.getMessage() for record in caplog.records]
+    assert any('ad-detail' in message and 'barter_ad' in message for message in messages)
+
+
+def test_unknown_methods_share_one_series(ad):
+    client = APIClient()
+    for method in ('BREW', 'PROPFIND'):
+        client.generic(method, f'/ads/{ad.pk}/')
+    text = exposition()
+    assert 'method="other"' in text
+    assert 'BREW' not in text and 'PROPFIND' not in text
+
+
+def test_metrics_only_for_internal_addresses_or_token(settings):
+    client = APIClient()
+    assert client.get('/metrics', REMOTE_ADDR='10.1.2.3').status_code == 200
+    assert client.get('/metrics', REMOTE_ADDR='203.0.113.7').status_code == 403
+
+    settings.BARTER_METRICS_TOKEN = 'secret'
+    assert client.get('/metrics').status_code == 403
+    assert client.get('/metrics', REMOTE_ADDR='203.0.113.7', HTTP_AUTHORIZATION='Bearer secret').status_code == 200
+
+
+def test_streamed_body_is_measured(ad):
+    labels = 'view="ad-list",method="GET"'
+    client = APIClient()
+    before = exposition()
+    response = client.get('/ads/', {'stream': 1})
+    assert response.streaming
+    assert sample(exposition(), 'barter_db_queries_count', labels) == sample(before, 'barter_db_queries_count', labels)
+
+    with CaptureQueriesContext(connection) as context:
+        body = b''.join(response.streaming_content)
+    response.close()
+    assert len(context) >= 1
+    text = exposition()
+    assert sample(text, 'barter_db_queries_count', labels) - sample(before, 'barter_db_queries_count', labels) == 1
+    queries = sample(text, 'barter_db_queries_sum', labels) - sample(before, 'barter_db_queries_sum', labels)
+    assert queries >= len(context)
+    assert sample(text, 'barter_response_size_bytes_sum', labels) - sample(
+        before, 'barter_response_size_bytes_sum', labels) == len(body)
@@ -0,0 +1,56 @@
+import pytest
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from barter.models import Ad
+
+User = get_user_model()
+
+
+@pytest.fixture
+def ads():
+    author = User.objects.create_user(username='paginator', password='pass')
+    created = [Ad(title=f'Объявление {i}', description='-', author=author) for i in range(25)]
+    Ad.objects.bulk_create(created)
+    return Ad.objects.filter(author=author)
+
+
+def walk(client, url, params):
+    """Проходит все страницы по ссылкам next"""
+    ids, pages = [], 0
+    response = client.get(url, params)
+    while True:
+        assert response.status_code == 200
+        ids.extend(item['id'] for item in response.data['results'])
+        pages += 1
+        if not response.data['next']:
+            return ids, pages
+        response = client.get(response.data['next'])
+
+
+def test_cursor_walks_all_pages_in_order(ads):
+    """Курсор отдаёт все записи по (created_at, id) без повторов"""
+    expected = list(ads.order_by('-created_at', '-id').values_list('id', flat=True))
+    ids, pages = walk(APIClient(), '/ads/', {'cursor': '', 'limit': 10, 'search': 'Объявление'})
+    assert ids == expected
+    assert pages == 3
+
+
+def test_cursor_skips_count_unless_asked(ads):
+    """В курсорном режиме count считается только по запросу"""
+    client = APIClient()
+    assert 'count' not in client.get('/ads/', {'cursor': ''}).data
+    assert client.get('/ads/', {'cursor': '', 'count': 'exact'}).data['count'] == Ad.objects.filter(
+        is_active=True
+    ).count()
+    assert client.get('/ads/', {'cursor': '', 'count': 'estimate'}).data['count'] >= 0
+
+
+def test_offset_clients_unchanged(ads):
+    """Без ?cursor= ответ остаётся limit/offset"""
+    response = APIClient().get('/ads/', {'limit': 5, 'offset': 5})
+    assert set(response.data) == {'count', 'next', 'previous', 'results'}
+    assert 'offset=10' in response.data['next']
+
+
+def test_invalid_cursor(ads):
+    assert APIClient().get('/ads/', {'cursor': 'мусор'}).status_code == 404
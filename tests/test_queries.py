@@ -0,0 +1,50 @@
+import pytest
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from barter.models import Category, Ad, ExchangeProposal
+from barter.serializers import AdSerializer, ExchangeProposalSerializer
+from barter.utils.queryset import related_paths
+
+User = get_user_model()
+
+
+@pytest.fixture
+def seeded_user():
+    """Пользователь с десятком входящих и исходящих предложений"""
+    owner = User.objects.create_user(username='owner', password='pass')
+    other = User.objects.create_user(username='other', password='pass')
+    categories = [Category.objects.create(title=f'Категория {i}') for i in range(3)]
+
+    for i in range(12):
+        own = Ad.objects.create(
+            title=f'Своё {i}', description='-', author=owner, category=categories[i % 3]
+        )
+        foreign = Ad.objects.create(
+            title=f'Чужое {i}', description='-', author=other, category=categories[(i + 1) % 3]
+        )
+        ExchangeProposal.objects.create(sender=own, receiver=foreign, comment='Исходящее')
+        ExchangeProposal.objects.create(sender=foreign, receiver=own, comment='Входящее')
+    return owner
+
+
+@pytest.fixture
+def owner_client(seeded_user):
+    client = APIClient()
+    client.force_authenticate(user=seeded_user)
+    return client
+
+
+def test_related_paths_follow_serializer_tree():
+    """Цепочки связей строятся по вложенным сериализаторам; категория — из памяти, без join'а"""
+    assert related_paths(AdSerializer) == (('author',), ())
+    assert related_paths(ExchangeProposalSerializer) == (('receiver__author', 'sender__author'), ())
+
+
+def test_ad_list_constant_queries(owner_client, assert_constant_queries):
+    """COUNT + одна выборка вне зависимости от размера страницы"""
+    assert assert_constant_queries(owner_client, '/ads/') == 2
+
+
+def test_proposal_list_constant_queries(owner_client, assert_constant_queries):
+    """Вложенные объявления предложений не порождают N+1"""
+    assert assert_constant_queries(owner_client, '/proposals/') == 2
@@ -0,0 +1,191 @@
+"""Бюджет запросов и времени ответа для каждого маршрута barter/urls.py.
+
+Запросы идут на данные seed_barter от имени пользователя с самой длинной
+лентой. Списки и пакетные эндпоинты вызываются при двух размерах (limit или
+число строк в теле), и число запросов от размера зависеть не должно. Число
+запросов и время сверяются с tests/query_budget.json. После намеренного
+изменения бюджет пересчитывается так:
+
+    QUERY_BUDGET_UPDATE=1 pytest tests/test_query_budget.py
+"""
+import io
+import json
+import os
+import time
+from collections import namedtuple
+from pathlib import Path
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from barter import urls
+from barter.models import Ad, ExchangeChain, ExchangeProposal
+
+User = get_user_model()
+
+BUDGET_PATH = Path(__file__).with_name('query_budget.json')
+UPDATE = os.getenv('QUERY_BUDGET_UPDATE') == '1'
+SIZES = (2, 10)
+ROUNDS = 3
+# время зависит от машины: бюджет — замер на эталонной, с запасом в разы и на дрожание
+TIME_TOLERANCE = 3
+TIME_SLACK_MS = 50
+
+# route — имя из barter/urls.py; request(data, size) -> аргументы вызова клиента;
+# size_of(ответ) -> сколько элементов в нём, None — маршрут вызывается при одном размере
+Case = namedtuple('Case', ['route', 'method', 'request', 'size_of'], defaults=[None])
+
+
+def results(body):
+    return len(body['results'])
+
+
+def ndjson(rows):
+    return b''.join(json.dumps(row).encode() + b'\n' for row in rows)
+
+
+CASES = (
+    Case('ad-list', 'GET', lambda d, size: {'path': '/ads/', 'data': {'limit': size}}, results),
+    Case('ad-list', 'POST', lambda d, size: {'path': '/ads/', 'format': 'json', 'data': {
+        'title': 'Бюджет', 'description': '-', 'category_id': d.category_id, 'condition': 'used',
+    }}),
+    Case('ad-detail', 'GET', lambda d, size: {'path': f'/ads/{d.mine.pk}/'}),
+    Case('ad-detail', 'PATCH', lambda d, size: {'path': f'/ads/{d.mine.pk}/', 'format': 'json', 'data': {
+        'title': 'Бюджет, новое название',
+    }}),
+    Case('ad-bulk', 'GET', lambda d, size: {'path': '/ads/bulk/', 'HTTP_ACCEPT': 'application/x-ndjson'}),
+    Case('ad-bulk', 'POST', lambda d, size: {
+        'path': '/ads/bulk/', 'content_type': 'application/x-ndjson', 'data': ndjson(
+            {'title': f'Импорт {i}', 'description': '-', 'category_id': d.category_id} for i in range(size)
+        ),
+    }, lambda body: body['created']),
+    Case('category-tree', 'GET', lambda d, size: {'path': '/categories/'}),
+    Case('proposal-list', 'GET', lambda d, size: {'path': '/proposals/', 'data': {'limit': size}}, results),
+    Case('proposal-list', 'POST', lambda d, size: {'path': '/proposals/', 'format': 'json', 'data': {
+        'sender_id': d.mine.pk, 'receiver_id': d.foreign[0], 'comment': 'Бюджет',
+    }}),
+    Case('proposal-detail', 'GET', lambda d, size: {'path': f'/proposals/{d.incoming[0]}/'}),
+    Case('proposal-accept', 'POST', lambda d, size: {'path': f'/proposals/{d.incoming[0]}/accept/'}),
+    Case('proposal-reject', 'POST', lambda d, size: {'path': f'/proposals/{d.incoming[0]}/reject/'}),
+    Case('proposal-batch', 'POST', lambda d, size: {'path': '/proposals/batch/', 'format': 'json', 'data': {
+        'proposals': [{'sender_id': d.mine.pk, 'receiver_id': pk, 'comment': '-'} for pk in d.foreign[:size]],
+    }}, len),
+    Case('proposal-batch-status', 'POST', lambda d, size: {
+        'path': '/proposals/batch/status/', 'format': 'json', 'data': {'ids': d.incoming[:size], 'status': 'rejected'},
+    }, lambda body: body['updated']),
+    Case('chain-list', 'GET', lambda d, size: {'path': '/chains/', 'data': {'limit': size}}, results),
+    Case('recommendations', 'GET', lambda d, size: {'path': '/recommendations/', 'data': {'limit': size}}, len),
+    Case('async-ad-list', 'GET', lambda d, size: {'path': '/async/ads/', 'data': {'limit': size}}, results),
+    Case('async-ad-detail', 'GET', lambda d, size: {'path': f'/async/ads/{d.mine.pk}/'}),
+    Case('async-proposal-list', 'GET', lambda d, size: {'path': '/async/proposals/', 'data': {'limit': size}},
+         results),
+    Case('async-proposal-detail', 'GET', lambda d, size: {'path': f'/async/proposals/{d.incoming[0]}/'}),
+    Case('metrics', 'GET', lambda d, size: {'path': '/metrics'}),
+    Case('schema', 'GET', lambda d, size: {'path': '/api/schema/'}),
+    Case('swagger-ui', 'GET', lambda d, size: {'path': '/api/docs/'}),
+    Case('redoc', 'GET', lambda d, size: {'path': '/api/redoc/'}),
+)
+
+
+def key(case):
+    return f'{case.method} {case.route}'
+
+
+class Seeded:
+    """Пользователь, от имени которого идут запросы, и id для путей и тел"""
+
+    def __init__(self):
+        call_command('seed_barter', stdout=io.StringIO(), users=20, categories=10, ads=500, proposals=2000)
+        seeded = ExchangeProposal.objects.filter(receiver_author__username__startswith='seed_')
+        top = seeded.values('receiver_author').annotate(total=Count('id')).order_by('-total', 'receiver_author')[0]
+        self.user = User.objects.get(pk=top['receiver_author'])
+        self.category_id = Ad.objects.filter(author=self.user).values_list('category_id', flat=True)[0]
+        # своё объявление без предложений: на него не действуют ограничения повторных предложений
+        self.mine = Ad.objects.create(title='Бюджет', description='-', author=self.user, category_id=self.category_id)
+        self.foreign = list(
+            Ad.objects.filter(author__username__startswith='seed_', is_active=True)
+            .exclude(author=self.user).order_by('id').values_list('id', flat=True)[:SIZES[-1]]
+        )
+        self.incoming = list(
+            seeded.filter(receiver_author=self.user, status='pending', sender__is_active=True, receiver__is_active=True)
+            .order_by('id').values_list('id', flat=True)[:SIZES[-1]]
+        )
+        ExchangeChain.objects.bulk_create(
+            ExchangeChain(ad_ids=[self.mine.pk, pk], proposal_ids=[0, 0], author_ids=[self.user.pk])
+            for pk in self.foreign
+        )
+
+
+@pytest.fixture
+def seeded():
+    return Seeded()
+
+
+@pytest.fixture
+def client(seeded):
+    client = APIClient()
+    client.force_login(seeded.user)
+    return client
+
+
+def call(client, case, data, size):
+    """Ответ, его тело и запросы к БД; записи откатываются, чтобы вызов можно было повторить"""
+    kwargs = case.request(data, size)
+    with CaptureQueriesContext(connection) as context, transaction.atomic():
+        started = time.perf_counter()
+        response = getattr(client, case.method.lower())(**kwargs)
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        elapsed = time.perf_counter() - started
+        transaction.set_rollback(True)
+    assert response.status_code < 400, f'{key(case)}: {response.status_code} {content[:500]!r}'
+    # SAVEPOINT/RELEASE от atomic() выше в счёт не идут
+    queries = [query['sql'] for query in context.captured_queries if 'SAVEPOINT' not in query['sql']]
+    return content, queries, elapsed * 1e3
+
+
+def load_budget():
+    return json.loads(BUDGET_PATH.read_text()) if BUDGET_PATH.exists() else {}
+
+
+def test_every_route_has_a_budget():
+    routes = {pattern.name for pattern in urls.urlpatterns}
+    assert routes == {case.route for case in CASES}, 'Новому маршруту нужен случай в CASES и бюджет'
+    if not UPDATE:
+        assert set(load_budget()) == {key(case) for case in CASES}, 'Пересчитайте бюджет: QUERY_BUDGET_UPDATE=1'
+
+
+@pytest.mark.parametrize('case', CASES, ids=key)
+def test_route_within_budget(case, seeded, client):
+    # прогрев: кэши процесса (дерево категорий, индекс рекомендаций) заполняются первым вызовом
+    call(client, case, seeded, SIZES[-1])
+
+    counts = {}
+    for size in SIZES if case.size_of else SIZES[-1:]:
+        content, queries, _ = call(client, case, seeded, size)
+        if case.size_of:
+            assert case.size_of(json.loads(content)) == size
+        counts[size] = queries
+    assert len({len(queries) for queries in counts.values()}) == 1, (
+        f'{key(case)}: число запросов зависит от размера {dict((size, len(q)) for size, q in counts.items())}:\n'
+        + '\n'.join(counts[SIZES[-1]])
+    )
+    queries = counts[SIZES[-1]]
+    ms = min(call(client, case, seeded, SIZES[-1])[2] for _ in range(ROUNDS))
+
+    if UPDATE:
+        budget = load_budget()
+        budget[key(case)] = {'queries': len(queries), 'ms': round(ms, 1)}
+        BUDGET_PATH.write_text(json.dumps(dict(sorted(budget.items())), indent=2, ensure_ascii=False) + '\n')
+        return
+
+    budget = load_budget().get(key(case))
+    assert budget is not None, f'{key(case)}: нет бюджета, пересчитайте: QUERY_BUDGET_UPDATE=1'
+    assert len(queries) <= budget['queries'], (
+        f'{key(case)}: {len(queries)} запросов при бюджете {budget["queries"]}:\n' + '\n'.join(queries)
+    )
+    limit = budget['ms'] * TIME_TOLERANCE + TIME_SLACK_MS
+    assert ms <= limit, f'{key(case)}: {ms:.1f} мс при бюджете {budget["ms"]} мс (с запасом {limit:.0f} мс)'
@@ -0,0 +1,58 @@
+import pytest
+from django.contrib.auth import get_user_model
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from barter.models import Ad, Category, ExchangeProposal
+from barter.serializers import AdSerializer, ExchangeProposalSerializer
+from barter.utils.queryset import optimize_queryset
+from barter.utils.readers import compile_reader
+
+User = get_user_model()
+
+
+@pytest.fixture
+def proposals():
+    me = User.objects.create_user(username='reader_me', password='pass')
+    other = User.objects.create_user(username='reader_other', password='pass')
+    category = Category.objects.create(title='Книги "редкие"')
+    for i, condition in enumerate(['new', 'used', 'broken']):
+        sender = Ad.objects.create(title=f'Моё {i}', description='-', author=me, category=category,
+                                   condition=condition, image_url='https://example.com/1.png')
+        # объявление без категории: вложенный объект должен стать null
+        receiver = Ad.objects.create(title=f'Чужое {i}', description='ё\n"', author=other, category=None)
+        ExchangeProposal.objects.create(sender=sender, receiver=receiver, comment='')
+    return me
+
+
+@pytest.mark.parametrize('serializer_class', [AdSerializer, ExchangeProposalSerializer])
+def test_reader_output_is_byte_identical(proposals, serializer_class):
+    """Рендер строк .values() совпадает с рендером serializer.data"""
+    reader = compile_reader(serializer_class)
+    assert reader is not None
+
+    queryset = serializer_class.Meta.model.objects.order_by('id')
+    expected = serializer_class(optimize_queryset(queryset, serializer_class), many=True).data
+    actual = reader.many(reader.queryset(queryset))
+    assert JSONRenderer().render(actual) == JSONRenderer().render(expected)
+
+
+def test_unsupported_serializer_falls_back():
+    class WithMethod(serializers.ModelSerializer):
+        extra = serializers.SerializerMethodField()
+
+        class Meta:
+            model = Ad
+            fields = ['id', 'extra']
+
+    assert compile_reader(WithMethod) is None
+
+
+def test_list_endpoints_use_reader(proposals):
+    """Курсорная пагинация работает и по строкам .values()"""
+    client = APIClient()
+    client.force_authenticate(user=proposals)
+    first = client.get('/proposals/', {'cursor': '', 'limit': 2}).json()
+    second = client.get(first['next']).json()
+    assert len(first['results']) + len(second['results']) == 3
+    assert second['results'][0]['receiver']['category'] is None
@@ -0,0 +1,113 @@
+from datetime import timedelta
+
+import numpy as np
+import pytest
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.test import APIClient
+from barter.models import Ad, AffinityRun, Category, CategoryAffinity, ExchangeProposal
+from barter.recommendations import AffinityIndex, count_matrix, update_affinity
+
+User = get_user_model()
+
+
+def test_count_matrix_skips_unknown_categories():
+    counts = count_matrix(np.array([10, 20, 30]), [10, 10, 30, 99], [20, 20, 10, 10], [1.0, 5.0, 1.0, 7.0])
+    assert counts.tolist() == [[0, 6, 0], [0, 0, 0], [1, 0, 0]]
+
+
+def test_index_ranks_by_affinity_and_falls_back_to_popularity():
+    index = AffinityIndex([1, 2, 3], np.array([[0, 10, 0], [0, 0, 0], [0, 0, 30]]), smoothing=1)
+    assert [category for category, _ in index.top_categories([1], 2)] == [2, 3]
+    # без своих объявлений в известных категориях — самые популярные цели
+    assert [category for category, _ in index.top_categories([], 1)] == [3]
+
+
+@pytest.fixture
+def market():
+    """Книги часто меняют на музыку; у пользователя есть книга"""
+    me, other, third = (User.objects.create_user(username=f'rec_{i}') for i in range(3))
+    books, music, sport = (Category.objects.create(title=title) for title in ('Книги', 'Музыка', 'Спорт'))
+
+    def ad(author, category):
+        return Ad.objects.create(title='-', description='-', author=author, category=category)
+
+    for _ in range(3):
+        ExchangeProposal.objects.create(sender=ad(other, books), receiver=ad(third, music), comment='-')
+    ExchangeProposal.objects.create(sender=ad(other, books), receiver=ad(third, sport), comment='-')
+    mine = ad(me, books)
+    return me, mine, books, music, sport
+
+
+def weight(source, target):
+    return CategoryAffinity.objects.filter(source=source, target=target).values_list('weight', flat=True).first()
+
+
+def test_incremental_update_replaces_pending_weight(market):
+    _, _, books, music, sport = market
+    assert update_affinity().full
+    assert weight(books, music) == 3.0
+
+    proposal = ExchangeProposal.objects.filter(receiver__category=music).first()
+    proposal.status = 'accepted'
+    proposal.save()
+    run = update_affinity()
+    assert (run.full, run.proposals) == (False, 1)
+    assert weight(books, music) == 2.0 + 5.0
+    assert weight(books, sport) == 1.0
+    assert AffinityRun.objects.count() == 2
+
+
+def test_incremental_update_counts_each_status_once(market):
+    _, _, books, music, _ = market
+    update_affinity()
+    proposal = ExchangeProposal.objects.filter(receiver__category=music).first()
+    proposal.status = 'accepted'
+    proposal.save()
+    update_affinity()
+
+    # повторное сохранение уже учтённого принятого предложения ничего не меняет
+    proposal.comment = 'Правка в админке'
+    proposal.save()
+    assert update_affinity().proposals == 0
+    assert weight(books, music) == 2.0 + 5.0
+
+    # поздний коммит: updated_at раньше прошлого прогона, а строка учитывается всё равно
+    late = ExchangeProposal.objects.filter(receiver__category=music, status='pending').first()
+    ExchangeProposal.objects.filter(pk=late.pk).update(status='rejected', updated_at=timezone.now() - timedelta(days=1))
+    assert update_affinity().proposals == 1
+    assert weight(books, music) == 1.0 + 5.0 + 0.2
+
+
+def test_batches_give_the_same_weights(market):
+    _, _, books, music, sport = market
+    ExchangeProposal.objects.filter(receiver__category=sport).update(status='accepted')
+    run = update_affinity(batch_size=1)
+    assert (run.full, run.proposals) == (True, ExchangeProposal.objects.count())
+    assert (weight(books, music), weight(books, sport)) == (3.0, 5.0)
+
+    ExchangeProposal.objects.filter(receiver__category=music).update(status='rejected')
+    assert update_affinity(batch_size=2).proposals == 3
+    assert weight(books, music) == pytest.approx(0.6)
+    assert update_affinity(full=True, batch_size=3).proposals == ExchangeProposal.objects.count()
+    assert weight(books, music) == pytest.approx(0.6)
+
+
+def test_recommendations_endpoint(market, django_assert_max_num_queries):
+    me, mine, books, music, sport = market
+    update_affinity(full=True)
+    client = APIClient()
+    client.force_authenticate(user=me)
+
+    client.get('/recommendations/')
+    # индекс уже в памяти: свои категории, кандидаты одним UNION ALL и их данные
+    with django_assert_max_num_queries(4):
+        response = client.get('/recommendations/', {'limit': 5})
+    results = response.json()
+    assert response.status_code == 200
+    assert results[0]['ad']['category']['id'] == music.id
+    assert all(item['ad']['author']['id'] != me.id for item in results)
+    assert [item['score'] for item in results] == sorted((item['score'] for item in results), reverse=True)
+
+    assert client.get('/recommendations/', {'limit': 'x'}).status_code == 400
+    assert APIClient().get('/recommendations/').status_code in (401, 403)
@@ -0,0 +1,69 @@
+import datetime
+import json
+import uuid
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from barter.models import Ad, Category
+from barter.renderers import FastJSONRenderer, stream_json_array
+
+User = get_user_model()
+
+
+@pytest.mark.parametrize('data', [
+    {'title': 'Велосипед', 'price': Decimal('10.50'), 'ok': True, 'none': None},
+    [{'when': datetime.datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc)}],
+    {'id': uuid.UUID(int=7), 'date': datetime.date(2024, 5, 1), 'lazy': gettext_lazy('Категория')},
+    {'js': 'строка\u2028с\u2029разделителями', 'float': 0.1},
+])
+def test_fast_renderer_matches_drf(data):
+    assert FastJSONRenderer().render(data) == JSONRenderer().render(data)
+
+
+@pytest.mark.parametrize('value, fast', [
+    (1e-05, b'0.00001'),
+    (1e16, b'1e16'),
+    (-2.5e-7, b'-2.5e-7'),
+])
+def test_floats_keep_value_not_spelling(value, fast):
+    """Экспонента записывается иначе, чем у json, но число то же"""
+    rendered = FastJSONRenderer().render({'x': value})
+    assert rendered == b'{"x":' + fast + b'}'
+    assert json.loads(rendered) == json.loads(JSONRenderer().render({'x': value}))
+
+
+@pytest.mark.parametrize('value', [float('nan'), float('inf'), float('-inf')])
+def test_non_finite_floats_become_null(value):
+    with pytest.raises(ValueError):
+        JSONRenderer().render({'x': value})
+    assert FastJSONRenderer().render({'x': value}) == b'{"x":null}'
+
+
+def test_indent_falls_back_to_drf():
+    data = {'a': [1, 2]}
+    media_type = 'application/json; indent=4'
+    assert FastJSONRenderer().render(data, media_type) == JSONRenderer().render(data, media_type)
+
+
+@pytest.mark.parametrize('batch_size', [1, 2, 100])
+def test_stream_json_array(batch_size):
+    items = [{'id': i} for i in range(5)]
+    assert b''.join(stream_json_array(iter(items), batch_size)) == JSONRenderer().render(items)
+    assert b''.join(stream_json_array([], batch_size)) == b'[]'
+
+
+def test_streaming_list_returns_all_ads():
+    author = User.objects.create_user(username='streamer', password='pass')
+    category = Category.objects.create(title='Спорт')
+    for i in range(15):
+        Ad.objects.create(title=f'Мяч {i}', description='-', author=author, category=category)
+
+    client = APIClient()
+    paged = client.get('/ads/', {'cursor': '', 'limit': 100}).json()['results']
+    response = client.get('/ads/', {'stream': '1'})
+    assert response.streaming
+    assert json.loads(b''.join(response.streaming_content)) == paged
@@ -0,0 +1,111 @@
+import pytest
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings as django_settings
+from django.contrib.auth import get_user_model
+from django.db import connections, router
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from barter.models import Ad, Category
+from barter.replicas import PRIMARY_COOKIE, ReplicaReadMiddleware
+
+User = get_user_model()
+
+REPLICAS = ['replica1', 'replica2']
+
+
+@pytest.fixture
+def replicas(settings):
+    settings.BARTER_READ_REPLICAS = REPLICAS
+    settings.BARTER_REPLICA_STICKY_SECONDS = 7
+
+
+def routed(request):
+    """Куда роутер отправил бы чтения и записи во время запроса"""
+    seen = {}
+
+    def view(request):
+        seen.update(ad=router.db_for_read(Ad), user=router.db_for_read(User), write=router.db_for_write(Ad))
+        return HttpResponse()
+
+    response = ReplicaReadMiddleware(view)(request)
+    return seen, response
+
+
+def test_safe_requests_read_barter_models_from_replica(replicas):
+    seen, response = routed(RequestFactory().get('/ads/'))
+    assert seen['ad'] in REPLICAS
+    # пользователи и сессии — с основной БД, запись — только в неё
+    assert seen['user'] == 'default'
+    assert seen['write'] == 'default'
+    assert PRIMARY_COOKIE not in response.cookies
+    # вне запроса (команды, фоновые задачи) всё идёт в основную БД
+    assert router.db_for_read(Ad) == 'default'
+
+
+def test_one_replica_per_request(replicas):
+    """Все чтения запроса идут в одну реплику, разные запросы распределяются по всем"""
+    def view(request):
+        return HttpResponse(','.join({router.db_for_read(Ad) for _ in range(20)}))
+
+    middleware = ReplicaReadMiddleware(view)
+    chosen = [middleware(RequestFactory().get('/ads/')).content.decode() for _ in range(50)]
+    assert set(chosen) == set(REPLICAS)
+
+
+def test_write_sticks_client_to_primary(replicas):
+    seen, response = routed(RequestFactory().post('/ads/'))
+    assert seen['ad'] == 'default'
+    cookie = response.cookies[PRIMARY_COOKIE]
+    assert cookie['max-age'] == 7
+    assert cookie['httponly']
+
+    request = RequestFactory().get('/ads/')
+    request.COOKIES[PRIMARY_COOKIE] = cookie.value
+    seen, response = routed(request)
+    assert seen['ad'] == 'default'
+
+
+def test_async_requests_route_sync_orm_calls(replicas):
+    async def view(request):
+        return HttpResponse(await sync_to_async(router.db_for_read)(Ad))
+
+    response = async_to_sync(ReplicaReadMiddleware(view))(RequestFactory().get('/async/ads/'))
+    assert response.content.decode() in REPLICAS
+
+
+def test_without_replicas_nothing_changes():
+    seen, response = routed(RequestFactory().post('/ads/'))
+    assert seen['ad'] == 'default'
+    assert PRIMARY_COOKIE not in response.cookies
+    assert routed(RequestFactory().get('/ads/'))[0]['ad'] == 'default'
+
+
+def test_migrations_skip_replicas(replicas):
+    assert router.allow_migrate('replica1', 'barter') is False
+    assert router.allow_migrate('default', 'barter') is True
+
+
+@pytest.mark.skipif('replica1' not in django_settings.DATABASES, reason='POSTGRES_REPLICA_HOSTS не задан')
+@pytest.mark.django_db(transaction=True, databases=['default', 'replica1'])
+def test_list_reads_from_replica_until_own_write(settings):
+    """В тестах replica1 — зеркало тестовой БД, видно только закоммиченное"""
+    settings.BARTER_READ_REPLICAS = ['replica1']
+    author = User.objects.create_user(username='replica_author')
+    category = Category.objects.create(title='Книги')
+    client = APIClient()
+    client.force_authenticate(user=author)
+
+    with CaptureQueriesContext(connections['replica1']) as replica:
+        assert client.get('/ads/').status_code == 200
+    assert any('barter_ad' in query['sql'] for query in replica.captured_queries)
+
+    created = client.post('/ads/', {
+        'title': 'Своё', 'description': '-', 'category_id': category.pk, 'condition': 'new',
+    }, format='json')
+    assert PRIMARY_COOKIE in created.cookies
+    with CaptureQueriesContext(connections['replica1']) as replica:
+        detail = client.get(f'/ads/{created.data["id"]}/')
+    assert detail.data['title'] == 'Своё'
+    assert replica.captured_queries == []
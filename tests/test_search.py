@@ -0,0 +1,60 @@
+import pytest
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from barter.models import Ad
+from barter.search import has_trigram, search_ads
+
+User = get_user_model()
+
+
+@pytest.fixture
+def author():
+    return User.objects.create_user(username='searcher', password='pass')
+
+
+def titles(queryset, text):
+    return [ad.title for ad in search_ads(queryset, text)]
+
+
+def test_title_ranked_above_description(author):
+    """Совпадение в названии весит больше, чем в описании"""
+    Ad.objects.create(title='Книга', description='Про велосипед', author=author)
+    Ad.objects.create(title='Велосипед горный', description='Почти новый', author=author)
+    ads = Ad.objects.filter(author=author)
+    assert titles(ads, 'велосипед') == ['Велосипед горный', 'Книга']
+
+
+def test_prefix_and_stemming(author):
+    """Работают префиксы и словоформы на обоих языках"""
+    Ad.objects.create(title='Велосипеды детские', description='-', author=author)
+    Ad.objects.create(title='Running shoes', description='-', author=author)
+    ads = Ad.objects.filter(author=author)
+    assert titles(ads, 'велосипед') == ['Велосипеды детские']
+    assert titles(ads, 'велос') == ['Велосипеды детские']
+    assert titles(ads, 'run shoe') == ['Running shoes']
+
+
+def test_vector_follows_title_update(author):
+    """Триггер пересчитывает вектор при изменении названия"""
+    ad = Ad.objects.create(title='Гитара', description='-', author=author)
+    ad.title = 'Скрипка'
+    ad.save()
+    ads = Ad.objects.filter(author=author)
+    assert titles(ads, 'гитара') == []
+    assert titles(ads, 'скрипка') == ['Скрипка']
+
+
+def test_typo_tolerance(author):
+    """Опечатка в названии находится через триграммы"""
+    if not has_trigram():
+        pytest.skip('pg_trgm недоступен')
+    Ad.objects.create(title='Холодильник', description='-', author=author)
+    assert titles(Ad.objects.filter(author=author), 'холадильник') == ['Холодильник']
+
+
+def test_search_param_contract(author):
+    """?search= по-прежнему фильтрует список объявлений"""
+    Ad.objects.create(title='Уникальный самовар', description='-', author=author)
+    response = APIClient().get('/ads/', {'search': 'самовар'})
+    assert response.status_code == 200
+    assert [ad['title'] for ad in response.data['results']] == ['Уникальный самовар']
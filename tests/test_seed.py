@@ -0,0 +1,60 @@
+import io
+from collections import Counter
+
+from django.core.management import call_command
+from django.db.models import Count, F
+from barter.categories import get_tree
+from barter.models import Ad, Category, ExchangeProposal
+from barter.search import search_ads
+
+
+def seed(**options):
+    call_command('seed_barter', stdout=io.StringIO(), **{
+        'users': 20, 'categories': 10, 'ads': 3000, 'proposals': 4000, 'batch_size': 700, **options,
+    })
+
+
+def test_seed_volumes_and_consistency():
+    proposals_before = ExchangeProposal.objects.count()
+    seed()
+    ads = Ad.objects.filter(author__username__startswith='seed_')
+    assert ads.count() == 3000
+    assert ExchangeProposal.objects.count() - proposals_before == 4000
+
+    # дерево: корни и подкатегории с путями, которые видит дерево в памяти
+    seeded = Category.objects.filter(title__startswith='Категория ')
+    assert seeded.filter(parent__isnull=True).count() == 2
+    for category in seeded.filter(parent__isnull=False):
+        assert category.path == f'{category.parent.path}{category.pk}/'
+        assert category.pk in get_tree().subtree_ids(category.parent_id)
+
+    # COPY проходит через триггеры: счётчики категорий и поисковый вектор
+    active = dict(ads.filter(is_active=True).values_list('category_id').annotate(total=Count('id')))
+    counts = dict(seeded.values_list('id', 'active_ads_count'))
+    assert counts == {pk: active.get(pk, 0) for pk in counts}
+    assert search_ads(ads, 'велосипед').exists()
+
+    proposals = ExchangeProposal.objects.filter(sender__in=ads)
+    assert not proposals.filter(sender_author=F('receiver_author')).exists()
+    assert not proposals.exclude(sender_author=F('sender__author'), receiver_author=F('receiver__author')).exists()
+    assert not proposals.filter(created_at__lt=F('receiver__created_at')).exists()
+
+
+def test_seed_is_skewed_like_real_traffic():
+    seed(skew=1.2)
+    per_author = Counter(Ad.objects.filter(author__username__startswith='seed_').values_list('author_id', flat=True))
+    counts = sorted(per_author.values(), reverse=True)
+    # самый активный автор намного выше среднего, хвост почти пуст
+    assert counts[0] > 4 * sum(counts) / len(counts)
+
+    received = Counter(ExchangeProposal.objects.values_list('receiver_id', flat=True))
+    top = sum(count for _, count in received.most_common(len(received) // 100 or 1))
+    assert top > 0.1 * sum(received.values())
+
+
+def test_clear_reseeds_over_category_tree():
+    seed(ads=100, proposals=100)
+    seed(ads=100, proposals=100, clear=True)
+    assert Category.objects.filter(parent__isnull=False).exists()
+    assert Ad.objects.count() == 100
+    assert ExchangeProposal.objects.count() == 100
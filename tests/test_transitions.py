@@ -0,0 +1,121 @@
+import threading
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from barter.models import Ad, ExchangeProposal
+from barter.transitions import accept, reject
+
+User = get_user_model()
+
+
+def make_ad(author, title='Ad'):
+    return Ad.objects.create(title=title, description='-', author=author)
+
+
+@pytest.fixture
+def trade():
+    """Получатель и три предложения на одно его объявление"""
+    receiver_user = User.objects.create_user(username='tr_receiver')
+    wanted = make_ad(receiver_user, 'Нужное всем')
+    spare = make_ad(receiver_user, 'Запасное')
+    senders = [User.objects.create_user(username=f'tr_sender_{i}') for i in range(3)]
+    offers = [make_ad(user, f'Предложение {i}') for i, user in enumerate(senders)]
+    proposals = [ExchangeProposal.objects.create(sender=ad, receiver=wanted, comment='-') for ad in offers]
+    # отправитель 0 предлагает то же объявление и на запасное
+    side = ExchangeProposal.objects.create(sender=offers[0], receiver=spare, comment='-')
+    return receiver_user, wanted, offers, proposals, side
+
+
+def statuses(*proposals):
+    return [ExchangeProposal.objects.get(pk=p.pk).status for p in proposals]
+
+
+def test_accept_takes_both_ads_and_rejects_conflicts(trade):
+    user, wanted, offers, proposals, side = trade
+
+    assert accept(user, [proposals[1].pk]) == [proposals[1].pk]
+
+    assert statuses(*proposals, side) == ['rejected', 'accepted', 'rejected', 'pending']
+    assert not Ad.objects.get(pk=wanted.pk).is_active
+    assert not Ad.objects.get(pk=offers[1].pk).is_active
+    assert Ad.objects.get(pk=offers[0].pk).is_active
+
+    # повторное решение ничего не меняет
+    assert accept(user, [proposals[1].pk]) == []
+    assert reject(user, [proposals[1].pk]) == 0
+
+
+def test_batch_accept_picks_one_per_ad(trade):
+    user, _, _, proposals, side = trade
+    accepted = accept(user, [p.pk for p in proposals] + [side.pk])
+    # первое по id забирает «нужное» и объявление отправителя 0, side конфликтует
+    assert accepted == [proposals[0].pk]
+    assert statuses(*proposals, side) == ['accepted', 'rejected', 'rejected', 'rejected']
+
+
+def test_only_receiver_can_decide(trade):
+    user, _, offers, proposals, _ = trade
+    sender_client = APIClient()
+    sender_client.force_authenticate(user=offers[0].author)
+    assert sender_client.post(f'/proposals/{proposals[0].pk}/accept/').status_code == 403
+
+    client = APIClient()
+    client.force_authenticate(user=user)
+    response = client.post(f'/proposals/{proposals[0].pk}/reject/')
+    assert response.status_code == 200
+    assert response.json()['status'] == 'rejected'
+    assert client.post(f'/proposals/{proposals[0].pk}/accept/').status_code == 409
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_accepts_trade_each_ad_once(trade):
+    """Параллельные принятия и отклонения: каждое объявление уходит не больше одного раза"""
+    user, wanted, _, proposals, side = trade
+    workers = 16
+    barrier = threading.Barrier(workers)
+    results, errors = [], []
+
+    def work(i):
+        try:
+            barrier.wait()
+            if i % 4 == 3:
+                reject(user, [proposals[i % len(proposals)].pk])
+            else:
+                targets = [proposals[i % len(proposals)].pk, side.pk][:1 + i % 2]
+                results.extend(accept(user, targets))
+        except Exception as exc:  # pragma: no cover - ошибка попадёт в assert ниже
+            errors.append(exc)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    accepted = ExchangeProposal.objects.filter(status='accepted')
+    assert sorted(results) == sorted(accepted.values_list('pk', flat=True))
+
+    # ни одно объявление не участвует в двух принятых обменах
+    taken = [ad for pair in accepted.values_list('sender_id', 'receiver_id') for ad in pair]
+    assert len(taken) == len(set(taken))
+    assert not Ad.objects.filter(pk__in=taken, is_active=True).exists()
+    assert not ExchangeProposal.objects.filter(status='pending', receiver__in=taken).exists()
+    assert accepted.filter(receiver=wanted).count() <= 1
+
+
+def test_updates_lock_proposals_in_id_order(trade):
+    """Строки под UPDATE блокируются подзапросом ORDER BY id FOR UPDATE, а не в порядке обхода плана"""
+    user, _, _, proposals, side = trade
+    with CaptureQueriesContext(connection) as context:
+        accept(user, [proposals[0].pk])
+        reject(user, [side.pk])
+    updates = [query['sql'] for query in context.captured_queries
+               if query['sql'].startswith('UPDATE "barter_exchangeproposal"') and "'rejected'" in query['sql']]
+    assert len(updates) == 2
+    assert all('ORDER BY' in sql and 'FOR UPDATE' in sql for sql in updates)